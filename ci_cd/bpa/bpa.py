@@ -0,0 +1,171 @@
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional
+
+BPA_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(BPA_DIR, '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+from src.tmdl_model import load_model
+from model_rules import analyze_model, load_model_rules
+from report_rules import ReportDefinition, analyze_report, load_report_rules
+
+MODEL_RULES_FILE = os.path.join(BPA_DIR, 'bpa-rules-semanticmodel.json')
+REPORT_RULES_FILE = os.path.join(BPA_DIR, 'bpa-rules-report.json')
+
+# Tabular Editor reports rules of severity 3 and up as errors, 2 as warnings and 1 as information
+SEVERITY_LEVELS = {3: 'error', 2: 'warning', 1: 'notice'}
+
+def find_definitions(patterns: list[str]) -> list[str]:
+    """
+    Resolve folders and glob patterns to *.SemanticModel and *.Report folders.
+
+    Parameters:
+        patterns (list[str]): Folders or glob patterns, a folder that is neither is searched recursively
+
+    Returns:
+        list[str]: Absolute paths of the semantic model and report folders, sorted and without duplicates
+    """
+    found = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern, recursive=True) or [pattern]:
+            if not os.path.isdir(path):
+                continue
+            if path.rstrip('/\\').endswith(('.SemanticModel', '.Report')):
+                found.add(os.path.abspath(path))
+            else:
+                for suffix in ('SemanticModel', 'Report'):
+                    found.update(os.path.abspath(match) for match in glob.glob(os.path.join(glob.escape(path), '**', f'*.{suffix}'), recursive=True))
+    return sorted(found)
+
+@lru_cache(maxsize=None)
+def _model_rules(path: str) -> list[dict]:
+    return load_model_rules(path)
+
+@lru_cache(maxsize=None)
+def _report_rules(path: str) -> list[dict]:
+    return load_report_rules(path)
+
+def analyze_definition(path: str, model_rules_path: str = MODEL_RULES_FILE, report_rules_path: str = REPORT_RULES_FILE) -> dict:
+    """
+    Run the best practice rules on one semantic model or report folder.
+
+    Rule files are read once per process and compiled rule expressions are cached, so a worker
+    that analyzes several folders parses every rule once.
+
+    Parameters:
+        path (str): A *.SemanticModel or *.Report folder
+        model_rules_path (str): Tabular Editor rule file for semantic models
+        report_rules_path (str): Rule file for reports
+
+    Returns:
+        dict: 'name', 'path', 'kind', 'findings' (violations with their 'level'), 'errors' and 'seconds'
+    """
+    start = time.perf_counter()
+    result = {'name': os.path.basename(path), 'path': path, 'findings': [], 'errors': []}
+
+    try:
+        if path.endswith('.SemanticModel'):
+            result['kind'] = 'model'
+            model = load_model(os.path.join(path, 'definition'))
+            findings, result['errors'] = analyze_model(model, _model_rules(model_rules_path))
+            for finding in findings:
+                finding['level'] = SEVERITY_LEVELS.get(min(finding['severity'], 3), 'notice')
+        else:
+            result['kind'] = 'report'
+            findings, result['errors'] = analyze_report(ReportDefinition(path), _report_rules(report_rules_path))
+            for finding in findings:
+                finding['level'] = 'error' if finding['severity'] == 'error' else 'warning'
+        result['findings'] = findings
+    except (OSError, ValueError) as error:
+        result.setdefault('kind', 'model')
+        result['errors'] = [{'rule': None, 'object': path, 'error': f'Cannot read the definition: {error}'}]
+        result['failed'] = True
+
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def _relative(path: Optional[str]) -> str:
+    return os.path.relpath(path, REPO_ROOT).replace(os.sep, '/') if path else ''
+
+def print_findings(result: dict, github: bool = False) -> None:
+    """Print the findings of a folder, as GitHub Actions annotations when github is set."""
+    print(f"\nProcessing {result['kind']}: {result['name']}")
+    for finding in result['findings']:
+        detail = f" {finding['result']}" if isinstance(finding.get('result'), list) and finding['result'] else ''
+        message = f"{finding['name']} ({finding['rule']}) on {finding['object']}{detail}"
+        if github:
+            location = f"file={_relative(finding['path'])}" + (f",line={finding['line']}" if finding.get('line') else '')
+            print(f"::{finding['level']} {location},title={finding['rule']}::{message}")
+        else:
+            print(f"  {finding['level'].upper():7} {message}")
+    for error in result['errors']:
+        message = f"Rule {error['rule']} could not be evaluated on {error['object']}: {error['error']}" if error['rule'] else error['error']
+        print(f"::warning::{message}" if github else f"  {'RULE ERROR':7} {message}")
+
+def print_summary(results: list[dict]) -> None:
+    """Print one line per folder: its errors, warnings and notices, and whether it passed."""
+    rows = [('Name', 'Kind', 'Success', 'Errors', 'Warnings', 'Notices', 'Seconds')]
+    for result in results:
+        counts = {level: sum(1 for finding in result['findings'] if finding['level'] == level) for level in ('error', 'warning', 'notice')}
+        success = counts['error'] == 0 and not result.get('failed')
+        rows.append((result['name'], result['kind'], str(success), str(counts['error']), str(counts['warning']), str(counts['notice']), f"{result['seconds']:.2f}"))
+
+    widths = [max(len(row[column]) for row in rows) for column in range(len(rows[0]))]
+    print('\nBest Practice Analysis Summary:')
+    print('==============================')
+    for position, row in enumerate(rows):
+        print('  '.join(value.ljust(width) for value, width in zip(row, widths)).rstrip())
+        if position == 0:
+            print('  '.join('-' * width for width in widths))
+
+def main(patterns: Optional[list[str]] = None, model_rules_path: str = MODEL_RULES_FILE, report_rules_path: str = REPORT_RULES_FILE, workers: int = 0, github: bool = False) -> int:
+    """
+    Run the best practice rules on semantic models and reports, in parallel.
+
+    Parameters:
+        patterns (Optional[list[str]]): Folders or glob patterns, defaults to every *.SemanticModel and *.Report folder in the repository
+        model_rules_path (str): Tabular Editor rule file for semantic models
+        report_rules_path (str): Rule file for reports
+        workers (int): Number of folders analyzed at the same time, 0 uses every core and 1 runs in this process
+        github (bool): Print findings as GitHub Actions annotations
+
+    Returns:
+        int: Exit code, 1 when a folder has error level findings or cannot be read
+    """
+    paths = find_definitions(patterns or [REPO_ROOT])
+    if not paths:
+        print('No *.SemanticModel or *.Report folders found.')
+        return 1
+
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    arguments = (paths, [model_rules_path] * len(paths), [report_rules_path] * len(paths))
+    if workers <= 1:
+        results = list(map(analyze_definition, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(analyze_definition, *arguments))
+
+    for result in results:
+        print_findings(result, github)
+    print_summary(results)
+
+    failed = any(result.get('failed') or any(finding['level'] == 'error' for finding in result['findings']) for result in results)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Best Practice Analyzer rules on the TMDL semantic models and PBIR reports of the repository.")
+    parser.add_argument("paths", nargs="*", help="*.SemanticModel or *.Report folders, folders to search or glob patterns (defaults to the whole repository)")
+    parser.add_argument("--rules", default=MODEL_RULES_FILE, help="Tabular Editor rule file for semantic models (defaults to bpa-rules-semanticmodel.json)")
+    parser.add_argument("--report-rules", default=REPORT_RULES_FILE, help="Rule file for reports (defaults to bpa-rules-report.json)")
+    parser.add_argument("--workers", type=int, default=0, help="Number of folders analyzed at the same time, 0 uses every core (defaults to 0)")
+    parser.add_argument("--github", action="store_true", default=os.environ.get('GITHUB_ACTIONS') == 'true', help="Print findings as GitHub Actions annotations (defaults to on inside GitHub Actions)")
+    args = parser.parse_args()
+
+    sys.exit(main(args.paths, args.rules, args.report_rules, args.workers, args.github))
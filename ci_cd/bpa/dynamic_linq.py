@@ -0,0 +1,497 @@
+"""
+Compiler for the Dynamic LINQ expressions of Tabular Editor best practice rules, e.g.
+`UsedInRelationships.Any(FromColumn.Name == current.Name) and IsHidden == false`.
+
+An expression is tokenized and parsed once into a tree of Python closures, compile_expression()
+caches the result by its text, so a rule costs one parse however many objects and models it is
+evaluated on. Members of objects are resolved at evaluation time by a `member` function, which
+keeps this module independent of the object model it runs on.
+"""
+
+import re
+import math
+from functools import lru_cache
+from typing import Callable
+
+_TOKEN_PATTERN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<char>'(?:[^'\\]|\\.)')
+  | (?P<number>\d+(?:\.\d+)?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+  | (?P<operator>&&|\|\||==|!=|<>|<=|>=|[=<>!+\-*/%()\[\],.?:])
+''', re.VERBOSE)
+
+_KEYWORD_OPERATORS = {'and': '&&', 'or': '||', 'not': '!', 'mod': '%'}
+_COMPARISONS = {'=', '==', '!=', '<>', '<', '>', '<=', '>='}
+
+# Collection methods whose argument is a lambda over the items, with the item as `it`
+_LAMBDA_METHODS = {'any', 'all', 'where', 'select', 'count', 'first', 'firstordefault', 'last', 'lastordefault', 'sum', 'max', 'min', 'orderby', 'orderbydescending'}
+
+class ExpressionError(Exception):
+    """An expression that cannot be parsed, or fails while it is evaluated on an object."""
+
+class Scope:
+    """
+    Evaluation scope: `it` is the object a lambda runs on, `outer` the scope of the enclosing
+    lambda (its `it` is `outerIt`) and `current` the object the rule is evaluated on.
+    """
+
+    __slots__ = ('it', 'outer', 'current', 'member')
+
+    def __init__(self, it, outer, current, member: Callable):
+        self.it = it
+        self.outer = outer
+        self.current = current
+        self.member = member
+
+    def enter(self, it) -> 'Scope':
+        return Scope(it, self, self.current, self.member)
+
+def _unescape(text: str) -> str:
+    # Quotes are doubled, and \n, \r and \t are the only escapes, so regex patterns keep their backslashes
+    return text[1:-1].replace('""', '"').replace('\\n', '\n').replace('\\r', '\r').replace('\\t', '\t')
+
+def _tokenize(text: str) -> list[tuple[str, object]]:
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN_PATTERN.match(text, position)
+        if not match:
+            raise ExpressionError(f"Unexpected character '{text[position]}' at {position} in: {text}")
+        position = match.end()
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'space':
+            continue
+        if kind == 'string':
+            tokens.append(('literal', _unescape(value)))
+        elif kind == 'char':
+            tokens.append(('literal', value[1:-1].encode().decode('unicode_escape')))
+        elif kind == 'number':
+            tokens.append(('literal', float(value) if '.' in value else int(value)))
+        elif kind == 'name' and value.lower() in _KEYWORD_OPERATORS:
+            tokens.append(('operator', _KEYWORD_OPERATORS[value.lower()]))
+        else:
+            tokens.append((kind, value))
+    tokens.append(('end', None))
+    return tokens
+
+def _truthy(value) -> bool:
+    if not isinstance(value, bool):
+        raise ExpressionError(f"Expected a boolean, got {value!r}")
+    return value
+
+def _equals(left, right) -> bool:
+    if isinstance(left, (int, float)) and isinstance(right, (int, float)) and not isinstance(left, bool) and not isinstance(right, bool):
+        return left == right
+    if isinstance(left, (str, bool, int, float, type(None))) or isinstance(right, (str, bool, int, float, type(None))):
+        return type(left) is type(right) and left == right or (left is None and right is None)
+    return left is right
+
+def _compare(operator: str, left, right) -> bool:
+    if operator in ('=', '=='):
+        return _equals(left, right)
+    if operator in ('!=', '<>'):
+        return not _equals(left, right)
+    if left is None or right is None:
+        return False
+    if operator == '<':
+        return left < right
+    if operator == '>':
+        return left > right
+    if operator == '<=':
+        return left <= right
+    return left >= right
+
+def _add(left, right):
+    if isinstance(left, str) or isinstance(right, str):
+        return ('' if left is None else _to_string(left)) + ('' if right is None else _to_string(right))
+    return left + right
+
+def _to_string(value) -> str:
+    if value is None:
+        raise ExpressionError("ToString() on null")
+    if isinstance(value, bool):
+        return 'True' if value else 'False'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return value if isinstance(value, str) else str(getattr(value, 'name', value))
+
+def _to_integer(value) -> int:
+    # Convert.ToInt64 of null is 0, of text it parses the text
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            raise ExpressionError(f"'{value}' is not an integer") from None
+    return int(round(value))
+
+def _to_number(value) -> float:
+    if value is None:
+        return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ExpressionError(f"'{value}' is not a number") from None
+
+@lru_cache(maxsize=None)
+def _regex(pattern: str) -> re.Pattern:
+    # .NET allows (?i) anywhere, Python only at the start, so it applies to the whole pattern here
+    flags = re.IGNORECASE if '(?i)' in pattern else 0
+    return re.compile(pattern.replace('(?i)', ''), flags)
+
+def _is_control(character: str) -> bool:
+    code = ord(character)
+    return code < 0x20 or 0x7f <= code < 0xa0
+
+_STATIC_METHODS = {
+    ('string', 'isnullorwhitespace'): lambda value: value is None or not value.strip(),
+    ('string', 'isnullorempty'): lambda value: not value,
+    ('string', 'concat'): lambda *values: ''.join('' if value is None else _to_string(value) for value in values),
+    ('regex', 'ismatch'): lambda value, pattern, *_: value is not None and _regex(pattern).search(value) is not None,
+    ('convert', 'toint64'): _to_integer,
+    ('convert', 'toint32'): _to_integer,
+    ('convert', 'todecimal'): _to_number,
+    ('convert', 'todouble'): _to_number,
+    ('convert', 'tostring'): lambda value: '' if value is None else _to_string(value),
+    ('convert', 'toboolean'): lambda value: value if isinstance(value, bool) else str(value).strip().lower() == 'true',
+    ('math', 'max'): max,
+    ('math', 'min'): min,
+    ('math', 'abs'): abs,
+    ('math', 'round'): lambda value, digits=0: round(value, digits),
+    ('math', 'floor'): math.floor,
+    ('math', 'ceiling'): math.ceil,
+    ('char', 'iscontrol'): _is_control,
+    ('char', 'iswhitespace'): lambda character: character.isspace(),
+    ('char', 'isletter'): lambda character: character.isalpha(),
+    ('char', 'isdigit'): lambda character: character.isdigit(),
+    ('char', 'isupper'): lambda character: character.isupper(),
+    ('char', 'islower'): lambda character: character.islower()
+}
+_STATIC_TYPES = {'string', 'regex', 'convert', 'math', 'char'}
+
+# Enum types of the Tabular Object Model, `DataType.Int64` is the enum value 'Int64'
+_ENUM_TYPES = {
+    'datatype', 'crossfilteringbehavior', 'relationshipendcardinality', 'securityfilteringbehavior', 'objecttype',
+    'columntype', 'modetype', 'partitionsourcetype', 'aggregatefunction', 'datasourcetype', 'metadatapermission',
+    'modelpermission', 'powerbidatasourceversion'
+}
+
+def _substring(value: str, start: int, length=None) -> str:
+    end = len(value) if length is None else start + length
+    if start < 0 or end > len(value) or end < start:
+        raise ExpressionError(f"Substring({start}, {length}) is out of range of '{value}'")
+    return value[start:end]
+
+def _index_of(value: str, search, *options) -> int:
+    if options and 'ignorecase' in str(options[-1]).lower():
+        return value.lower().find(search.lower())
+    return value.find(search)
+
+_STRING_METHODS = {
+    'toupper': lambda value: value.upper(),
+    'tolower': lambda value: value.lower(),
+    'trim': lambda value, *characters: value.strip(''.join(characters) or None),
+    'trimstart': lambda value, *characters: value.lstrip(''.join(characters) or None),
+    'trimend': lambda value, *characters: value.rstrip(''.join(characters) or None),
+    'contains': lambda value, search: search in value,
+    'startswith': lambda value, search, *_: value.startswith(search),
+    'endswith': lambda value, search, *_: value.endswith(search),
+    'indexof': _index_of,
+    'substring': _substring,
+    'replace': lambda value, old, new: value.replace(old, '' if new is None else new),
+    'tochararray': list,
+    'split': lambda value, *separators: re.split('|'.join(re.escape(separator) for separator in separators), value) if separators else value.split(),
+    'equals': lambda value, other, *_: value == other,
+    'tostring': lambda value: value
+}
+
+def _lambda_method(name: str, items, argument: Callable, scope: Scope):
+    items = list(items or [])
+    if argument is None:
+        if name == 'any':
+            return bool(items)
+        if name == 'count':
+            return len(items)
+        if name in ('first', 'last'):
+            if not items:
+                raise ExpressionError(f"{name.title()}() on an empty collection")
+            return items[0] if name == 'first' else items[-1]
+        if name in ('firstordefault', 'lastordefault'):
+            return (items[0] if name == 'firstordefault' else items[-1]) if items else None
+        if name in ('sum', 'max', 'min'):
+            return {'sum': sum, 'max': max, 'min': min}[name](items)
+        raise ExpressionError(f"{name}() needs an argument")
+
+    def apply(item):
+        return argument(scope.enter(item))
+
+    if name == 'any':
+        return any(_truthy(apply(item)) for item in items)
+    if name == 'all':
+        return all(_truthy(apply(item)) for item in items)
+    if name == 'where':
+        return [item for item in items if _truthy(apply(item))]
+    if name == 'count':
+        return sum(1 for item in items if _truthy(apply(item)))
+    if name == 'select':
+        return [apply(item) for item in items]
+    if name in ('first', 'firstordefault', 'last', 'lastordefault'):
+        matches = [item for item in items if _truthy(apply(item))]
+        if not matches and name in ('first', 'last'):
+            raise ExpressionError(f"{name.title()}() found no match")
+        return (matches[0] if name.startswith('first') else matches[-1]) if matches else None
+    if name in ('sum', 'max', 'min'):
+        return {'sum': sum, 'max': max, 'min': min}[name](apply(item) for item in items)
+    return sorted(items, key=apply, reverse=name == 'orderbydescending')
+
+def _call_method(target, name: str, arguments: list[Callable], scope: Scope):
+    lowered = name.lower()
+    if isinstance(target, (list, tuple)) and lowered in _LAMBDA_METHODS:
+        if len(arguments) > 1:
+            raise ExpressionError(f"{name}() takes at most one argument")
+        return _lambda_method(lowered, target, arguments[0] if arguments else None, scope)
+
+    values = [argument(scope) for argument in arguments]
+    if target is None:
+        raise ExpressionError(f"{name}() on null")
+    if isinstance(target, str) and lowered in _STRING_METHODS:
+        return _STRING_METHODS[lowered](target, *values)
+    if isinstance(target, (list, tuple)) and lowered == 'contains':
+        return any(_equals(item, values[0]) for item in target)
+    if lowered == 'tostring':
+        return _to_string(target)
+    return scope.member(target, name, values)
+
+class _Parser:
+    """Recursive descent over the tokens, every parse method returns a closure of a Scope."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = _tokenize(text)
+        self.position = 0
+
+    def peek(self, offset: int = 0) -> tuple[str, object]:
+        return self.tokens[min(self.position + offset, len(self.tokens) - 1)]
+
+    def accept(self, *operators: str):
+        kind, value = self.peek()
+        if kind == 'operator' and value in operators:
+            self.position += 1
+            return value
+        return None
+
+    def expect(self, operator: str) -> None:
+        if not self.accept(operator):
+            raise ExpressionError(f"Expected '{operator}' but found '{self.peek()[1]}' in: {self.text}")
+
+    def parse(self) -> Callable:
+        expression = self.conditional()
+        if self.peek()[0] != 'end':
+            raise ExpressionError(f"Unexpected '{self.peek()[1]}' in: {self.text}")
+        return expression
+
+    def conditional(self) -> Callable:
+        condition = self.logical_or()
+        if not self.accept('?'):
+            return condition
+        when_true = self.conditional()
+        self.expect(':')
+        when_false = self.conditional()
+        return lambda scope: when_true(scope) if _truthy(condition(scope)) else when_false(scope)
+
+    def logical_or(self) -> Callable:
+        left = self.logical_and()
+        while self.accept('||'):
+            right = self.logical_and()
+            left = (lambda left, right: lambda scope: _truthy(left(scope)) or _truthy(right(scope)))(left, right)
+        return left
+
+    def logical_and(self) -> Callable:
+        left = self.comparison()
+        while self.accept('&&'):
+            right = self.comparison()
+            left = (lambda left, right: lambda scope: _truthy(left(scope)) and _truthy(right(scope)))(left, right)
+        return left
+
+    def comparison(self) -> Callable:
+        left = self.additive()
+        while True:
+            operator = self.accept(*_COMPARISONS)
+            if operator is None:
+                return left
+            right = self.additive()
+            left = (lambda operator, left, right: lambda scope: _compare(operator, left(scope), right(scope)))(operator, left, right)
+
+    def additive(self) -> Callable:
+        left = self.multiplicative()
+        while True:
+            operator = self.accept('+', '-')
+            if operator is None:
+                return left
+            right = self.multiplicative()
+            if operator == '+':
+                left = (lambda left, right: lambda scope: _add(left(scope), right(scope)))(left, right)
+            else:
+                left = (lambda left, right: lambda scope: left(scope) - right(scope))(left, right)
+
+    def multiplicative(self) -> Callable:
+        left = self.unary()
+        while True:
+            operator = self.accept('*', '/', '%')
+            if operator is None:
+                return left
+            right = self.unary()
+            left = (lambda operator, left, right: lambda scope: _arithmetic(operator, left(scope), right(scope)))(operator, left, right)
+
+    def unary(self) -> Callable:
+        if self.accept('!'):
+            operand = self.unary()
+            return lambda scope: not _truthy(operand(scope))
+        if self.accept('-'):
+            operand = self.unary()
+            return lambda scope: -operand(scope)
+        return self.postfix(self.primary())
+
+    def arguments(self) -> list[Callable]:
+        arguments = []
+        if not self.accept(')'):
+            arguments.append(self.conditional())
+            while self.accept(','):
+                arguments.append(self.conditional())
+            self.expect(')')
+        return arguments
+
+    def postfix(self, target: Callable) -> Callable:
+        while True:
+            if self.accept('.'):
+                kind, name = self.peek()
+                if kind != 'name':
+                    raise ExpressionError(f"Expected a member name after '.' in: {self.text}")
+                self.position += 1
+                if self.accept('('):
+                    target = (lambda target, name, arguments: lambda scope: _call_method(target(scope), name, arguments, scope))(target, name, self.arguments())
+                else:
+                    target = (lambda target, name: lambda scope: _member(target(scope), name, scope))(target, name)
+            elif self.accept('['):
+                index = self.conditional()
+                self.expect(']')
+                target = (lambda target, index: lambda scope: _index(target(scope), index(scope)))(target, index)
+            else:
+                return target
+
+    def primary(self) -> Callable:
+        kind, value = self.peek()
+        self.position += 1
+
+        if kind == 'literal':
+            return lambda scope: value
+        if kind == 'operator' and value == '(':
+            expression = self.conditional()
+            self.expect(')')
+            return expression
+        if kind != 'name':
+            raise ExpressionError(f"Unexpected '{value}' in: {self.text}")
+
+        lowered = value.lower()
+        if lowered in ('true', 'false'):
+            constant = lowered == 'true'
+            return lambda scope: constant
+        if lowered == 'null':
+            return lambda scope: None
+        if lowered == 'it':
+            return lambda scope: scope.it
+        if lowered == 'outerit':
+            return lambda scope: (scope.outer or scope).it
+        if lowered == 'current':
+            return lambda scope: scope.current
+
+        if lowered in _STATIC_TYPES:
+            if lowered == 'char' and self.accept('('):
+                code = self.conditional()
+                self.expect(')')
+                return lambda scope: chr(code(scope))
+            if self.peek() == ('operator', '.') and self.peek(1)[0] == 'name' and self.peek(2) == ('operator', '('):
+                method = self.peek(1)[1].lower()
+                self.position += 3
+                function = _STATIC_METHODS.get((lowered, method))
+                if function is None:
+                    raise ExpressionError(f"Unsupported method {value}.{self.tokens[self.position - 2][1]} in: {self.text}")
+                arguments = self.arguments()
+                return lambda scope: function(*(argument(scope) for argument in arguments))
+
+        if self.accept('('):
+            # A method of the object in scope, e.g. GetAnnotation("name")
+            arguments = self.arguments()
+            return lambda scope: _call_method(scope.it, value, arguments, scope)
+
+        if lowered in _ENUM_TYPES and self.peek() == ('operator', '.') and self.peek(1)[0] == 'name' and self.peek(2) != ('operator', '('):
+            enum_value = self.peek(1)[1]
+            self.position += 2
+            return lambda scope: enum_value
+
+        return lambda scope: _member(scope.it, value, scope)
+
+def _member(target, name: str, scope: Scope):
+    if target is None:
+        raise ExpressionError(f"'{name}' of null")
+    lowered = name.lower()
+    if isinstance(target, str):
+        if lowered == 'length':
+            return len(target)
+        raise ExpressionError(f"Unknown member '{name}' of text")
+    if isinstance(target, (list, tuple)) and lowered in ('count', 'length'):
+        return len(target)
+    return scope.member(target, name, None)
+
+def _index(target, index):
+    if target is None:
+        raise ExpressionError("Indexer on null")
+    if isinstance(target, dict):
+        return target.get(index)
+    try:
+        return target[index]
+    except (IndexError, TypeError):
+        raise ExpressionError(f"Index {index!r} is out of range") from None
+
+def _arithmetic(operator: str, left, right):
+    if operator == '*':
+        return left * right
+    if operator == '%':
+        return left % right
+    if right == 0:
+        raise ExpressionError("Division by zero")
+    if isinstance(left, int) and isinstance(right, int):
+        return int(left / right)
+    return left / right
+
+@lru_cache(maxsize=None)
+def compile_expression(text: str) -> Callable[[Scope], object]:
+    """
+    Compile a Dynamic LINQ rule expression, cached by its text.
+
+    Parameters:
+        text (str): E.g. `string.IsNullOrWhitespace(Description) and IsHidden == false`
+
+    Returns:
+        Callable[[Scope], object]: Evaluates the expression in a scope
+    """
+    return _Parser(text).parse()
+
+def evaluate(text: str, obj, member: Callable) -> object:
+    """
+    Evaluate a rule expression on an object.
+
+    Parameters:
+        text (str): Dynamic LINQ expression
+        obj: Object the rule is evaluated on, `it` and `current` of the expression
+        member (Callable): member(obj, name, arguments) resolves a property (arguments None) or calls
+            a method of an object of the model
+
+    Returns:
+        The value of the expression
+    """
+    return compile_expression(text)(Scope(obj, None, obj, member))
@@ -0,0 +1,421 @@
+import re
+import json
+from collections import defaultdict
+from typing import Callable, Optional
+
+from dynamic_linq import ExpressionError, evaluate
+from src.tmdl_model import COLUMN_TYPES, TABLE_TYPES, ModelObject, enum_value, split_reference, unquote
+
+# Comments and text literals of DAX, removed before references are collected
+_DAX_NOISE_PATTERN = re.compile(r'//[^\n]*|--[^\n]*|/\*.*?\*/|"(?:[^"]|"")*"', re.DOTALL)
+# 'Table'[Name], Table[Name] or [Name], a quoted 'Table' and an unquoted name that may be a table
+_DAX_REFERENCE_PATTERN = re.compile(r"('(?:[^']|'')+'|\b[A-Za-z_]\w*)?\s*\[((?:[^\]]|\]\])+)\]|('(?:[^']|'')+')|\b([A-Za-z_]\w*)\b(?!\s*[\[(])")
+
+# Tabular Object Model type of every object type, e.g. the Key.ObjectType of a dependency
+_OBJECT_TYPES = {
+    'Model': 'Model', 'Table': 'Table', 'CalculatedTable': 'Table', 'CalculationGroup': 'Table', 'DataColumn': 'Column',
+    'CalculatedColumn': 'Column', 'CalculatedTableColumn': 'Column', 'Measure': 'Measure', 'KPI': 'KPI',
+    'Hierarchy': 'Hierarchy', 'Level': 'Level', 'Partition': 'Partition', 'Relationship': 'Relationship',
+    'ModelRole': 'Role', 'ModelRoleMember': 'RoleMembership', 'TablePermission': 'TablePermission',
+    'Perspective': 'Perspective', 'ProviderDataSource': 'DataSource', 'StructuredDataSource': 'DataSource',
+    'NamedExpression': 'Expression', 'CalculationItem': 'CalculationItem', 'Variation': 'Variation'
+}
+_COLUMN_KINDS = {'DataColumn': 'Data', 'CalculatedColumn': 'Calculated', 'CalculatedTableColumn': 'CalculatedTableColumn'}
+
+class Dependency:
+    """One object an expression refers to (`Key`) and every reference to it (`Value`), like TOM's DependsOn entries."""
+
+    __slots__ = ('key', 'value')
+
+    def __init__(self, key: ModelObject, value: list['Reference']):
+        self.key = key
+        self.value = value
+
+class Reference:
+    """A reference in a DAX expression, fully qualified when it names the table, e.g. 'Sales'[Amount]."""
+
+    __slots__ = ('fully_qualified',)
+
+    def __init__(self, fully_qualified: bool):
+        self.fully_qualified = fully_qualified
+
+class ReferencedBy(list):
+    """The objects whose expression refers to an object, all_measures adds the measures that do so through others."""
+
+    def __init__(self, objects: list[ModelObject], all_measures: Callable[[], list[ModelObject]]):
+        super().__init__(objects)
+        self._all_measures = all_measures
+
+    @property
+    def all_measures(self) -> list[ModelObject]:
+        return self._all_measures()
+
+def quote_table(name: str) -> str:
+    return "'" + name.replace("'", "''") + "'"
+
+def object_label(obj: ModelObject) -> str:
+    """Name of an object in messages, in DAX notation where there is one."""
+    if obj.object_type in TABLE_TYPES:
+        return quote_table(obj.name)
+    if obj.object_type in COLUMN_TYPES or obj.object_type == 'Measure':
+        return f'{quote_table(obj.table.name)}[{obj.name}]'
+    if obj.object_type in ('Partition', 'Hierarchy', 'CalculationItem', 'KPI'):
+        return f'{quote_table(obj.table.name)} {obj.object_type.lower()} {obj.name}'
+    if obj.object_type == 'Level':
+        return f'{quote_table(obj.table.name)} hierarchy {obj.parent.name} level {obj.name}'
+    if obj.object_type == 'Relationship':
+        return f"{obj.properties.get('fromColumn', '?')} -> {obj.properties.get('toColumn', '?')}"
+    if obj.object_type == 'TablePermission':
+        return f'role {obj.parent.name} table {quote_table(obj.name)}'
+    return f'{obj.object_type} {obj.name}'
+
+class ModelIndex:
+    """
+    Lookups of a semantic model that rule expressions need, built once per model: relationship
+    ends, sort by columns, hierarchy levels, row level security and the DAX dependencies of
+    every expression. member() resolves the Tabular Object Model members rules use on it.
+
+    Parameters:
+        model (ModelObject): Model read by src.tmdl_model.load_model
+    """
+
+    def __init__(self, model: ModelObject):
+        self.model = model
+        self.tables = list(model.children['tables'])
+        self.columns = [column for table in self.tables for column in table.children['columns']]
+        self.measures = [measure for table in self.tables for measure in table.children['measures']]
+        self.kpis = [kpi for measure in self.measures for kpi in measure.children['kpis']]
+        self.partitions = [partition for table in self.tables for partition in table.children['partitions']]
+        self.hierarchies = [hierarchy for table in self.tables for hierarchy in table.children['hierarchies']]
+        self.levels = [level for hierarchy in self.hierarchies for level in hierarchy.children['levels']]
+        self.calculation_items = [item for table in self.tables for item in table.children['calculation_items']]
+        self.relationships = list(model.children['relationships'])
+        self.roles = list(model.children['roles'])
+        self.table_permissions = [permission for role in self.roles for permission in role.children['table_permissions']]
+        self.data_sources = list(model.children['data_sources'])
+
+        self._tables_by_name = {table.name.lower(): table for table in self.tables}
+        self._columns_by_name = {(column.table.name.lower(), column.name.lower()): column for column in self.columns}
+        self._measures_by_name = {measure.name.lower(): measure for measure in self.measures}
+
+        self.relationship_ends: dict[ModelObject, tuple] = {}
+        self.used_in_relationships = defaultdict(list)
+        for relationship in self.relationships:
+            ends = tuple(self._column_reference(relationship.properties.get(side)) for side in ('fromColumn', 'toColumn'))
+            self.relationship_ends[relationship] = ends
+            for column in ends:
+                if column is not None:
+                    for obj in (column, column.table):
+                        if relationship not in self.used_in_relationships[obj]:
+                            self.used_in_relationships[obj].append(relationship)
+
+        self.sort_by = {}
+        self.used_in_sort_by = defaultdict(list)
+        for column in self.columns:
+            if 'sortByColumn' in column.properties:
+                sort_by = self._column(column.table.name, unquote(str(column.properties['sortByColumn'])))
+                self.sort_by[column] = sort_by
+                if sort_by is not None:
+                    self.used_in_sort_by[sort_by].append(column)
+
+        self.level_columns = {}
+        self.used_in_hierarchies = defaultdict(list)
+        for level in self.levels:
+            column = self._column(level.table.name, unquote(str(level.properties.get('column', ''))))
+            self.level_columns[level] = column
+            if column is not None and level.parent not in self.used_in_hierarchies[column]:
+                self.used_in_hierarchies[column].append(level.parent)
+
+        self.used_in_variations = defaultdict(list)
+        for column in self.columns:
+            for variation in column.children['variations']:
+                if 'defaultColumn' in variation.properties:
+                    default_column = self._column_reference(variation.properties['defaultColumn'])
+                    if default_column is not None:
+                        self.used_in_variations[default_column].append(variation)
+
+        self.depends_on: dict[ModelObject, list[Dependency]] = {}
+        self.referenced_by = defaultdict(list)
+        for obj in self.measures + self.kpis + self.calculation_items + self.table_permissions + [column for column in self.columns if column.object_type == 'CalculatedColumn'] + [table for table in self.tables if table.object_type == 'CalculatedTable']:
+            self.depends_on[obj] = self._dax_dependencies(obj)
+            for dependency in self.depends_on[obj]:
+                self.referenced_by[dependency.key].append(obj)
+
+    def _column(self, table: str, column: str) -> Optional[ModelObject]:
+        return self._columns_by_name.get((table.lower(), column.lower()))
+
+    def _column_reference(self, reference) -> Optional[ModelObject]:
+        if not reference:
+            return None
+        try:
+            return self._column(*split_reference(str(reference)))
+        except ValueError:
+            return None
+
+    def _home_table(self, obj: ModelObject) -> Optional[ModelObject]:
+        if obj.object_type == 'TablePermission':
+            return self._tables_by_name.get(obj.name.lower())
+        return obj.table if obj.object_type not in TABLE_TYPES else obj
+
+    def _dax_dependencies(self, obj: ModelObject) -> list[Dependency]:
+        # Measure names are unique in a model, column names only within their table, so unqualified
+        # names are a measure first and else a column of the expression's own table
+        expression = _DAX_NOISE_PATTERN.sub(' ', self.expression(obj))
+        home = self._home_table(obj)
+        references: dict[ModelObject, list[Reference]] = {}
+
+        for match in _DAX_REFERENCE_PATTERN.finditer(expression):
+            qualifier, name, quoted_table, bare_name = match.groups()
+            target, fully_qualified = None, False
+            if name is not None:
+                name = name.replace(']]', ']')
+                table = self._tables_by_name.get(unquote(qualifier).lower()) if qualifier else None
+                if table is not None:
+                    fully_qualified = True
+                    target = self._column(table.name, name) or next((measure for measure in table.children['measures'] if measure.name.lower() == name.lower()), None)
+                else:
+                    target = self._measures_by_name.get(name.lower()) or (self._column(home.name, name) if home is not None else None)
+            elif quoted_table is not None:
+                target = self._tables_by_name.get(unquote(quoted_table).lower())
+            elif bare_name is not None:
+                target = self._tables_by_name.get(bare_name.lower())
+
+            if target is not None and target is not obj:
+                references.setdefault(target, []).append(Reference(fully_qualified))
+
+        return [Dependency(target, value) for target, value in references.items()]
+
+    def all_measures_referencing(self, obj: ModelObject) -> list[ModelObject]:
+        """Measures that refer to an object directly or through other measures and calculated columns."""
+        found, pending, seen = [], list(self.referenced_by.get(obj, [])), set()
+        while pending:
+            referrer = pending.pop(0)
+            if referrer in seen:
+                continue
+            seen.add(referrer)
+            if referrer.object_type == 'Measure':
+                found.append(referrer)
+            pending += self.referenced_by.get(referrer, [])
+        return found
+
+    def expression(self, obj: ModelObject) -> str:
+        if obj.object_type == 'Partition':
+            return str(obj.properties.get('source', obj.expression if obj.expression not in ('m', 'calculated', 'query', 'entity') else ''))
+        return obj.expression or ''
+
+    def row_level_security(self, obj: ModelObject) -> list[str]:
+        # Like TOM's indexer: the filters of the roles on a table, or of a role on its tables, that are set
+        if obj.object_type == 'ModelRole':
+            return [permission.expression for permission in obj.children['table_permissions'] if permission.expression]
+        return [
+            permission.expression
+            for permission in self.table_permissions
+            if permission.name.lower() == obj.name.lower() and permission.expression
+        ]
+
+    def object_level_security(self, obj: ModelObject) -> list[str]:
+        permissions = []
+        for role in self.roles:
+            table = obj if obj.object_type in TABLE_TYPES else obj.table
+            permission = next((permission for permission in role.children['table_permissions'] if permission.name.lower() == table.name.lower()), None)
+            if permission is not None and obj.object_type in COLUMN_TYPES:
+                permission = next((column for column in permission.children['column_permissions'] if column.name.lower() == obj.name.lower()), None)
+            value = permission.properties.get('metadataPermission', 'default') if permission is not None else 'default'
+            permissions.append(enum_value(value))
+        return permissions
+
+    def member(self, obj, name: str, arguments: Optional[list]):
+        """Resolve a property (arguments None) or call a method of a model object, for dynamic_linq."""
+        lowered = name.lower()
+        if not isinstance(obj, ModelObject):
+            attribute = {'key': 'key', 'value': 'value', 'fullyqualified': 'fully_qualified', 'allmeasures': 'all_measures'}.get(lowered)
+            if attribute is None or not hasattr(obj, attribute) or arguments is not None:
+                raise ExpressionError(f"Unknown member '{name}' of {type(obj).__name__}")
+            return getattr(obj, attribute)
+
+        if arguments is not None:
+            if lowered == 'getannotation':
+                return obj.annotations.get(arguments[0])
+            if lowered == 'hasannotation':
+                return arguments[0] in obj.annotations
+            raise ExpressionError(f"Unsupported method {name}() of {obj.object_type}")
+
+        accessor = _MEMBERS.get(lowered)
+        if accessor is not None:
+            return accessor(self, obj)
+
+        # Any other property as written in the TMDL file, flags that are not set are false
+        for key, value in obj.properties.items():
+            if key.lower() == lowered:
+                return value if isinstance(value, bool) else str(value)
+        if lowered.startswith('is'):
+            return False
+        raise ExpressionError(f"Unknown member '{name}' of {obj.object_type} {obj.name}")
+
+def _table_type_name(index: ModelIndex, table: ModelObject) -> str:
+    if any(str(partition.properties.get('mode', '')).lower() == 'directquery' for partition in table.children['partitions']):
+        return 'Table (DirectQuery)'
+    return {'Table': 'Table', 'CalculatedTable': 'Calculated Table', 'CalculationGroup': 'Calculation Group Table'}[table.object_type]
+
+def _data_type(index: ModelIndex, obj: ModelObject) -> str:
+    return enum_value(obj.properties.get('dataType', 'unknown' if obj.object_type == 'DataColumn' else 'automatic'))
+
+def _dax_object_name(index: ModelIndex, obj: ModelObject) -> str:
+    if obj.object_type in TABLE_TYPES:
+        return quote_table(obj.name)
+    if obj.object_type in COLUMN_TYPES:
+        return f'{quote_table(obj.table.name)}[{obj.name}]'
+    return f'[{obj.name}]'
+
+def _relationship_end(side: int, table: bool) -> Callable:
+    def accessor(index: ModelIndex, obj: ModelObject):
+        column = index.relationship_ends.get(obj, (None, None))[side]
+        return column.table if table and column is not None else column
+    return accessor
+
+def _children(kind: str) -> Callable:
+    return lambda index, obj: list(obj.children[kind])
+
+def _property(name: str, default: str = '') -> Callable:
+    return lambda index, obj: str(obj.properties.get(name, default))
+
+def _enum_property(name: str, default: str) -> Callable:
+    return lambda index, obj: enum_value(obj.properties.get(name, default))
+
+# Tabular Object Model members of the rule expressions, by lower case name like Dynamic LINQ resolves them
+_MEMBERS: dict[str, Callable] = {
+    'name': lambda index, obj: obj.name,
+    'description': lambda index, obj: obj.description,
+    'expression': lambda index, obj: index.expression(obj),
+    'query': lambda index, obj: index.expression(obj),
+    'model': lambda index, obj: index.model,
+    'table': lambda index, obj: index._home_table(obj) if obj.object_type == 'TablePermission' else obj.table,
+    'objecttype': lambda index, obj: _OBJECT_TYPES.get(obj.object_type, obj.object_type),
+    'objecttypename': lambda index, obj: _table_type_name(index, obj) if obj.object_type in TABLE_TYPES else obj.object_type,
+    'daxobjectname': _dax_object_name,
+    'daxobjectfullname': lambda index, obj: f'{quote_table(obj.table.name)}[{obj.name}]' if obj.object_type == 'Measure' else _dax_object_name(index, obj),
+    'type': lambda index, obj: _COLUMN_KINDS[obj.object_type] if obj.object_type in COLUMN_TYPES else enum_value(obj.properties.get('type', obj.object_type)),
+    'ishidden': lambda index, obj: obj.flag('isHidden'),
+    'iskey': lambda index, obj: obj.flag('isKey'),
+    'isavailableinmdx': lambda index, obj: obj.flag('isAvailableInMdx', True),
+    'isactive': lambda index, obj: obj.flag('isActive', True),
+    'datatype': _data_type,
+    'datacategory': _property('dataCategory'),
+    'formatstring': _property('formatString'),
+    'displayfolder': _property('displayFolder'),
+    'sourcecolumn': _property('sourceColumn'),
+    'sourceexpression': _property('sourceExpression'),
+    'summarizeby': _enum_property('summarizeBy', 'default'),
+    'mode': _enum_property('mode', 'default'),
+    'sourcetype': lambda index, obj: enum_value(obj.properties.get('type') or 'none'),
+    'datasource': lambda index, obj: next((source for source in index.data_sources if source.name == unquote(str(obj.properties.get('dataSource', '')))), None),
+    'usedbypartitions': lambda index, obj: [partition for partition in index.partitions if unquote(str(partition.properties.get('dataSource', ''))) == obj.name],
+    'sortbycolumn': lambda index, obj: index.sort_by.get(obj),
+    'alternateof': lambda index, obj: next(iter(obj.node.nodes('alternateOf')), None) if obj.node else None,
+    'usedinrelationships': lambda index, obj: list(index.used_in_relationships.get(obj, [])),
+    'usedinsortby': lambda index, obj: list(index.used_in_sort_by.get(obj, [])),
+    'usedinhierarchies': lambda index, obj: list(index.used_in_hierarchies.get(obj, [])),
+    'usedinvariations': lambda index, obj: list(index.used_in_variations.get(obj, [])),
+    'dependson': lambda index, obj: list(index.depends_on.get(obj, [])),
+    'referencedby': lambda index, obj: ReferencedBy(index.referenced_by.get(obj, []), lambda: index.all_measures_referencing(obj)),
+    'rowlevelsecurity': lambda index, obj: index.row_level_security(obj),
+    'objectlevelsecurity': lambda index, obj: index.object_level_security(obj),
+    'inperspective': lambda index, obj: {perspective.name: any(table.name == obj.name for table in perspective.children['tables']) for perspective in index.model.children['perspectives']},
+    'columns': _children('columns'),
+    'measures': _children('measures'),
+    'partitions': _children('partitions'),
+    'hierarchies': _children('hierarchies'),
+    'levels': _children('levels'),
+    'members': _children('members'),
+    'tablepermissions': _children('table_permissions'),
+    'calculationitems': _children('calculation_items'),
+    'calculationgroup': lambda index, obj: obj.table,
+    'hierarchy': lambda index, obj: obj.parent,
+    'column': lambda index, obj: index.level_columns.get(obj),
+    'measure': lambda index, obj: obj.parent,
+    'tables': lambda index, obj: list(index.tables),
+    'alltables': lambda index, obj: list(index.tables),
+    'allcolumns': lambda index, obj: list(index.columns),
+    'allmeasures': lambda index, obj: list(index.measures),
+    'allpartitions': lambda index, obj: list(index.partitions),
+    'allhierarchies': lambda index, obj: list(index.hierarchies),
+    'alllevels': lambda index, obj: list(index.levels),
+    'allcalculationitems': lambda index, obj: list(index.calculation_items),
+    'relationships': lambda index, obj: list(index.relationships),
+    'roles': lambda index, obj: list(index.roles),
+    'perspectives': lambda index, obj: list(index.model.children['perspectives']),
+    'datasources': lambda index, obj: list(index.data_sources),
+    'expressions': lambda index, obj: list(index.model.children['expressions']),
+    'defaultpowerbidatasourceversion': _enum_property('defaultPowerBIDataSourceVersion', 'powerBI_V1'),
+    'modelpermission': _enum_property('modelPermission', 'none'),
+    'fromtable': _relationship_end(0, True),
+    'fromcolumn': _relationship_end(0, False),
+    'totable': _relationship_end(1, True),
+    'tocolumn': _relationship_end(1, False),
+    'fromcardinality': _enum_property('fromCardinality', 'many'),
+    'tocardinality': _enum_property('toCardinality', 'one'),
+    'crossfilteringbehavior': _enum_property('crossFilteringBehavior', 'oneDirection'),
+    'securityfilteringbehavior': _enum_property('securityFilteringBehavior', 'oneDirection')
+}
+
+def load_model_rules(path: str) -> list[dict]:
+    """Read a Tabular Editor best practice rule file, a JSON list of rules."""
+    with open(path, encoding='utf-8-sig') as file:
+        return json.load(file)
+
+def analyze_model(model: ModelObject, rules: list[dict]) -> tuple[list[dict], list[dict]]:
+    """
+    Evaluate best practice rules on every object of a semantic model in their scope, like
+    Tabular Editor's Best Practice Analyzer.
+
+    Rules listed in a BestPracticeAnalyzer_IgnoreRules annotation are skipped for the object that
+    has it, or for the whole model when the model has it. Rules that need a higher compatibility
+    level than the model's are skipped.
+
+    Parameters:
+        model (ModelObject): Model read by src.tmdl_model.load_model
+        rules (list[dict]): Rules with 'ID', 'Name', 'Severity', 'Scope' and 'Expression'
+
+    Returns:
+        tuple[list[dict], list[dict]]: Violations, with 'rule', 'name', 'severity', 'object', 'path'
+            and 'line', and rule errors, with 'rule' and 'error', of expressions that fail
+    """
+    index = ModelIndex(model)
+    objects = defaultdict(list)
+    for obj in (
+        [model] + index.tables + index.columns + index.measures + index.kpis + index.hierarchies + index.levels
+        + index.partitions + index.calculation_items + index.relationships + index.roles + index.table_permissions
+        + list(model.children['perspectives']) + index.data_sources + list(model.children['expressions'])
+    ):
+        objects[obj.object_type].append(obj)
+
+    model_ignored = model.ignored_rules()
+    compatibility_level = int(model.properties.get('compatibilityLevel', 0) or 0)
+    violations, errors = [], []
+
+    for rule in rules:
+        if rule['ID'] in model_ignored or compatibility_level < int(rule.get('CompatibilityLevel') or 0):
+            continue
+
+        scope = [object_type.strip() for object_type in rule.get('Scope', '').split(',')]
+        for obj in (obj for object_type in scope for obj in objects.get(object_type, [])):
+            if rule['ID'] in obj.ignored_rules():
+                continue
+            try:
+                violated = evaluate(rule['Expression'], obj, index.member)
+            except (ExpressionError, TypeError, ValueError, AttributeError, KeyError) as error:
+                errors.append({'rule': rule['ID'], 'object': object_label(obj), 'error': str(error)})
+                continue
+
+            if violated is True:
+                path, line = obj.location
+                violations.append({
+                    'rule': rule['ID'],
+                    'name': rule.get('Name', rule['ID']),
+                    'severity': int(rule.get('Severity', 1)),
+                    'object': object_label(obj),
+                    'path': path,
+                    'line': line
+                })
+
+    return violations, errors
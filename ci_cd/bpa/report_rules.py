@@ -0,0 +1,339 @@
+import os
+import re
+import json
+import math
+from functools import lru_cache
+from typing import Callable, Optional
+
+# Steps of the JSONPath subset the rules use: ..name, .name, .*, [*], [n] and ['name']
+_PATH_STEP_PATTERN = re.compile(r"\.\.(\w+|\*)|\.(\w+|\*)|\[(\*|-?\d+|'[^']*')\]")
+
+class RuleError(Exception):
+    """A report rule that uses an unknown operation or part, or fails while it is evaluated."""
+
+def _read_json(path: str):
+    with open(path, encoding='utf-8-sig') as file:
+        return json.load(file)
+
+class ReportDefinition:
+    """
+    A report in the PBIR folder format: definition/report.json, the pages in definition/pages
+    with their visuals and the bookmarks.
+
+    Parameters:
+        report_dir (str): A *.Report folder
+    """
+
+    def __init__(self, report_dir: str):
+        definition_dir = os.path.join(report_dir, 'definition')
+        if not os.path.isfile(os.path.join(definition_dir, 'report.json')):
+            raise FileNotFoundError(f"{report_dir} has no definition/report.json, only the PBIR report format is supported")
+
+        self.name = os.path.basename(os.path.normpath(report_dir))
+        self.report_path = os.path.join(definition_dir, 'report.json')
+        self.report = _read_json(self.report_path)
+
+        pages_dir = os.path.join(definition_dir, 'pages')
+        page_names = sorted(name for name in os.listdir(pages_dir) if os.path.isdir(os.path.join(pages_dir, name))) if os.path.isdir(pages_dir) else []
+        pages_file = os.path.join(pages_dir, 'pages.json')
+        if os.path.isfile(pages_file):
+            order = _read_json(pages_file).get('pageOrder', [])
+            page_names.sort(key=lambda name: order.index(name) if name in order else len(order))
+
+        self.pages: list[dict] = []
+        self.page_paths: dict[str, str] = {}
+        self.visuals: dict[str, list[dict]] = {}
+        for page_name in page_names:
+            page_path = os.path.join(pages_dir, page_name, 'page.json')
+            if not os.path.isfile(page_path):
+                continue
+            page = _read_json(page_path)
+            self.pages.append(page)
+            self.page_paths[page.get('name', page_name)] = page_path
+
+            visuals_dir = os.path.join(pages_dir, page_name, 'visuals')
+            self.visuals[page.get('name', page_name)] = [
+                _read_json(os.path.join(visuals_dir, visual_name, 'visual.json'))
+                for visual_name in (sorted(os.listdir(visuals_dir)) if os.path.isdir(visuals_dir) else [])
+                if os.path.isfile(os.path.join(visuals_dir, visual_name, 'visual.json'))
+            ]
+
+        bookmarks_dir = os.path.join(definition_dir, 'bookmarks')
+        self.bookmarks = [
+            _read_json(os.path.join(bookmarks_dir, file_name))
+            for file_name in (sorted(os.listdir(bookmarks_dir)) if os.path.isdir(bookmarks_dir) else [])
+            if file_name.endswith('.bookmark.json')
+        ]
+
+    def part(self, name: str, page: Optional[dict] = None):
+        """A part of the report the rules refer to: 'Report', 'Pages', 'Visuals' (of the page, or all) or 'Bookmarks'."""
+        if name == 'Report':
+            return self.report
+        if name == 'Pages':
+            return list(self.pages)
+        if name in ('Visuals', 'AllVisuals'):
+            if page is not None and name == 'Visuals':
+                return list(self.visuals.get(page.get('name'), []))
+            return [visual for visuals in self.visuals.values() for visual in visuals]
+        if name == 'Bookmarks':
+            return list(self.bookmarks)
+        raise RuleError(f"Unknown report part '{name}'")
+
+def _truthy(value) -> bool:
+    # JsonLogic truthiness: empty arrays and strings, 0 and null are false
+    if isinstance(value, (list, tuple, str)):
+        return len(value) > 0
+    return bool(value) if value is not None else False
+
+def _loose_equals(left, right) -> bool:
+    if isinstance(left, (int, float)) and isinstance(right, str) or isinstance(left, str) and isinstance(right, (int, float)):
+        try:
+            return float(left) == float(right)
+        except ValueError:
+            return False
+    return left == right
+
+def _get(data, path: str, default=None):
+    if path in ('', None):
+        return data
+    for key in str(path).split('.'):
+        if isinstance(data, dict):
+            if key not in data:
+                return default
+            data = data[key]
+        elif isinstance(data, list) and key.lstrip('-').isdigit():
+            position = int(key)
+            if not -len(data) <= position < len(data):
+                return default
+            data = data[position]
+        else:
+            return default
+    return data
+
+def _descendants(node) -> list:
+    values = []
+    pending = [node]
+    while pending:
+        value = pending.pop()
+        values.append(value)
+        children = list(value.values()) if isinstance(value, dict) else value if isinstance(value, list) else []
+        pending.extend(reversed(children))
+    return values
+
+@lru_cache(maxsize=None)
+def _compile_path(path: str) -> tuple:
+    if not path.startswith('$'):
+        raise RuleError(f"JSONPath '{path}' does not start with $")
+    steps, position = [], 1
+    while position < len(path):
+        match = _PATH_STEP_PATTERN.match(path, position)
+        if not match:
+            raise RuleError(f"Unsupported JSONPath '{path}' at position {position}")
+        steps.append(match.groups())
+        position = match.end()
+    return tuple(steps)
+
+def json_path(data, path: str) -> list:
+    """Values matching a JSONPath of the subset $, ..name, .name, .*, [*], [n] and ['name'], e.g. '$..projections[*]'."""
+    nodes = [data]
+    for recursive, child, bracket in _compile_path(path):
+        matches = []
+        for node in nodes:
+            if recursive is not None:
+                for value in _descendants(node):
+                    if isinstance(value, dict):
+                        if recursive == '*':
+                            matches.extend(value.values())
+                        elif recursive in value:
+                            matches.append(value[recursive])
+                    elif recursive == '*' and isinstance(value, list):
+                        matches.extend(value)
+            else:
+                key = child if child is not None else bracket
+                if key == '*':
+                    matches.extend(node.values() if isinstance(node, dict) else node if isinstance(node, list) else [])
+                elif key.startswith("'"):
+                    if isinstance(node, dict) and key[1:-1] in node:
+                        matches.append(node[key[1:-1]])
+                elif isinstance(node, list) and key.lstrip('-').isdigit():
+                    if -len(node) <= int(key) < len(node):
+                        matches.append(node[int(key)])
+                elif isinstance(node, dict) and key in node:
+                    matches.append(node[key])
+        nodes = matches
+    return nodes
+
+class JsonLogic:
+    """
+    Evaluator of the JsonLogic rules of PBI Inspector style report rule files, including their custom
+    operations: 'part' (a part of the report), 'path' (JSONPath on the data), 'count', 'diff',
+    'strcontains' (regex search) and 'tostring' (JSON text of a value).
+
+    Parameters:
+        report (ReportDefinition): Report the 'part' operation reads from
+        page (Optional[dict]): Page the rule is evaluated for, 'Visuals' are its visuals
+    """
+
+    def __init__(self, report: ReportDefinition, page: Optional[dict] = None):
+        self.report = report
+        self.page = page
+
+    def apply(self, logic, data):
+        if isinstance(logic, list):
+            return [self.apply(item, data) for item in logic]
+        if not isinstance(logic, dict) or len(logic) != 1:
+            return logic
+
+        operation, arguments = next(iter(logic.items()))
+        if not isinstance(arguments, list):
+            arguments = [arguments]
+
+        # Operations that decide themselves which arguments to evaluate, and on which data
+        lazy = _LAZY_OPERATIONS.get(operation)
+        if lazy is not None:
+            return lazy(self, arguments, data)
+
+        values = [self.apply(argument, data) for argument in arguments]
+        if operation == 'var':
+            return _get(data, values[0] if values else '', values[1] if len(values) > 1 else None)
+        if operation == 'part':
+            return self.report.part(values[0], self.page)
+        if operation == 'path':
+            return json_path(data, values[0])
+
+        function = _OPERATIONS.get(operation)
+        if function is None:
+            raise RuleError(f"Unknown operation '{operation}'")
+        return function(*values)
+
+    def _items(self, arguments: list, data) -> list:
+        items = self.apply(arguments[0], data) if arguments else None
+        return items if isinstance(items, list) else []
+
+def _and(logic: JsonLogic, arguments: list, data):
+    value = None
+    for argument in arguments:
+        value = logic.apply(argument, data)
+        if not _truthy(value):
+            return value
+    return value
+
+def _or(logic: JsonLogic, arguments: list, data):
+    value = None
+    for argument in arguments:
+        value = logic.apply(argument, data)
+        if _truthy(value):
+            return value
+    return value
+
+def _if(logic: JsonLogic, arguments: list, data):
+    for position in range(0, len(arguments) - 1, 2):
+        if _truthy(logic.apply(arguments[position], data)):
+            return logic.apply(arguments[position + 1], data)
+    return logic.apply(arguments[-1], data) if len(arguments) % 2 else None
+
+_LAZY_OPERATIONS: dict[str, Callable] = {
+    'and': _and,
+    'or': _or,
+    'if': _if,
+    'filter': lambda logic, arguments, data: [item for item in logic._items(arguments, data) if _truthy(logic.apply(arguments[1], item))],
+    'map': lambda logic, arguments, data: [logic.apply(arguments[1], item) for item in logic._items(arguments, data)],
+    'some': lambda logic, arguments, data: any(_truthy(logic.apply(arguments[1], item)) for item in logic._items(arguments, data)),
+    'none': lambda logic, arguments, data: not any(_truthy(logic.apply(arguments[1], item)) for item in logic._items(arguments, data)),
+    'all': lambda logic, arguments, data: bool(logic._items(arguments, data)) and all(_truthy(logic.apply(arguments[1], item)) for item in logic._items(arguments, data))
+}
+
+def _compare(compare: Callable) -> Callable:
+    # Comparisons with a third argument test that the middle value is between the others
+    def operation(*values):
+        if any(value is None for value in values):
+            return False
+        return all(compare(left, right) for left, right in zip(values, values[1:]))
+    return operation
+
+_OPERATIONS: dict[str, Callable] = {
+    '==': _loose_equals,
+    '!=': lambda left, right: not _loose_equals(left, right),
+    '===': lambda left, right: left == right,
+    '!==': lambda left, right: left != right,
+    '<': _compare(lambda left, right: left < right),
+    '<=': _compare(lambda left, right: left <= right),
+    '>': _compare(lambda left, right: left > right),
+    '>=': _compare(lambda left, right: left >= right),
+    '!': lambda value=None: not _truthy(value),
+    '!!': lambda value=None: _truthy(value),
+    'in': lambda value, container: container is not None and value in container,
+    'count': lambda items=None: len(items) if isinstance(items, (list, dict, str)) else 0,
+    'diff': lambda first, second: [item for item in (first or []) if item not in (second or [])],
+    'strcontains': lambda text, pattern: text is not None and re.search(pattern, str(text)) is not None,
+    'tostring': lambda value=None: value if isinstance(value, str) else json.dumps(value, separators=(',', ':'), ensure_ascii=False),
+    'cat': lambda *values: ''.join('' if value is None else str(value) for value in values),
+    'merge': lambda *values: [item for value in values for item in (value if isinstance(value, list) else [value])],
+    'max': lambda *values: max(values) if values else None,
+    'min': lambda *values: min(values) if values else None,
+    '+': lambda *values: sum(float(value) for value in values),
+    '-': lambda left, right=None: -float(left) if right is None else float(left) - float(right),
+    '*': lambda *values: math.prod(float(value) for value in values),
+    '/': lambda left, right: float(left) / float(right)
+}
+
+def load_report_rules(path: str) -> list[dict]:
+    """Read a report rule file, a JSON object with a 'rules' list."""
+    return _read_json(path).get('rules', [])
+
+def _resolve_parameters(parameters: dict, context) -> dict:
+    # Parameter values that are JSON pointers, like "/publicCustomVisuals", read from the part tested
+    resolved = {}
+    for name, value in (parameters or {}).items():
+        if isinstance(value, str) and value.startswith('/'):
+            value = _get(context, '.'.join(key.replace('~1', '/').replace('~0', '~') for key in value.strip('/').split('/')) if value != '/' else '')
+        resolved[name] = value
+    return resolved
+
+def analyze_report(report: ReportDefinition, rules: list[dict]) -> tuple[list[dict], list[dict]]:
+    """
+    Evaluate report rules: every rule is a [logic, parameters, expected] test, evaluated on the
+    report, or once per page when its part is 'Pages', and it fails when the result is not the
+    expected value.
+
+    Parameters:
+        report (ReportDefinition): The report
+        rules (list[dict]): Rules with 'id', 'name', 'part', 'test' and optionally 'disabled' and 'logType'
+
+    Returns:
+        tuple[list[dict], list[dict]]: Failures, with 'rule', 'name', 'severity' ('error' or 'warning'),
+            'object', 'result' and 'path', and rule errors, with 'rule' and 'error'
+    """
+    failures, errors = [], []
+
+    for rule in rules:
+        if rule.get('disabled'):
+            continue
+        logic, parameters, expected = (list(rule['test']) + [None, None])[:3]
+
+        if rule.get('part') == 'Pages':
+            targets = [(page, page, f"page '{page.get('displayName', page.get('name'))}'", report.page_paths.get(page.get('name'))) for page in report.pages]
+        else:
+            targets = [(None, report.report, 'report', report.report_path)]
+
+        for page, context, label, path in targets:
+            data = dict(context) if isinstance(context, dict) else {}
+            data.update(_resolve_parameters(parameters, context))
+            try:
+                result = JsonLogic(report, page).apply(logic, data)
+            except (RuleError, TypeError, ValueError, re.error) as error:
+                errors.append({'rule': rule['id'], 'object': label, 'error': str(error)})
+                continue
+
+            if result != expected:
+                failures.append({
+                    'rule': rule['id'],
+                    'name': rule.get('name', rule['id']),
+                    'severity': rule.get('logType', 'warning'),
+                    'object': label,
+                    'result': result,
+                    'path': path,
+                    'line': 0
+                })
+
+    return failures, errors
@@ -0,0 +1,169 @@
+import os
+import re
+import glob
+import pandas as pd
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from src.field_extraction import FieldExtractor
+from src.parallel import ordered_chunks
+
+# ING export headers and the column names used throughout the pipeline
+ING_COLUMN_NAMES = {
+    'Date': 'received_date_sk',
+    'Counterparty': 'counterparty',
+    'Name / Description': 'name_or_description',
+    'Account': 'account_number',
+    'Code': 'code',
+    'Debit/credit': 'debit_or_credit',
+    'Amount (EUR)': 'amount_in_euro',
+    'Resulting balance': 'balance_after_transaction_euro',
+    'Notifications': 'notifications',
+    'Transaction type': 'transaction_type',
+    'Tag': 'tag'
+}
+
+# Compact dtypes for the low-cardinality and numeric columns. Dates are YYYYMMDD integers,
+# which fit in int32 and double as the date surrogate key. Amounts stay float64, parsed from
+# the decimal comma, and are imported as fixed decimal (Currency) by the semantic model.
+ING_DTYPES = {
+    'Date': 'int32',
+    'Code': 'category',
+    'Debit/credit': 'category',
+    'Transaction type': 'category',
+    'Amount (EUR)': 'float64',
+    'Resulting balance': 'float64'
+}
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Labels that start a field in the 'Notifications' text, they end the free text description
+_NOTIFICATION_LABELS = r'(?:Name|Description|IBAN|BIC|Reference|Mandate ID|Creditor ID|Date/time|Value date|Card sequence no\.|Transaction|Term):'
+
+# Structured fields of the 'Notifications' text, one pattern per field (see FieldExtractor),
+# e.g. 'Name: X Description: Y IBAN: NL.. Reference: R Mandate ID: M Creditor ID: C Value date: 16/04/2022'
+# or 'Card sequence no.: 007 15/04/2022 18:32 Transaction: I1F2G3 Term: 12AB34 Apple Pay Value date: 15/04/2022'
+NOTIFICATION_PATTERNS = {
+    'description': r'Description:\s*(?P<notification_description>.*?)(?:\s+' + _NOTIFICATION_LABELS + r'|\s*$)',
+    'iban': r'IBAN:\s*(?P<iban>[A-Z]{2}[0-9]{2}[A-Z0-9]{10,30})',
+    'bic': r'BIC:\s*(?P<bic>[A-Z0-9]{8,11})',
+    'reference': r'Reference:\s*(?P<reference>\S+)',
+    'mandate_id': r'Mandate ID:\s*(?P<mandate_id>[A-Z0-9]+)(?:\s|$)',
+    'creditor_id': r'Creditor ID:\s*(?P<creditor_id>\S+)',
+    'transaction_datetime': r'Date/time:\s*(?P<transaction_datetime>[0-9]{2}-[0-9]{2}-[0-9]{4} [0-9]{2}:[0-9]{2}:[0-9]{2})',
+    'card_sequence_number': r'Card sequence no\.:\s*(?P<card_sequence_number>[0-9]+)',
+    'card_datetime': r'Card sequence no\.:\s*[0-9]+\s+(?P<card_datetime>[0-9]{2}/[0-9]{2}/[0-9]{4} [0-9]{2}:[0-9]{2})',
+    'card_transaction': r'Transaction:\s*(?P<card_transaction>\S+)',
+    'terminal': r'Term:\s*(?P<terminal>\S+)',
+    'value_date': r'Value date:\s*(?P<value_date>[0-9]{2}/[0-9]{2}/[0-9]{4})'
+}
+
+def _datetimes(date_format: str):
+    return lambda values: pd.to_datetime(values, format=date_format, errors='coerce')
+
+NOTIFICATION_CONVERTERS = {
+    'transaction_datetime': _datetimes('%d-%m-%Y %H:%M:%S'),
+    'card_datetime': _datetimes('%d/%m/%Y %H:%M'),
+    'value_date': _datetimes('%d/%m/%Y')
+}
+
+@lru_cache(maxsize=1)
+def notification_extractor() -> FieldExtractor:
+    """The compiled notification field patterns, shared by every chunk in this process."""
+    return FieldExtractor(NOTIFICATION_PATTERNS, NOTIFICATION_CONVERTERS)
+
+def read_bank_export_chunks(path: str, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """
+    Stream an ING CSV export (semicolon separated, decimal comma) in chunks of at most
+    `chunksize` rows, with compact dtypes and the pipeline column names applied.
+
+    Parameters:
+        path (str): Path to the CSV export
+        chunksize (int): Maximum number of rows per chunk
+
+    Yields:
+        pd.DataFrame: Renamed chunks, indexed by their row number in the file
+    """
+    reader = pd.read_csv(path, sep=";", decimal=",", dtype=ING_DTYPES, chunksize=chunksize)
+
+    with reader:
+        for chunk in reader:
+            yield chunk.rename(columns=ING_COLUMN_NAMES)
+
+# ING names its exports <account IBAN>_<first day>_<last day>.csv, e.g. NL52INGB0003610006_02-10-2015_01-10-2025.csv
+ING_EXPORT_FILE_PATTERN = re.compile(r'^(?P<account>[A-Z]{2}\d{2}[A-Z0-9]{4,30})_(?P<first_day>\d{2}-\d{2}-\d{4})_(?P<last_day>\d{2}-\d{2}-\d{4})\.csv$', re.IGNORECASE)
+
+# Columns added to every row to record where it was read from
+SOURCE_COLUMNS = ['source_account', 'source_file']
+
+DEFAULT_READ_THREADS = 4
+
+def export_account(path: str) -> Optional[str]:
+    """The account IBAN in the name of an ING export, None if the file is named differently."""
+    match = ING_EXPORT_FILE_PATTERN.match(os.path.basename(path))
+    return match.group('account').upper() if match else None
+
+def find_bank_exports(sources: list[str]) -> list[str]:
+    """
+    Resolve export files, directories and glob patterns to a sorted list of export files.
+    Directories contribute the CSV files named like ING exports, so exported tables stored
+    next to them are skipped.
+
+    Parameters:
+        sources (list[str]): Files, directories or glob patterns
+
+    Returns:
+        list[str]: Unique export paths, per account in chronological order
+    """
+    paths = set()
+
+    for source in sources:
+        if os.path.isdir(source):
+            paths.update(entry.path for entry in os.scandir(source) if entry.is_file() and export_account(entry.name))
+        elif os.path.isfile(source):
+            paths.add(source)
+        else:
+            paths.update(path for path in glob.glob(source) if os.path.isfile(path))
+
+    if not paths:
+        raise FileNotFoundError(f"No bank exports found in {', '.join(sources)}")
+
+    return sorted((os.path.abspath(path) for path in paths), key=_export_order)
+
+def _export_order(path: str) -> tuple:
+    # ING exports by account and then chronologically, other files after them by name
+    match = ING_EXPORT_FILE_PATTERN.match(os.path.basename(path))
+    if match is None:
+        return (1, os.path.basename(path), '', path)
+
+    day, month, year = match.group('first_day').split('-')
+    return (0, match.group('account').upper(), year + month + day, path)
+
+def read_tagged_export_chunks(path: str, chunksize: int = DEFAULT_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """
+    read_bank_export_chunks with the source columns added: the account from the file name,
+    or the 'Account' column for files not named like an ING export, and the file name.
+    """
+    account = export_account(path)
+    source_file = os.path.basename(path)
+
+    for chunk in read_bank_export_chunks(path, chunksize):
+        chunk['source_account'] = account if account is not None else chunk['account_number']
+        chunk['source_file'] = source_file
+        yield chunk
+
+def read_bank_exports(paths: list[str], chunksize: int = DEFAULT_CHUNKSIZE, threads: int = DEFAULT_READ_THREADS) -> Iterator[pd.DataFrame]:
+    """
+    Read several exports concurrently in a thread pool, parsing CSV is mostly I/O and C code
+    that releases the GIL. Chunks are yielded file by file in the order of `paths`, so the
+    result does not depend on which file finishes first.
+
+    Parameters:
+        paths (list[str]): Export files, e.g. from find_bank_exports
+        chunksize (int): Maximum number of rows per chunk
+        threads (int): Number of files read at the same time
+
+    Yields:
+        pd.DataFrame: Renamed chunks tagged with their SOURCE_COLUMNS
+    """
+    return ordered_chunks(paths, lambda path: read_tagged_export_chunks(path, chunksize), threads)
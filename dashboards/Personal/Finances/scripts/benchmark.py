@@ -0,0 +1,341 @@
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import statistics
+import pandas as pd
+from datetime import datetime, timezone
+from typing import Callable, Optional
+from tabulate import tabulate
+
+from finance_run import (
+    COMPANY_NATURAL_KEY,
+    HASH_SALT,
+    TRANSACTION_FLAGS,
+    TRANSACTION_INFO_NATURAL_KEY,
+    add_transaction_flags,
+    classify_transactions,
+    company_name,
+    company_names_from_text,
+    create_fact_bank_transactions,
+    hash_column,
+    payment_recurrence,
+    payment_series_rows,
+    stream_new_transactions
+)
+from bank_export import notification_extractor, read_bank_export_chunks, read_tagged_export_chunks
+from synthetic_export import write_synthetic_export
+from src.row_hashing import row_fingerprints
+from src.surrogate_keys import SurrogateKeyIndex
+from src.table_writers import EXCEL_MAX_ROWS, open_table_writer, write_table
+
+BENCHMARK_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_results')
+
+# Stage cases run on at most this many rows in memory, only the streaming pipeline reads
+# the whole export, so exports of tens of millions of rows can be benchmarked too
+IN_MEMORY_ROWS = 1_000_000
+
+# name -> setup function. A setup function receives the benchmark data and returns the
+# callable that is timed, so preparing inputs never counts towards the measurement.
+CASES: dict[str, Callable[['BenchmarkData'], Optional[Callable[[], object]]]] = {}
+
+def benchmark_case(name: str):
+    """Register a benchmark case under a name."""
+    def decorator(setup):
+        CASES[name] = setup
+        return setup
+
+    return decorator
+
+class BenchmarkData:
+    """
+    Inputs shared by the benchmark cases, built from one synthetic export and cached, so every
+    case starts from the same data without redoing the earlier pipeline stages.
+
+    Parameters:
+        path (str): Synthetic ING export
+        rows (int): Number of rows in the export
+        work_dir (str): Scratch directory for files written by the cases
+    """
+
+    def __init__(self, path: str, rows: int, work_dir: str):
+        self.path = path
+        self.rows = rows
+        self.work_dir = work_dir
+        self._raw = None
+        self._classified = None
+
+    @property
+    def raw(self) -> pd.DataFrame:
+        """The first IN_MEMORY_ROWS rows of the export, renamed and tagged, as read by the pipeline."""
+        if self._raw is None:
+            self._raw = next(read_tagged_export_chunks(self.path, min(self.rows, IN_MEMORY_ROWS)))
+        return self._raw
+
+    @property
+    def classified(self) -> pd.DataFrame:
+        if self._classified is None:
+            self._classified = classify_transactions(self.raw.assign(hash_value=row_fingerprints(self.raw)))
+        return self._classified
+
+    def fact(self) -> pd.DataFrame:
+        return create_fact_bank_transactions(self.classified, *self.dimensions())
+
+    def dimensions(self) -> tuple[SurrogateKeyIndex, SurrogateKeyIndex]:
+        dim_companies = SurrogateKeyIndex("company_sk", COMPANY_NATURAL_KEY, required=['company_name'])
+        dim_transaction_info = SurrogateKeyIndex("transaction_info_sk", TRANSACTION_INFO_NATURAL_KEY)
+        return dim_companies, dim_transaction_info
+
+@benchmark_case('read export')
+def _read_export(data: BenchmarkData):
+    return lambda: next(read_bank_export_chunks(data.path, len(data.raw)))
+
+@benchmark_case('row fingerprints')
+def _row_fingerprints(data: BenchmarkData):
+    raw = data.raw
+    return lambda: row_fingerprints(raw)
+
+@benchmark_case('hash counterparty')
+def _hash_counterparty(data: BenchmarkData):
+    counterparty = data.raw['counterparty']
+    return lambda: hash_column(counterparty, salt=HASH_SALT)
+
+@benchmark_case('company name from text')
+def _company_name_from_text(data: BenchmarkData):
+    descriptions = data.raw['name_or_description']
+    return lambda: company_names_from_text(descriptions)
+
+@benchmark_case('notification fields')
+def _notification_fields(data: BenchmarkData):
+    notifications = data.raw['notifications']
+    return lambda: notification_extractor().extract(notifications)
+
+@benchmark_case('company name')
+def _company_name(data: BenchmarkData):
+    classified = data.classified
+    return lambda: company_name(classified)
+
+@benchmark_case('transaction flags')
+def _transaction_flags(data: BenchmarkData):
+    # The flags only overwrite their own columns, so the same frame can be reused every round
+    classified = data.classified
+    return lambda: add_transaction_flags(classified)
+
+@benchmark_case('classify')
+def _classify(data: BenchmarkData):
+    raw = data.raw.assign(hash_value=row_fingerprints(data.raw))
+    return lambda: classify_transactions(raw.copy())
+
+@benchmark_case('build dimensions')
+def _build_dimensions(data: BenchmarkData):
+    classified = data.classified
+
+    def build():
+        dim_companies, dim_transaction_info = data.dimensions()
+        dim_companies.assign(classified)
+        dim_transaction_info.assign(classified)
+        return dim_companies.dimension(), dim_transaction_info.dimension()
+
+    return build
+
+@benchmark_case('fact key lookup')
+def _fact_key_lookup(data: BenchmarkData):
+    # Every member exists already, like in an incremental load of known transactions
+    classified = data.classified
+    dim_companies, dim_transaction_info = data.dimensions()
+    create_fact_bank_transactions(classified, dim_companies, dim_transaction_info)
+    return lambda: create_fact_bank_transactions(classified, dim_companies, dim_transaction_info)
+
+@benchmark_case('pack transaction flags')
+def _pack_transaction_flags(data: BenchmarkData):
+    classified = data.classified
+    return lambda: TRANSACTION_FLAGS.pack(classified)
+
+@benchmark_case('detect recurring payments')
+def _detect_recurring_payments(data: BenchmarkData):
+    payment_series = payment_series_rows(data.classified, data.fact())
+    return lambda: payment_recurrence(payment_series)
+
+def _export_case(export_format: str):
+    def setup(data: BenchmarkData):
+        if export_format == 'excel' and len(data.raw) > EXCEL_MAX_ROWS:
+            return None
+
+        fact = data.fact()
+        path = os.path.join(data.work_dir, f'fact_{export_format}')
+        return lambda: write_table(fact, path, export_format)
+
+    return setup
+
+for _export_format in ('parquet', 'arrow', 'csv', 'excel'):
+    benchmark_case(f'export {_export_format}')(_export_case(_export_format))
+
+@benchmark_case('stream pipeline')
+def _stream_pipeline(data: BenchmarkData):
+    # The whole export, chunk by chunk, from the CSV to a Parquet fact table
+    def run():
+        dim_companies, dim_transaction_info = data.dimensions()
+        with open_table_writer(os.path.join(data.work_dir, 'pipeline_fact'), 'parquet') as writer:
+            for chunk in stream_new_transactions([data.path], set()):
+                writer.write(create_fact_bank_transactions(chunk, dim_companies, dim_transaction_info))
+
+    return run
+
+def time_case(function: Callable[[], object], repeat: int, warmup: int = 1) -> list[float]:
+    """Run a function `warmup` times untimed and then `repeat` times timed, in seconds."""
+    for _ in range(warmup):
+        function()
+
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    return timings
+
+def run_benchmarks(rows: int, repeat: int = 5, selected: Optional[list[str]] = None, seed: int = 0) -> dict:
+    """
+    Generate a synthetic export of `rows` transactions and time every selected case on it.
+
+    Parameters:
+        rows (int): Size of the synthetic export
+        repeat (int): Timed rounds per case, the streaming pipeline always runs once
+        selected (Optional[list[str]]): Only run cases whose name contains one of these
+        seed (int): Seed of the synthetic export
+
+    Returns:
+        dict: The results, ready to be stored with save_results
+    """
+    results = {
+        'created': datetime.now(timezone.utc).isoformat(),
+        'rows': rows,
+        'seed': seed,
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'python': sys.version.split()[0],
+            'pandas': pd.__version__
+        },
+        'cases': {}
+    }
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        export = write_synthetic_export(os.path.join(work_dir, 'export.csv'), rows, seed)
+        data = BenchmarkData(export, rows, work_dir)
+
+        for name, setup in CASES.items():
+            if selected and not any(part in name for part in selected):
+                continue
+
+            function = setup(data)
+            if function is None:
+                continue
+
+            pipeline = name == 'stream pipeline'
+            timings = time_case(function, repeat=1 if pipeline else repeat, warmup=0 if pipeline else 1)
+            case_rows = rows if pipeline else len(data.raw)
+
+            results['cases'][name] = {
+                'rows': case_rows,
+                'min': min(timings),
+                'median': statistics.median(timings),
+                'mean': statistics.fmean(timings),
+                'rounds': len(timings),
+                'rows_per_second': case_rows / min(timings) if min(timings) > 0 else None
+            }
+            print(f"{name}: {min(timings):.4f}s")
+
+    return results
+
+def save_results(results: dict, results_dir: str = BENCHMARK_RESULTS_DIR) -> str:
+    os.makedirs(results_dir, exist_ok=True)
+    stamp = datetime.fromisoformat(results['created']).strftime('%Y%m%dT%H%M%S')
+    path = os.path.join(results_dir, f"{stamp}_{results['rows']}.json")
+
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=4)
+
+    return path
+
+def load_previous_results(rows: int, results_dir: str = BENCHMARK_RESULTS_DIR) -> Optional[dict]:
+    """The most recent stored results for the same number of rows, None if there are none."""
+    if not os.path.isdir(results_dir):
+        return None
+
+    runs = sorted(file_name for file_name in os.listdir(results_dir) if file_name.endswith(f'_{rows}.json'))
+    if not runs:
+        return None
+
+    with open(os.path.join(results_dir, runs[-1]), encoding='utf-8') as file:
+        return json.load(file)
+
+def compare_results(results: dict, previous: Optional[dict], threshold: float = 0.1) -> tuple[str, list[str]]:
+    """
+    Tabulate the results next to a previous run.
+
+    Parameters:
+        results (dict): Results of this run
+        previous (Optional[dict]): Stored results to compare against
+        threshold (float): Relative slowdown of the minimum time that counts as a regression
+
+    Returns:
+        tuple[str, list[str]]: The table and the names of the regressed cases
+    """
+    rows = []
+    regressions = []
+    previous_cases = previous['cases'] if previous else {}
+
+    for name, case in results['cases'].items():
+        change = None
+        if name in previous_cases and previous_cases[name]['min'] > 0:
+            change = case['min'] / previous_cases[name]['min'] - 1
+            if change > threshold:
+                regressions.append(name)
+
+        rows.append([
+            name,
+            case['rows'],
+            round(case['min'], 4),
+            round(case['median'], 4),
+            None if case['rows_per_second'] is None else round(case['rows_per_second']),
+            None if name not in previous_cases else round(previous_cases[name]['min'], 4),
+            None if change is None else f'{change:+.1%}' + (' REGRESSION' if name in regressions else '')
+        ])
+
+    headers = ['case', 'rows', 'min s', 'median s', 'rows/s', 'previous min s', 'change']
+    return tabulate(rows, headers=headers, tablefmt='psql', missingval=''), regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Finances pipeline stages on synthetic ING exports.")
+    parser.add_argument("--rows", type=int, nargs='+', default=[100_000], help="Export sizes to benchmark, e.g. 10000 1000000 50000000")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed rounds per case")
+    parser.add_argument("--case", action="append", help="Only run cases whose name contains this text, can be repeated")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic export")
+    parser.add_argument("--results-dir", default=BENCHMARK_RESULTS_DIR, help="Directory the results are stored in and compared against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative slowdown reported as a regression (default 0.1 = 10%%)")
+    parser.add_argument("--no-save", action="store_true", help="Compare against the last run without storing this one")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 when a case regressed")
+    args = parser.parse_args()
+
+    regressed = False
+    for rows in args.rows:
+        previous = load_previous_results(rows, args.results_dir)
+        results = run_benchmarks(rows, args.repeat, args.case, args.seed)
+
+        table, regressions = compare_results(results, previous, args.threshold)
+        print(f"\n{rows} rows" + (f", compared with the run of {previous['created']}" if previous else ''))
+        print(table)
+
+        if not args.no_save:
+            print(f"Results stored in {save_results(results, args.results_dir)}")
+        regressed = regressed or bool(regressions)
+
+    if args.fail_on_regression and regressed:
+        sys.exit(1)
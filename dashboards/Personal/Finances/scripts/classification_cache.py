@@ -0,0 +1,235 @@
+import os
+import json
+import sqlite3
+import hashlib
+import numpy as np
+import pandas as pd
+from typing import Callable, Optional
+
+from company_matcher import CompanyMatcher
+from hash_registry import HashRegistry
+
+CLASSIFICATION_CACHE_FILE = 'classification_cache.sqlite'
+DEFAULT_MAX_ENTRIES = 500_000
+
+# Counterparty hash used for rows without a counterparty
+NO_COUNTERPARTY = ''
+
+# Mixes the hash of the description into the key before the counterparty hash is added
+KEY_MULTIPLIER = np.uint64(0x100000001b3)
+
+_default_cache: Optional['ClassificationCache'] = None
+
+def rules_version(matcher: CompanyMatcher, registry: HashRegistry) -> str:
+    """
+    Fingerprint of everything a cached company name depends on: the text rules in order and
+    the counterparty hash registry. Any change to either gives a new version.
+    """
+    content = json.dumps({
+        'text_rules': [list(rule) for rule in matcher.rules],
+        'registry_version': registry.version,
+        'registry': sorted(registry.company_by_hash.items())
+    }, ensure_ascii=False)
+
+    return hashlib.blake2b(content.encode('utf-8'), digest_size=16).hexdigest()
+
+class ClassificationCache:
+    """
+    On-disk cache of resolved company names, keyed on (lowercased description, counterparty
+    hash, rules version). The lowercased description is exactly the text the matcher sees,
+    so a cached name is always the name the rules would give.
+
+    A description and counterparty hash are stored as one 64-bit key, from the SipHash of
+    both. Two of a million entries share a key with a chance of about 1 in 40 million. Every
+    batch of new entries is stored as one row holding the keys as an int64 array and the
+    names as a JSON list, so storing a batch is a single insert and loading the cache decodes
+    a few arrays instead of building a Python object per entry. The entries of the current
+    version are loaded into a DataFrame indexed by key on first use, and every batch of rows
+    is looked up with one join against it: hits cost no Python per key and never touch the
+    database.
+
+    Entries of other rules versions are deleted when the cache is opened, so changing a rule
+    or the hash registry invalidates the cache. Hits write nothing. evict() drops the batches
+    stored longest ago until at most `max_entries` remain, an entry that is still in use is
+    then classified and stored again.
+
+    Parameters:
+        path (str): SQLite database file, created when missing
+        version (str): Current rules_version
+        max_entries (int): Number of entries kept by evict()
+    """
+
+    def __init__(self, path: str, version: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Worker processes share the file, WAL lets them read while another one writes
+        self._connection = sqlite3.connect(path, timeout=60)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        with self._connection:
+            # Layout of earlier versions, one row per entry and rewriting the last use of every hit
+            self._connection.execute('DROP TABLE IF EXISTS company_names')
+            self._connection.execute('''
+                CREATE TABLE IF NOT EXISTS company_name_batches (
+                    rules_version TEXT NOT NULL,
+                    entries INTEGER NOT NULL,
+                    keys BLOB NOT NULL,
+                    company_names TEXT NOT NULL
+                )
+            ''')
+            self._connection.execute('DELETE FROM company_name_batches WHERE rules_version != ?', (version,))
+
+        # Indexed by key, loaded on first use
+        self._cached_entries: Optional[pd.DataFrame] = None
+
+    @property
+    def _entries(self) -> pd.DataFrame:
+        if self._cached_entries is None:
+            batches = self._connection.execute(
+                'SELECT keys, company_names FROM company_name_batches WHERE rules_version = ? ORDER BY rowid', (self.version,)
+            ).fetchall()
+            self._cached_entries = self._entry_frame(
+                np.concatenate([np.frombuffer(keys, dtype=np.int64) for keys, _ in batches] or [np.zeros(0, dtype=np.int64)]),
+                np.array([name for _, names in batches for name in json.loads(names)], dtype=object)
+            )
+        return self._cached_entries
+
+    @staticmethod
+    def _entry_frame(keys: np.ndarray, names: np.ndarray) -> pd.DataFrame:
+        entries = pd.DataFrame({'company_name': names, 'cached': True}, index=pd.Index(keys, dtype=np.int64, name='key'))
+        # Workers that classify the same key at the same time both store it
+        return entries[~entries.index.duplicated()]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Cached company names of distinct keys, see resolve.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The cached name of every key, and whether the key is
+                cached at all. A None name of a cached key is a cached "no company", a key that
+                is not cached was never classified under this version.
+        """
+        matched = pd.DataFrame({'key': keys}).join(self._entries, on='key')
+        cached = matched['cached'].notna().to_numpy()
+        return matched['company_name'].to_numpy(dtype=object, copy=True), cached
+
+    def store(self, keys: np.ndarray, names: np.ndarray) -> None:
+        """Store the company names of keys that are not cached yet, as one batch."""
+        with self._connection:
+            self._connection.execute(
+                'INSERT INTO company_name_batches VALUES (?, ?, ?, ?)',
+                (self.version, len(keys), keys.astype(np.int64).tobytes(), json.dumps(names.tolist(), ensure_ascii=False))
+            )
+
+        entries = self._entries
+        added = self._entry_frame(keys, names)
+        self._cached_entries = pd.concat([entries, added]) if len(entries) else added
+
+    def resolve(
+        self,
+        descriptions: pd.Series,
+        hashes: pd.Series,
+        classify: Callable[[pd.Series, pd.Series], pd.Series]
+    ) -> pd.Series:
+        """
+        Company name of every row, from the cache where possible. Only distinct keys missing
+        from the cache are passed to `classify`, and their results are stored.
+
+        Parameters:
+            descriptions (pd.Series): 'name_or_description' values
+            hashes (pd.Series): 'hash_banking_identification' values aligned with descriptions
+            classify (Callable[[pd.Series, pd.Series], pd.Series]): Resolves company names from
+                descriptions and hashes, used for the cache misses
+
+        Returns:
+            pd.Series: Company names aligned with the input, None where there is no company
+        """
+        # str(value).lower() is what the matcher sees, missing descriptions included. Descriptions
+        # that only differ in case share a key
+        description_codes, description_uniques = pd.factorize(descriptions, use_na_sentinel=False)
+        lowered_codes, lowered = pd.factorize(np.array([str(value).lower() for value in np.asarray(description_uniques, dtype=object)], dtype=object))
+        description_codes = lowered_codes[description_codes]
+        lowered = np.asarray(lowered, dtype=object)
+
+        # Missing hashes get code -1, which picks the trailing NO_COUNTERPARTY
+        hash_codes, hash_uniques = pd.factorize(hashes)
+        hash_values = np.append(np.asarray(hash_uniques, dtype=object), NO_COUNTERPARTY)
+
+        # Every distinct (description, hash) pair is one key, found by factorizing integer pairs
+        pairs = description_codes.astype(np.int64) * len(hash_values) + hash_codes % len(hash_values)
+        codes, unique_pairs = pd.factorize(pairs)
+        with np.errstate(over='ignore'):
+            description_keys = pd.util.hash_array(lowered, categorize=False)[unique_pairs // len(hash_values)]
+            keys = (description_keys * KEY_MULTIPLIER ^ pd.util.hash_array(hash_values, categorize=False)[unique_pairs % len(hash_values)]).view(np.int64)
+
+        names, cached = self.lookup(keys)
+        missing = np.flatnonzero(~cached)
+
+        self.hits += len(cached) - len(missing)
+        self.misses += len(missing)
+
+        if len(missing):
+            # Codes are numbered in order of first appearance
+            _, first_rows = np.unique(codes, return_index=True)
+            missing_rows = first_rows[missing]
+            classified = classify(
+                descriptions.iloc[missing_rows].reset_index(drop=True),
+                hashes.iloc[missing_rows].reset_index(drop=True)
+            )
+            classified = classified.astype(object).where(classified.notna(), None).to_numpy()
+
+            self.store(keys[missing], classified)
+            names[missing] = classified
+
+        return pd.Series(names[codes], index=descriptions.index, dtype=object)
+
+    def evict(self) -> int:
+        """Drop the batches stored longest ago until at most max_entries remain and return how many entries were dropped."""
+        with self._connection:
+            batches = self._connection.execute('SELECT rowid, entries FROM company_name_batches ORDER BY rowid').fetchall()
+            excess = sum(entries for _, entries in batches) - self.max_entries
+            if excess <= 0:
+                return 0
+
+            # Rows are only ever appended, so the lowest rowids were stored first
+            dropped = 0
+            for rowid, entries in batches:
+                if dropped >= excess:
+                    break
+                dropped += entries
+            self._connection.execute('DELETE FROM company_name_batches WHERE rowid <= ?', (rowid,))
+
+        # Reloaded on next use
+        self._cached_entries = None
+        return dropped
+
+    def close(self) -> None:
+        self._connection.close()
+
+def open_default_cache(path: str, version: str, max_entries: int = DEFAULT_MAX_ENTRIES) -> ClassificationCache:
+    """Open the cache used by default_cache() in this process, closing a previously opened one."""
+    global _default_cache
+    close_default_cache()
+    _default_cache = ClassificationCache(path, version, max_entries)
+    return _default_cache
+
+def default_cache() -> Optional[ClassificationCache]:
+    """The cache opened by open_default_cache, None when classification runs uncached."""
+    return _default_cache
+
+def close_default_cache() -> None:
+    global _default_cache
+    if _default_cache is not None:
+        _default_cache.close()
+        _default_cache = None
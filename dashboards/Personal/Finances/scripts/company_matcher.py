@@ -0,0 +1,182 @@
+import re
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from typing import Optional
+
+# Ordered (substring, company name) rules. The first rule whose substring occurs in the
+# lowercased description wins, so more specific patterns must come before generic ones.
+COMPANY_TEXT_RULES: tuple[tuple[str, str], ...] = (
+    ('albert heijn', 'Albert Heijn'),
+    ('ah to go', 'Albert Heijn'),
+    ('albertheijn', 'Albert Heijn'),
+    ('albert-heijn', 'Albert Heijn'),
+    ('mcdonald', 'McDonalds'),
+    ('mc donalds', 'McDonalds'),
+    ("mc donald's", 'McDonalds'),
+    ('mc drive', 'McDonalds'),
+    ('thuisbezorgd', 'Thuisbezorgd'),
+    ('the flying chicken', 'The Flying Chicken'),
+    ('www.ovpay.nl', 'Openbaar Vervoer'),
+    ('ov busstation', 'Openbaar Vervoer'),
+    ('kfc', 'KFC'),
+    ('burger king', 'Burger King'),
+    ('greggs', 'Greggs'),
+    ('achmea', 'Achmea'),
+    ('erv-dea b.v.', 'Energiebedrijf DeA'),
+    ('energiebedrijf dea', 'Energiebedrijf DeA'),
+    ('hermans & schuttevaer', 'Hermans & Schuttevaer Notarissen N.V.'),
+    ('hermans + schuttevaer', 'Hermans & Schuttevaer Notarissen N.V.'),
+    ('watersport verbond', 'Watersportverbond'),
+    ('watersportverbond', 'Watersportverbond'),
+    ('huysinc', 'Huysinc B.V.'),
+    ('airbnb', 'Airbnb'),
+    ('kiosk', 'Kiosk'),
+    ('medion', 'Medion'),
+    ('coolblue', 'Coolblue'),
+    ('emirates', 'Emirates'),
+    ('opa 90', 'Opa 90'),
+    ('linkedin', 'LinkedIn'),
+    ('duo', 'DUO'),
+    ('kanopoloshop', 'Kanopoloshop'),
+    ('hogeschool inholland', 'Hogeschool Inholland'),
+    ('aldi', 'Aldi'),
+    ('asr levverz', 'ASR'),
+    ('ncoi', 'NCOI'),
+    ('van grunsven', 'Bouwbedrijf van Grunsven'),
+    ('kosten oranjepakket', 'ING'),
+    ('bonusrenterekening', 'ING'),
+    ('oranje spaarrekening', 'ING'),
+    ('apple', 'Apple'),
+    ('febo', 'Febo'),
+    ('bella donna', 'Bella Donna'),
+    ('bruna', 'Bruna'),
+    ('starbuck', 'Starbucks'),
+    ('the phone house', 'The Phone House'),
+    ('urkv michiel de ru uithoorn', 'Michiel de Ruyter roei en kano vereniging'),
+    ('deen', 'Deen Supermarkten'),
+    ('netflix', 'Netflix'),
+    ('dfds', 'DFDS Seaways'),
+    ('isney', 'Disney plus'),
+    ('domino', "Domino's Pizza"),
+    ('doner city', 'Doner City'),
+    ('pathe', 'Pathe'),
+    ('hema', 'Hema'),
+    ('creditcard', 'ING'),
+    ('jagexgamesstudio', 'Jagex Games Studio'),
+    ('jumbo', 'Jumbo'),
+    ('kwalitaria', 'Kwalitaria'),
+    ('kruidvat', 'Kruidvat'),
+    ('praxis', 'Praxis'),
+    ('lidl', 'Lidl'),
+    ('media markt', 'MediaMarkt'),
+    ('multimate', 'Multimate'),
+    ('schaft tweewielers', 'Schaft Tweewielers'),
+    ('action', 'Action'),
+    ('dienst uitvoering onderwijs', 'DUO'),
+    ('nationale-nederlanden', 'Nationale Nederlanden groep N.V.'),
+    ('smullers', 'Smullers'),
+    ('theanything', 'TheAnything B.V.'),
+    ('bcc elektro-speciaalzaken', 'BCC Elektro-Speciaalzaken'),
+    ('station doner kebab', 'Station Döner Kebab'),
+    ('subway', 'Subway'),
+    ('shell', 'Shell'),
+    ('vomar', 'Vomar'),
+    ('the doner company', 'The Döner Company'),
+    ('under armour', 'Under Armour'),
+    ('la place', 'La Place'),
+    ('kwaritaria', 'Kwalitaria'),
+    #TODO: Make strictrect with re libraary to avoid false positives
+    (' ing', 'ING'),
+    ('ah', 'Albert Heijn'),
+    ('mcd', 'McDonalds'),
+    ('klm', 'KLM'),
+    ('ns', 'Nederlandse Spoorwegen'),
+)
+
+def _trie_pattern(words: list[str]) -> str:
+    """
+    Build a regex that matches the longest of `words` starting at a position. The words are
+    stored as a character trie, so matching costs the length of the longest word instead of
+    the number of words.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node: dict) -> str:
+        is_end = '' in node
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+
+        if not branches:
+            return ''
+
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if is_end:
+            # Greedy optional, so longer words are tried before the word ending here
+            return f'(?:{body})?'
+
+        return body
+
+    return render(trie)
+
+class CompanyMatcher:
+    """
+    Compiled first-match-wins substring matcher.
+
+    All rule substrings are compiled into one trie-shaped regex wrapped in a lookahead, so a
+    single scan of a text finds the longest rule substring at every start position. Every
+    shorter rule matching at that position is a prefix of it, so each substring is mapped
+    once, at compile time, to the best priority among its prefixes. The lowest priority over
+    all positions is the rule the original elif chain would have picked.
+
+    Parameters:
+        rules (tuple[tuple[str, str], ...]): Ordered (substring, company name) pairs
+    """
+
+    def __init__(self, rules: tuple[tuple[str, str], ...] = COMPANY_TEXT_RULES):
+        self.rules = tuple(rules)
+
+        # Keep only the first occurrence of a substring, later duplicates can never win
+        priority: dict[str, int] = {}
+        for index, (pattern, _) in enumerate(self.rules):
+            priority.setdefault(pattern, index)
+
+        self._priority = {
+            pattern: min(priority[pattern[:length]] for length in range(1, len(pattern) + 1) if pattern[:length] in priority)
+            for pattern in priority
+        }
+        self._regex = re.compile(f'(?=({_trie_pattern(list(priority))}))')
+
+    def match(self, text: str) -> Optional[str]:
+        """Return the company name for an already lowercased text, or None if no rule matches."""
+        best = None
+        for found in self._regex.findall(text):
+            index = self._priority[found]
+            if best is None or index < best:
+                best = index
+                if best == 0:
+                    break
+
+        return None if best is None else self.rules[best][1]
+
+    def match_series(self, texts: pd.Series) -> pd.Series:
+        """
+        Vectorized matching over a whole Series. Every distinct description is matched once
+        and the results are mapped back, so recurring descriptions cost a dictionary lookup.
+
+        Returns:
+            pd.Series: Company names aligned with the input index, None where nothing matched
+        """
+        codes, uniques = pd.factorize(texts, use_na_sentinel=False)
+        names = np.array([self.match(str(text).lower()) for text in uniques], dtype=object)
+
+        return pd.Series(names[codes], index=texts.index, dtype=object)
+
+@lru_cache(maxsize=None)
+def default_matcher() -> CompanyMatcher:
+    """The matcher for COMPANY_TEXT_RULES, compiled once per process."""
+    return CompanyMatcher(COMPANY_TEXT_RULES)
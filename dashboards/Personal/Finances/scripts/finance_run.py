@@ -1,524 +1,1005 @@
 import os
 import sys
+import ntpath
+import argparse
 import pandas as pd
 import hashlib
+import numpy as np
 from tabulate import tabulate
+import config
 from config import HASH_SALT
-from typing import Optional, Callable
-
-def hash_individual_column(
-    row_value: Optional[str],
+from company_matcher import default_matcher
+from hash_registry import default_registry
+from classification_cache import CLASSIFICATION_CACHE_FILE, ClassificationCache, close_default_cache, default_cache, open_default_cache, rules_version
+from functools import lru_cache
+from typing import Iterator, Optional
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import repeat
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', '..'))
+if REPO_ROOT not in sys.path:
+    sys.path.append(REPO_ROOT)
+
+from src.row_hashing import FINGERPRINT_VERSION, fingerprint_keys, row_fingerprints
+from src.parallel import ordered_map
+from src.profiler import profiled, profiled_iter, profiling, stage
+from src.table_writers import PARQUET_COMPRESSION as DEFAULT_PARQUET_COMPRESSION, WRITERS, open_table_writer, write_table
+from src.tmdl_partitions import m_source_expression, render_partition, update_partition_file
+from src.tmdl_schema import ensure_relationship, ensure_table_ref, remove_relationships, remove_table_ref, render_table, sync_columns, tmdl_data_type
+from src.junk_dimension import JunkDimension
+from src.category_rules import CategoryRules, load_category_rules
+from src.recurrence import NOT_RECURRING, detect_recurrence
+from src.snapshot_store import SnapshotStore
+from src.aggregates import GroupedSums, closing_balances, daily_snapshots, month_sk
+from bank_export import DEFAULT_CHUNKSIZE, DEFAULT_READ_THREADS, NOTIFICATION_CONVERTERS, SOURCE_COLUMNS, find_bank_exports, notification_extractor, read_bank_exports
+from src.surrogate_keys import RESERVED_MEMBERS, SurrogateKeyIndex, natural_key_hashes
+from incremental_load import (
+    DIM_COMPANY_FILE,
+    DIM_TRANSACTION_INFO_FILE,
+    append_fact_rows,
+    append_notification_rows,
+    append_payment_series_rows,
+    append_balance_rows,
+    filter_new_rows,
+    stored_fact_columns,
+    stored_fact_dtypes,
+    read_fact_chunks,
+    read_notification_chunks,
+    read_payment_series,
+    read_balance_history,
+    load_fingerprint_version,
+    load_processed_fingerprints,
+    reset_state,
+    save_fingerprint_version,
+    save_processed_fingerprints
+)
+
+YES_NO_DTYPE = pd.CategoricalDtype(['No', 'Yes'])
+
+TRANSACTION_DIRECTIONS = {
+    'Credit': 'Incoming transaction',
+    'Debit': 'Outgoing transaction'
+}
+TRANSACTION_TYPE_DTYPE = pd.CategoricalDtype(['Incoming transaction', 'Outgoing transaction', ''])
+
+# Flags and expense categories derived by declarative rules, see src/category_rules.py
+CATEGORY_RULES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'category_rules.toml')
+
+# Export format of the star schema, set EXPORT_FORMAT in config.py to override
+EXPORT_FORMAT = getattr(config, 'EXPORT_FORMAT', 'parquet')
+PARQUET_COMPRESSION = getattr(config, 'PARQUET_COMPRESSION', DEFAULT_PARQUET_COMPRESSION)
+
+# Directory holding the bank exports and the exported star schema, set DATA_DIR in config.py to override
+DATA_DIR = getattr(config, 'DATA_DIR', os.path.join(REPO_ROOT, 'data'))
+
+# Reuse company names classified by earlier runs, see classification_cache. A warm cache
+# resolves the names in about a third of the time the matcher takes, a cold one costs about as
+# much as matching. Set CLASSIFICATION_CACHE in config.py to turn it on.
+CLASSIFICATION_CACHE = getattr(config, 'CLASSIFICATION_CACHE', False)
+
+# Directory the semantic model reads the star schema from, as Power BI Desktop on Windows sees
+# it. The committed model uses this path, set MODEL_DATA_DIR in config.py to override
+MODEL_DATA_DIR = getattr(config, 'MODEL_DATA_DIR', r'C:\git\PowerBI-Dashboard-Portfolio\data')
+
+# Rewrite the semantic model to match the export, set UPDATE_MODEL in config.py to make it the default
+UPDATE_MODEL = getattr(config, 'UPDATE_MODEL', False)
+
+FINANCES_MODEL_TABLES = os.path.join(REPO_ROOT, 'dashboards', 'Personal', 'Finances', 'Finances semantic model', 'Finaces semantic model.SemanticModel', 'definition', 'tables')
+
+# Compact output schema: the transaction flags move out of DIM Transaction info into a junk
+# dimension keyed by a bitmask of the flags, set COMPACT_FLAGS in config.py to make it the default
+COMPACT_FLAGS = getattr(config, 'COMPACT_FLAGS', False)
+
+# Semantic model table and the file name (without extension) it is exported to
+EXPORT_FILES = {
+    'DIM Company': 'DIM_Company',
+    'DIM Transaction info': 'DIM_Transaction_info',
+    'DIM Transaction flags': 'DIM_Transaction_flags',
+    'FACT Bank transaction': 'Fact_bank_transactions',
+    'Transaction notifications': 'Transaction_notifications',
+    'AGG Monthly transactions': 'Agg_monthly_transactions',
+    'AGG Daily balance': 'Agg_daily_balance'
+}
+TRANSACTION_FLAGS_TABLE = 'DIM Transaction flags'
+
+# Aggregate tables precomputed next to the fact table, so visuals at month or day grain do not
+# scan every transaction, set AGGREGATES in config.py to make them the default
+AGGREGATES = getattr(config, 'AGGREGATES', False)
+MONTHLY_TRANSACTIONS_TABLE = 'AGG Monthly transactions'
+DAILY_BALANCE_TABLE = 'AGG Daily balance'
+
+# Side table of the structured notification fields of the transactions that have any, keyed
+# by transaction_sk, the compact key of the row fingerprint that the fact table carries too
+NOTIFICATIONS_TABLE = 'Transaction notifications'
+
+# Tables that are only part of the semantic model when they are exported, with their
+# description and their relationships as (from table, from column, to table, to column)
+OPTIONAL_TABLES = {
+    TRANSACTION_FLAGS_TABLE: (
+        'Every combination of the transaction flags, keyed by their bitmask',
+        [('FACT Bank transaction', 'transaction_flags_sk', TRANSACTION_FLAGS_TABLE, 'transaction_flags_sk')]
+    ),
+    MONTHLY_TRANSACTIONS_TABLE: (
+        'Total amount and number of transactions per month, company, type of transaction and expense category',
+        [(MONTHLY_TRANSACTIONS_TABLE, 'month_sk', 'DIM Date', 'Date SK'), (MONTHLY_TRANSACTIONS_TABLE, 'company_sk', 'DIM Company', 'company_sk')]
+    ),
+    NOTIFICATIONS_TABLE: (
+        'Structured fields of the notifications text, for the transactions that have any',
+        [('FACT Bank transaction', 'transaction_sk', NOTIFICATIONS_TABLE, 'transaction_sk')]
+    ),
+    DAILY_BALANCE_TABLE: (
+        'Balance of every account at the end of every day, carried forward over days without transactions',
+        [(DAILY_BALANCE_TABLE, 'date_sk', 'DIM Date', 'Date SK')]
+    )
+}
+
+
+TRANSACTION_FLAG_COLUMNS = ['is_person_to_person_transaction', 'is_salary', 'is_fastfood', 'is_groceries', 'is_tikkie', 'is_savings', 'is_investment', 'is_income', 'is_expense']
+
+# Levels of the [categories] table in CATEGORY_RULES_FILE
+EXPENSE_CATEGORY_COLUMNS = ['expense_category', 'expense_subcategory']
+
+COMPANY_NATURAL_KEY = ['company_name', 'is_restaurant']
+TRANSACTION_INFO_NATURAL_KEY = ['counterparty', 'name_or_description', 'type_of_transaction'] + TRANSACTION_FLAG_COLUMNS + EXPENSE_CATEGORY_COLUMNS
+COMPACT_TRANSACTION_INFO_NATURAL_KEY = ['counterparty', 'name_or_description'] + EXPENSE_CATEGORY_COLUMNS
+
+TRANSACTION_FLAGS = JunkDimension(
+    'transaction_flags_sk',
+    TRANSACTION_FLAG_COLUMNS,
+    {'type_of_transaction': list(TRANSACTION_TYPE_DTYPE.categories)}
+)
+
+# Descriptions of the columns added to the semantic model, next to those of the category rules
+TRANSACTION_FLAG_DESCRIPTIONS = {
+    'transaction_sk': 'Key of the transaction, derived from its row fingerprint, relates to Transaction notifications',
+    'transaction_flags_sk': 'Bitmask of the transaction flags (bit 0 is the first flag) with the type of transaction in the bits above them',
+    'is_person_to_person_transaction': 'Transfer between private persons',
+    'is_tikkie': 'Tikkie payment request, not classified yet',
+    'type_of_transaction': 'Incoming or outgoing transaction',
+    'payment_recurrence': 'Period at which the payments of this transaction recur (Weekly, Monthly, Quarterly or Yearly), or Not recurring'
+}
+
+# Descriptions of columns that mean something else in one table, over the descriptions above
+TABLE_COLUMN_DESCRIPTIONS = {
+    NOTIFICATIONS_TABLE: {
+        'transaction_sk': 'Key of the transaction the fields were extracted from, relates to FACT Bank transaction'
+    }
+}
+
+# Descriptions of the columns of the aggregate tables
+AGGREGATE_DESCRIPTIONS = {
+    'month_sk': 'First day of the month as YYYYMM01, relates to the Date SK of DIM Date',
+    'transaction_count': 'Number of transactions',
+    'date_sk': 'Day as YYYYMMDD, relates to the Date SK of DIM Date',
+    'balance_euro': 'Balance at the end of the day',
+    'is_transaction_day': 'Whether the account has transactions on this day, the balance is carried forward otherwise'
+}
+
+# Euro amounts of the aggregate tables, imported as fixed decimal (Currency) like the fact amounts
+CURRENCY_COLUMNS = ['amount_in_euro', 'balance_euro']
+
+# Group keys of the monthly summary, the attributes are looked up in the dimensions
+MONTHLY_ATTRIBUTE_COLUMNS = ['type_of_transaction'] + EXPENSE_CATEGORY_COLUMNS
+MONTHLY_KEY_COLUMNS = ['month_sk', 'company_sk'] + MONTHLY_ATTRIBUTE_COLUMNS
+
+# Checkpoint every classified chunk, so the star schema can be rebuilt without classifying
+# again (see --resume), set CHECKPOINTS in config.py to change the default
+CHECKPOINTS = getattr(config, 'CHECKPOINTS', True)
+SNAPSHOT_DIR = 'snapshots'
+TRANSACTIONS_SNAPSHOT = 'transactions'
+
+# Columns holding the natural_key_hashes of the dimensions, computed while classifying
+COMPANY_KEY_HASH = 'company_key_hash'
+TRANSACTION_INFO_KEY_HASH = 'transaction_info_key_hash'
+
+def _hash_values(values: list, algorithm: str, salt: str) -> list[str]:
+    # The salt is hashed once, every value only pays for copying that state and its own bytes
+    salted = hashlib.new(algorithm)
+    salted.update(salt.encode('utf-8'))
+
+    hashes = []
+    for value in values:
+        h = salted.copy()
+        h.update(str(value).encode('utf-8'))
+        hashes.append(h.hexdigest())
+
+    return hashes
+
+@profiled('hash counterparty')
+def hash_column(
+    values: pd.Series,
     algorithm: str = 'sha256',
-    salt: str = ''
-) -> Optional[str]:
+    salt: str = '',
+    max_workers: Optional[int] = None,
+    parallel_threshold: int = 200_000
+) -> pd.Series:
     """
-    Securely hash a DataFrame columns values with a secret salt. Salt is equivalent to a random value you can pass to the hash function to make it more secure.
-    Since the salt variable is stored somewhere securely it's impossible to reverse engineer the code.
+    Securely hash the values of a column with a secret salt: every value becomes the hex digest
+    of the salt followed by the value's text, so the original values cannot be recovered
+    without the salt. Only the distinct non-null values are hashed and the digests are mapped
+    back, so the cost scales with the number of distinct counterparties instead of the number
+    of rows, and a value gets the same digest in every row and every run.
 
     Parameters:
-        row_value (Optional[str]): The value of row to hash (can be None or NaN)
+        values (pd.Series): The column to hash (can contain None or NaN)
         algorithm (str): Hash algorithm ('sha256', 'md5', 'sha1', etc.)
-        env_var (str): Name of the environment variable holding the secret salt
+        salt (str): Secret salt prepended to every value
+        max_workers (Optional[int]): Spread the distinct values over a process pool of this size
+        parallel_threshold (int): Minimum number of distinct values before the pool is used
 
     Returns:
-        Optional[str]: Hexadecimal hash string, or None if input is NaN
+        pd.Series: Hexadecimal hash strings aligned with the input, None where the input is NaN
     """
+    codes, uniques = pd.factorize(values)
+    uniques = list(uniques)
 
-    if pd.isna(row_value):
-        return None
+    if max_workers and max_workers > 1 and len(uniques) >= parallel_threshold:
+        chunk_size = -(-len(uniques) // max_workers)
+        chunks = [uniques[start:start + chunk_size] for start in range(0, len(uniques), chunk_size)]
 
-    h = hashlib.new(algorithm)
-    h.update((salt + str(row_value)).encode('utf-8'))
-    return h.hexdigest()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            hashed_chunks = executor.map(_hash_values, chunks, repeat(algorithm), repeat(salt))
+            digests = [digest for chunk in hashed_chunks for digest in chunk]
+    else:
+        digests = _hash_values(uniques, algorithm, salt)
 
-def row_hashing(row):
-    row_str = "|".join(map(str, row.values))
-    return hashlib.md5(row_str.encode()).hexdigest()
+    # factorize marks missing values with -1, which picks up the trailing None
+    lookup = np.array(digests + [None], dtype=object)
+    return pd.Series(lookup[codes], index=values.index, dtype=object)
 
-def credit_debit_rename(row):
-    if row == 'Credit':
-        return 'Incoming transaction'
-    elif row == 'Debit':
-        return 'Outgoing transaction'
-    else:
-        return ''
-    
-def company_name(
-    row: pd.Series, 
-    *func_col_pairs: tuple[Callable, str]
-) -> Optional[str]:
-    """
-    Try multiple (function, column_name) pairs until one returns a non-empty result.
-
-    Example:
-        company_name(row,
-                     (company_name_from_text, 'Counterparty'),
-                     (company_name_by_hash, 'hash_banking_identification'))
-    """
-    for func, col in func_col_pairs:
-        if col not in row:
-            # optional: log or warn
+@profiled('type of transaction')
+def credit_debit_rename(debit_or_credit: pd.Series) -> pd.Series:
+    """Map the ING 'Debit/credit' column to incoming/outgoing labels, empty for anything else."""
+    renamed = debit_or_credit.map(TRANSACTION_DIRECTIONS).fillna('')
+    return renamed.astype(TRANSACTION_TYPE_DTYPE)
+
+def yes_no(mask: pd.Series) -> pd.Series:
+    """Convert a boolean mask to the 'Yes'/'No' flag format used in the dimensions."""
+    codes = mask.fillna(False).astype('int8').to_numpy()
+    return pd.Series(pd.Categorical.from_codes(codes, dtype=YES_NO_DTYPE), index=mask.index)
+
+@profiled('company name')
+def company_name(df: pd.DataFrame) -> pd.Series:
+    """
+    Resolve the company of every transaction. The counterparty hash is tried first and the
+    description text is only used where the hash gives no (or an empty) result. When a
+    classification cache is open, only descriptions it has not seen before are matched.
+
+    Parameters:
+        df (pd.DataFrame): Transactions with 'hash_banking_identification' and 'name_or_description'
+
+    Returns:
+        pd.Series: Company names, None where neither lookup found a company
+    """
+    cache = default_cache()
+    if cache is None:
+        return resolve_company_names(df['name_or_description'], df['hash_banking_identification'])
+
+    return cache.resolve(df['name_or_description'], df['hash_banking_identification'], resolve_company_names)
+
+def resolve_company_names(descriptions: pd.Series, hashes: pd.Series) -> pd.Series:
+    """company_name without the classification cache, from the hash registry and the text rules."""
+    by_hash = default_registry().company_names(hashes)
+    by_text = company_names_from_text(descriptions)
+
+    return by_hash.where(by_hash.notna() & (by_hash != ''), by_text)
+
+def company_names_from_text(texts: pd.Series) -> pd.Series:
+    """
+    Company name of every description by the text rules of the company matcher, matched on
+    the lowercased text for the whole column at once.
+
+    Parameters:
+        texts (pd.Series): Free text such as the 'name_or_description' column
+
+    Returns:
+        pd.Series: Company names aligned with the input, None where no rule matched
+    """
+    return default_matcher().match_series(texts)
+
+def is_tikkie(df: pd.DataFrame) -> pd.Series:
+    # Not implemented yet, kept as an empty column so the dimension layout stays the same
+    return pd.Series(None, index=df.index, dtype=object)
+
+@profiled('person to person')
+def is_person_to_person(df: pd.DataFrame) -> pd.Series:
+    return yes_no(default_registry().is_person_to_person(df['hash_banking_identification']))
+
+def payment_series_rows(chunk: pd.DataFrame, fact_rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Payment history rows of a classified chunk, for the recurring payment detection. A payment
+    belongs to the series of its mandate, of its counterparty when it has no mandate and of its
+    DIM Transaction info member when it has neither, e.g. a card payment. Counterparties are
+    identified by their salted hash, so the stored history holds no account numbers.
+    """
+    member = 'T:' + fact_rows['transaction_info_sk'].astype('str')
+    counterparty = ('C:' + chunk['hash_banking_identification'].astype('str')).fillna(member)
+    series_key = ('M:' + chunk['mandate_id'].astype('str')).fillna(counterparty)
+
+    return pd.DataFrame({
+        'series_key': series_key,
+        'transaction_info_sk': fact_rows['transaction_info_sk'],
+        'received_date_sk': chunk['received_date_sk'],
+        'amount_in_euro': chunk['amount_in_euro']
+    })
+
+@profiled('detect recurring payments')
+def payment_recurrence(payment_series: pd.DataFrame) -> pd.Series:
+    """
+    Recurrence of every DIM Transaction info member over the whole payment history, see
+    src.recurrence.detect_recurrence. A member takes the recurrence of the series of its latest payment.
+
+    Parameters:
+        payment_series (pd.DataFrame): Rows from payment_series_rows
+
+    Returns:
+        pd.Series: Recurrence label indexed by transaction_info_sk
+    """
+    dates = pd.to_datetime(payment_series['received_date_sk'].astype('str'), format='%Y%m%d')
+    recurrence = detect_recurrence(payment_series['series_key'], dates, payment_series['amount_in_euro'])['recurrence']
+
+    latest = payment_series.sort_values('received_date_sk', kind='stable').drop_duplicates('transaction_info_sk', keep='last')
+    return pd.Series(latest['series_key'].map(recurrence).to_numpy(), index=latest['transaction_info_sk'].to_numpy())
+
+def add_payment_recurrence(dim: pd.DataFrame, recurrence: pd.Series) -> pd.DataFrame:
+    """Add the payment_recurrence attribute to DIM Transaction info, reserved members keep their meaning."""
+    keys = dim['transaction_info_sk']
+    labels = keys.map(recurrence).fillna(NOT_RECURRING)
+    labels = labels.where(~keys.isin(list(RESERVED_MEMBERS)), keys.map(RESERVED_MEMBERS))
+
+    return dim.assign(payment_recurrence=labels.astype('str'))
+
+def balance_rows(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Balance history rows of a classified chunk: the balance after every transaction and the signed amount that led to it."""
+    debit = chunk['debit_or_credit'].astype('str') == 'Debit'
+
+    return pd.DataFrame({
+        'source_account': chunk['source_account'],
+        'received_date_sk': chunk['received_date_sk'],
+        'balance_after_transaction_euro': chunk['balance_after_transaction_euro'],
+        'balance_change_euro': chunk['amount_in_euro'].where(~debit, -chunk['amount_in_euro'])
+    })
+
+def monthly_attribute_lookups(dimensions: dict[str, pd.DataFrame]) -> list[tuple[str, pd.DataFrame]]:
+    """
+    The dimensions holding the MONTHLY_ATTRIBUTE_COLUMNS, as (fact key, attributes indexed by that key).
+    The type of transaction moves to DIM Transaction flags in the compact schema.
+    """
+    lookups = []
+    for table_name, key in (('DIM Transaction info', 'transaction_info_sk'), (TRANSACTION_FLAGS_TABLE, TRANSACTION_FLAGS.key_name)):
+        if table_name not in dimensions:
             continue
 
-        value = row[col]
-        result = func(value)
-
-        if pd.notna(result) and result != '':
-            return result
-
-    return None
-
-def company_name_by_hash(row):
-
-    not_company_hash_numbers = [
-                                    '6063d00f024d4d5dd9f9810c242b5edbe0d4419b94b43d4bfbaa01e7195dc78d', 
-                                    '3c17f9293f23fe80947fdc32f0fcce1965c10d1636c7e8b664851578fb407823',
-                                    '77600747dff4969471f23d75f54537f96fe2123b65daa5ddc9d6d5779a972da9',
-                                    'c9f891f01c7b74a5af54f5bfd0a0871222ce485672441dbf852b66f5151b6619'
-                                    ]
-    
-    tikkie_hash_numbers = ['de3b846a60d61ef3761f09ef2d97d4e61a854c23a72bf36da95e56608cd97507', '3c17f9293f23fe80947fdc32f0fcce1965c10d1636c7e8b664851578fb407823']
-    
-    paypal_hash_numbers = [
-                                    '953c2232c86d1f6b8701c8d6c84d354f3fc92d58b9c39034323cbbbe5c39c6d6', 
-                                    'eaa748ac2ce10da6dac354c7d3a4afa7adc7c67f4ea140948a8df9750fc02505',
-                                    'c8732f00634fc6b8a7abe458d982adcc44bd979bd7f7ae97ee1a9d7ed31de454'
-                                    ]
-    
-    stichting_amstelland_hash_numbers = [
-                                            '4881fe650fccc68868d6907b4e617261466fa97eb91df4b79ac6b2bb34ad09f5'
-                                            ]
-
-    hash_map = {
-        '863ab00a3012e8e7738b16b63ab4c1ac56ddb42017cc136d98f4151ce8ad3173': 'Belastingdienst',
-        '208c746022825b1c429f6d8ce1b185f039818f69cca40149cd3ff209069ee502': 'KPN',
-        '8e7779981dca4f4bdd24a7ad13cdf082b2e15ac9034f444508ee7df6f4162012': 'Netflix',
-        '36ac166d93c120667b6058d59c246d702a4cff7102b5a653648680d73dec31e6': 'Thuisbezorgd',
-        '6d82b1089f14bd8441c256e7602fc9db5c3fcdee65858713bf3d580eabd44318': 'CE Logistics Group B.V.',
-        '68c4686b6f53f775d1ddbe5453640217e11ddd4b90520ff6015c6f2f099c9d2d': 'IU International Hochschule',
-        'cd2db137e2ce588f0e82edcfabf0a8cbc39afef557cb22e5666968689aa564ed': 'Nationale Nederlanden groep N.V.',
-        'eb76f8b2f0e3302cce88eadd2c4b07b6b59d9cb25081cb90d1523dac18fd1ff8': 'Bol.com',
-        'd2a016f1f87b51516858e3d50dea7e586e29eece380c930acaf37f8b947ad9be': 'Achmea',
-        '841e9d1f046c313605e4f1da35f39c8a9015254f49c21dc19cb7eb6d082fd137': 'Steam',
-        'f60fc8d92afc9d5cd7c74ce9d5d4f830bfb919fca9c2c1dbd5a1986f9de0c6fd': 'ING',
-        '2471d363ace675723b9a90b695b95bbe3cad19df59204f88048c57005e7dd84d': 'Zilverenkruis',
-        '8b72d9003004609d96eb8ce185c35cfa1327fde550c1b24aa59d4704a4815d07': 'Michiel de Ruyter roei en kano vereniging',
-        '19923858546e3a8c9457f28533c6986f204bc0aa6ebf223080a9a25ca93af07f': 'Beach House Media',
-        '48ec237c12df91211a642527f1d9691931da9d601c380c00e8c6ee1b4dd1b8ac': 'ANWB',
-        '9ab9c34aee2153d976fef1189ad6b433db822975ea40042e4fc65580ba05cef5': 'Rabobank',
-        '2f4f7551caaeee871c84d7e9b43e2c1514d5a4419e188d04d853881a7f2de050': 'Yellowstone'
-    }
-    
-    if row in paypal_hash_numbers:
-        return 'PayPal'
-    elif row in tikkie_hash_numbers:
-        return 'Tikkie'
-    elif row in not_company_hash_numbers:
-        return 'Not a company'
-    elif row in stichting_amstelland_hash_numbers:
-        return 'Stichting AmstellandBibliotheken'
-    elif row in hash_map:
-        return hash_map[row]
-    
-def company_name_from_text(row):
-
-    row_lowercase = str(row).lower()
-
-    if 'albert heijn' in row_lowercase:
-        return 'Albert Heijn'
-    elif 'ah to go' in row_lowercase:
-        return 'Albert Heijn'
-    elif 'albertheijn' in row_lowercase:
-        return 'Albert Heijn'
-    elif 'albert-heijn' in row_lowercase:
-        return 'Albert Heijn'
-    elif 'mcdonald' in row_lowercase:
-        return 'McDonalds'
-    elif 'mc donalds' in row_lowercase:
-        return 'McDonalds'
-    elif "mc donald's" in row_lowercase:
-        return 'McDonalds'
-    elif 'mc drive' in row_lowercase:
-        return 'McDonalds'
-    elif 'thuisbezorgd' in row_lowercase:
-        return 'Thuisbezorgd'
-    elif 'the flying chicken' in row_lowercase:
-        return 'The Flying Chicken'
-    elif 'www.ovpay.nl' in row_lowercase:
-        return 'Openbaar Vervoer'
-    elif 'ov busstation' in row_lowercase:
-        return 'Openbaar Vervoer'
-    elif 'kfc' in row_lowercase:
-        return 'KFC'
-    elif 'burger king' in row_lowercase:
-        return 'Burger King'
-    elif 'greggs' in row_lowercase:
-        return 'Greggs'
-    elif 'achmea' in row_lowercase:
-        return 'Achmea'
-    elif 'erv-dea b.v.' in row_lowercase:
-        return 'Energiebedrijf DeA'
-    elif 'energiebedrijf dea' in row_lowercase:
-        return 'Energiebedrijf DeA'
-    elif 'hermans & schuttevaer' in row_lowercase:
-        return 'Hermans & Schuttevaer Notarissen N.V.'
-    elif 'hermans + schuttevaer' in row_lowercase:
-        return 'Hermans & Schuttevaer Notarissen N.V.'
-    elif 'watersport verbond' in row_lowercase:
-        return 'Watersportverbond'
-    elif 'watersportverbond' in row_lowercase:
-        return 'Watersportverbond'
-    elif 'huysinc' in row_lowercase:
-        return 'Huysinc B.V.'
-    elif 'airbnb' in row_lowercase:
-        return 'Airbnb'
-    elif 'kiosk' in row_lowercase:
-        return 'Kiosk'
-    elif 'medion' in row_lowercase:
-        return 'Medion'
-    elif 'coolblue' in row_lowercase:
-        return 'Coolblue'
-    elif 'emirates' in row_lowercase:
-        return 'Emirates'
-    elif 'opa 90' in row_lowercase:
-        return 'Opa 90'
-    elif 'linkedin' in row_lowercase:
-        return 'LinkedIn'
-    elif 'duo' in row_lowercase:
-        return 'DUO'
-    elif 'kanopoloshop' in row_lowercase:
-        return 'Kanopoloshop'
-    elif 'hogeschool inholland' in row_lowercase:
-        return 'Hogeschool Inholland'
-    elif 'aldi' in row_lowercase:
-        return 'Aldi'
-    elif 'asr levverz' in row_lowercase:
-        return 'ASR'
-    elif 'ncoi' in row_lowercase:
-        return 'NCOI'
-    elif 'van grunsven' in row_lowercase:
-        return 'Bouwbedrijf van Grunsven'
-    elif 'kosten oranjepakket' in row_lowercase:
-        return 'ING'
-    elif 'bonusrenterekening' in row_lowercase:
-        return 'ING'
-    elif 'oranje spaarrekening' in row_lowercase:
-        return 'ING'
-    elif 'apple' in row_lowercase:
-        return 'Apple'
-    elif 'febo' in row_lowercase:
-        return 'Febo'
-    elif 'bella donna' in row_lowercase:
-        return 'Bella Donna'
-    elif 'bruna' in row_lowercase:
-        return 'Bruna'
-    elif 'starbuck' in row_lowercase:
-        return 'Starbucks'
-    elif 'the phone house' in row_lowercase:
-        return 'The Phone House'
-    elif 'urkv michiel de ru uithoorn' in row_lowercase:
-        return 'Michiel de Ruyter roei en kano vereniging'
-    elif 'deen' in row_lowercase:
-        return 'Deen Supermarkten'
-    elif 'netflix' in row_lowercase:
-        return 'Netflix'
-    elif 'dfds' in row_lowercase:
-        return 'DFDS Seaways'
-    elif 'isney' in row_lowercase:
-        return 'Disney plus'
-    elif 'domino' in row_lowercase:
-        return "Domino's Pizza"
-    elif 'doner city' in row_lowercase:
-        return "Doner City"
-    elif 'pathe' in row_lowercase:
-        return "Pathe"
-    elif 'hema' in row_lowercase:
-        return "Hema"
-    elif 'creditcard' in row_lowercase:
-        return "ING"
-    elif 'jagexgamesstudio' in row_lowercase:
-        return "Jagex Games Studio"
-    elif 'jumbo' in row_lowercase:
-        return "Jumbo"
-    elif 'kwalitaria' in row_lowercase:
-        return "Kwalitaria"
-    elif 'kruidvat' in row_lowercase:
-        return "Kruidvat"
-    elif 'praxis' in row_lowercase:
-        return "Praxis"
-    elif 'lidl' in row_lowercase:
-        return "Lidl"
-    elif 'media markt' in row_lowercase: 
-        return "MediaMarkt"
-    elif 'multimate' in row_lowercase: 
-        return "Multimate"
-    elif 'schaft tweewielers' in row_lowercase: 
-        return "Schaft Tweewielers"
-    elif 'action' in row_lowercase: 
-        return "Action"
-    elif 'dienst uitvoering onderwijs' in row_lowercase:
-        return "DUO"
-    elif 'nationale-nederlanden' in row_lowercase: 
-        return "Nationale Nederlanden groep N.V."
-    elif 'smullers' in row_lowercase: 
-        return "Smullers"
-    elif 'theanything' in row_lowercase: 
-        return "TheAnything B.V."
-    elif 'bcc elektro-speciaalzaken' in row_lowercase: 
-        return "BCC Elektro-Speciaalzaken"
-    elif 'station doner kebab' in row_lowercase:
-        return "Station Döner Kebab"
-    elif 'subway' in row_lowercase:
-        return "Subway"
-    elif 'shell' in row_lowercase: 
-        return "Shell"
-    elif 'vomar' in row_lowercase: 
-        return "Vomar"
-    elif 'the doner company' in row_lowercase:
-        return "The Döner Company"
-    elif 'under armour' in row_lowercase:
-        return "Under Armour"
-    elif 'la place' in row_lowercase:
-        return "La Place"
-    elif 'kwaritaria' in row_lowercase:
-        return "Kwalitaria"
-    #TODO: Make strictrect with re libraary to avoid false positives
-    elif ' ing' in row_lowercase:
-        return "ING"
-    elif 'ah' in row_lowercase:
-        return 'Albert Heijn'
-    elif 'mcd' in row_lowercase:
-        return 'McDonalds'
-    elif 'klm' in row_lowercase:
-        return 'KLM'
-    elif 'ns' in row_lowercase:
-        return 'Nederlandse Spoorwegen'
-    else:
-        return None
-    
-def is_tikkie(row):
-    pass
-
-def is_person_to_person(row):
-    hash_mapping = [
-        '98ccdc7c949735fc9f2158a403309a2628c7fb5528336ae31cead3a1f10cf982',
-        '6656c2285cf7f28e14373c5135ab0fe6dd08d4872baed8b4dcce96cd8a3aad03',
-        'e60df24675f775feb9ec00d314c5029cfc937871358c1f80964ee79588156882',
-        '69890ddc3547268b4fb6bf43022475f1bc42cdbebf8391c574f99f79e4719dbe',
-        '27c1b9d2c0981f9f5b78b574b9b61c947d1e0a35f6258efc7a80be57f8a4ec74',
-        '623a8939f1ecaec8188a1f0b6c65f95a94a2dc2244449089337829fbbb9614d9',
-        '95c56ed950275b5743b3cc3278957586ec5027c9174ccc4d1ee9adf042760474',
-        '9201a4ed823021602ebb1ab5ad6fad629c60246a92c65334777a72725956d322',
-        '81c3a67d02b82186c8ff94815c1e0598cadca95b15eec4333c4044cfdef62e72',
-        '0f1ecfccba1b263c68a95f831669a626e8e6cce59ce4060010002434bde872e8',
-        '1098284f663fb035157bade97b08691f3df45fe957c365ecd00bc804d574629c',
-        '10b7fd64fe5de8b2a50f99460e62710f8f460d13bf5c51c5432264a55bd7714d',
-        '1dd178327016abf63885ef61781af31373a43d58f2d26c9b261ad8dd9b689220',
-        '20dab74091b37c651582acf658e0bb587d99480bdc6380209cdc38875bbbc8ee',
-        '2710e98e40b62108804d95837848ab167a103f8e929584e77d9be03a00210e23',
-        '27c1b9d2c0981f9f5b78b574b9b61c947d1e0a35f6258efc7a80be57f8a4ec74',
-        '2b3e4a90f2d6379d66a30ec12f9e87e942eae851eb62ac2bb1cf61164ba0088a',
-        '2e54388a8f5b7aa943c6a8800c913ac421e97a1b96719527f12574d3a9808ccb',
-        '3e2af1035ae09ed0f3fd9ef2354b9dcb50e5a45843bd1c96584ca75f0bb7fcfa',
-        '49aa6f7e5c28e6b60c5fa383666afd765d04b120f9a836af5b7e20d710e7b53f',
-        '4cbbd5b615aeea2560b198aab1dd06150f1fb61b12a7d5617b2b587d0cc0cf64',
-        '541870f01bad5658a15648105d3259cfb129f12f5f31ca245b95a81d27d5c930',
-        '623a8939f1ecaec8188a1f0b6c65f95a94a2dc2244449089337829fbbb9614d9',
-        '7159ace12ccba9667eef7d2b00be01003fc6cb550962af48da47340d93048634',
-        '7f98807853b7946adcb6416f60d6ca156609e85fcda27fce7385ed0a3dec8ac0',
-        '867ce4f65b76c94ff23cd843d906499aceeed1fd59105ebdfa83be27bbe6ab8e',
-        '869cd2fbcf6e02d8813da5e30927f7c1088f29ca1e5fafd120815b385bf95540',
-        '90e6b55e5b2a493f33c567ecf8a0d40c819108bf277d695bf02ec6bcf6dc4ce8',
-        '916520f6b8018c6ae494061ca08c7c7a2fd5c1100e54bc8649b241bc70eb61dd',
-        '93506f431d4eb2fc0a74c28cd5b55162f77fdc2b69ca2a4af379f58c683a37b2',
-        '93506f431d4eb2fc0a74c28cd5b55162f77fdc2b69ca2a4af379f58c683a37b2',
-        '95c56ed950275b5743b3cc3278957586ec5027c9174ccc4d1ee9adf042760474',
-        'a115ba00146f24b599574eed66615e76065642f062183760b0107f803b2f15a6',
-        'a20904f69a89fc2d468aa1e293563f30c902dc3571711ea68bb46c4e3b2a3628',
-        'a3bb2158dca8094197d2aad648dc33829042e3692a8e2100aa7575c79827e175',
-        'a3dbed6bbadf87aabb7ee0fde5e0b3317644eb89fa878406a94777d489bfd051',
-        'b54a997bc68cb2ac53eb8b7a14aa7f064c0732f2494b594b676fcc9a7e8935f3',
-        'bf476cc651696552905e386cb3d2f048e030321c318f540ec84d6cad25bddcb6',
-        'c6609ca86c1935090aa1da0440e591e7797150ab4e9d3225a99fe6609b521447',
-        'c85786e9dbb551d8045de372f4d8e365b4715b2ebf7f8a21b0e6b1d8ee2f27bb',
-        'cb6c7888de654fe812e73b45485a6da72e64b693a4673302037ce20eccf618ce',
-        'ce1d5107e8b37a4df989e77f84efee0f171a6be27d50bad5884ab08781007c92',
-        'd17faf0da9fe8488734b6a2880fce0b5197009b8a7952c0827425c992109a295',
-        'dbf44f30bc2caf43fd48b7b2d9dd1a7e279590cad7edd981c754831631e9e0bb',
-        'ec97959ed894a8fa0a5dd1ba881b2d90d64e6186c1d8d7aa48e858210c4f2dd5',
-        'ece04c89bb5c84bc9d7ff91f38bdcec5f579908cc94cfef2a13e01acb71bf27b',
-        'fbd27a56a090915cc486d811c43e20e3aca381a01c5453e8cd45c112e5e69682'
-    ]
-
-def is_salary(row):
-    
-    if row['company_name'] in ['Achmea', 'CE Logistics Group B.V.', 'Yellowstone'] and row['type_of_transaction'] == 'Incoming transaction':
-        return 'Yes'
-    else:
-        return 'No'
+        columns = [column for column in MONTHLY_ATTRIBUTE_COLUMNS if column in dimensions[table_name].columns]
+        lookups.append((key, dimensions[table_name].set_index(key)[columns]))
 
-def is_fastfood(row):
+    return lookups
 
-    if row['company_name'] in ['McDonalds', 'Opa 90', 'Thuisbezorgd', 'The Flying Chicken', 'KFC', 'Burger King', 'Subway', "Domino's Pizza", 'Doner City', 'Smullers', 'Station Döner Kebab', 'The Döner Company', 'Starbucks', 'Greggs', 'Febo', 'Kwalitaria']:
-        return 'Yes'
-    else:
-        return 'No'
-    
-def is_groceries(row):
+def monthly_transaction_rows(fact_chunk: pd.DataFrame, lookups: list[tuple[str, pd.DataFrame]]) -> pd.DataFrame:
+    """Fact rows with the MONTHLY_KEY_COLUMNS of the monthly summary and their amount."""
+    rows = pd.DataFrame({
+        'month_sk': month_sk(fact_chunk['received_date_sk']),
+        'company_sk': fact_chunk['company_sk'],
+        'amount_in_euro': fact_chunk['amount_in_euro']
+    }, index=fact_chunk.index)
 
-    if row['company_name'] in ['Albert Heijn', 'Aldi', 'Jumbo', 'Lidl', 'Vomar', 'Deen Supermarkten', 'Kruidvat']:
-        return 'Yes'
-    else:
-        return 'No'
-    
-def is_restaurant(row):
-    if row['company_name'] in ['Bella Donna', '']:
-        return 'Yes'
-    else:
-        return 'No'
+    for key, attributes in lookups:
+        looked_up = attributes.reindex(fact_chunk[key].to_numpy())
+        for column in attributes.columns:
+            rows[column] = looked_up[column].to_numpy()
 
-def is_recurring_payment(row):
-    pass
+    return rows
 
-def is_savings(row):
-    #TODO make stricter for futher proofing
-    if row['name_or_description'] in ['NOTPROVIDED', 'Oranje Spaarrekening', 'Bonusrenterekening', 'Je oude Bonusrenterekening', 'To Bonusrenterekening', 'From Bonusrenterekening']:
-        return 'Yes'
-    else:
-        return 'No'
+@profiled('daily balance')
+def daily_balance(balance_history: pd.DataFrame) -> pd.DataFrame:
+    """
+    The AGG Daily balance table: the closing balance of every account on every day from its
+    first transaction up to the latest transaction of all accounts, see src.aggregates.
 
-def is_investment(row):
-    if row['company_name'] in ['Energiebedrijf DeA']:
-        return 'Yes'
-    else:
-        return 'No'
+    Parameters:
+        balance_history (pd.DataFrame): Rows from balance_rows
 
-def is_expense(row):
-    if row['is_savings'] == 'Yes':
-        return 'No'
-    elif row['type_of_transaction'] == 'Outgoing transaction':
-        return 'Yes'
-    else:
-        return 'No'
+    Returns:
+        pd.DataFrame: 'date_sk', 'source_account', 'balance_euro' and 'is_transaction_day'
+    """
+    closing = closing_balances(
+        balance_history['source_account'],
+        balance_history['received_date_sk'],
+        balance_history['balance_after_transaction_euro'],
+        balance_history['balance_change_euro']
+    )
+    snapshots = daily_snapshots(closing)
+
+    return pd.DataFrame({
+        'date_sk': snapshots['date_sk'],
+        'source_account': snapshots['account'].astype('str'),
+        'balance_euro': snapshots['balance'].astype('float64'),
+        'is_transaction_day': yes_no(snapshots['is_transaction_day'])
+    })
+
+@lru_cache(maxsize=None)
+def default_category_rules() -> CategoryRules:
+    """The rules in CATEGORY_RULES_FILE, compiled once per process."""
+    return load_category_rules(CATEGORY_RULES_FILE)
+
+@profiled('transaction flags')
+def add_transaction_flags(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Derive the category flags and the expense category in one evaluation of the category rules.
+    Adding a flag or category to CATEGORY_RULES_FILE adds no pass over the transactions.
 
-def is_income(row):
-    if row['is_salary'] == 'Yes':
-        return 'Yes'
-    elif row['is_investment'] == 'Yes' and row['type_of_transaction'] == 'Incoming transaction':
-        return 'Yes'
-    else:
-        return 'No'
-
-def add_expense_categories(row):
-    pass
-
-def add_surrogate_key(df: pd.DataFrame, key_name: str = "surrogate_key") -> pd.DataFrame:
-    """
-    Adds a surrogate key column as the first column of the DataFrame.
-    
-    Parameters
-    ----------
-    df : pd.DataFrame
-        The input DataFrame.
-    key_name : str, optional
-        The name of the surrogate key column (default is 'surrogate_key').
-        
-    Returns
-    -------
-    pd.DataFrame
-        A new DataFrame with the surrogate key as the first column.
-    """
-    # Create a copy to avoid mutating the original DataFrame
-    df = df.copy()
-    
-    # Creating the surrogate key
-    df[key_name] = range(1, len(df) + 1)
-    
-    # Reorder columns to make the key the first column
-    cols = [key_name] + [col for col in df.columns if col != key_name]
-    df = df[cols]
-    
-    return df
+    Parameters:
+        df (pd.DataFrame): Transactions with every column the category rules test, e.g.
+            'company_name', 'type_of_transaction' and 'name_or_description'
+
+    Returns:
+        pd.DataFrame: The same DataFrame with the flag columns added as 'Yes'/'No' categoricals
+            and the expense category levels
+    """
+    rules = default_category_rules()
+    evaluated = rules.evaluate(df)
+
+    for flag in rules.flags:
+        df[flag] = yes_no(evaluated[flag])
+    df['is_tikkie'] = is_tikkie(df)
 
-def create_dim_companies(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+    return add_expense_categories(df, evaluated[rules.levels])
 
-    df = df[['company_name', 'is_restaurant']].drop_duplicates()
-    df = add_surrogate_key(df, key_name="company_sk")
+def add_expense_categories(df: pd.DataFrame, categories: pd.DataFrame) -> pd.DataFrame:
+    """Add the expense category levels evaluated by the category rules, one column per level."""
+    missing = [column for column in EXPENSE_CATEGORY_COLUMNS if column not in categories.columns]
+    if missing:
+        raise ValueError(f"The category rules in {CATEGORY_RULES_FILE} do not define the levels {missing}")
+
+    for column in categories.columns:
+        df[column] = categories[column]
 
     return df
 
-def create_dim_transaction_info(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
+def create_dim_companies(state_dir: str) -> SurrogateKeyIndex:
+    # Transactions without a recognised company point at the reserved Unknown member
+    return SurrogateKeyIndex.load(os.path.join(state_dir, DIM_COMPANY_FILE), "company_sk", COMPANY_NATURAL_KEY, required=['company_name'])
+
+def transaction_info_natural_key(compact_flags: bool = False) -> list[str]:
+    return COMPACT_TRANSACTION_INFO_NATURAL_KEY if compact_flags else TRANSACTION_INFO_NATURAL_KEY
+
+def create_dim_transaction_info(state_dir: str, compact_flags: bool = False) -> SurrogateKeyIndex:
+    return SurrogateKeyIndex.load(os.path.join(state_dir, DIM_TRANSACTION_INFO_FILE), "transaction_info_sk", transaction_info_natural_key(compact_flags))
+
+@profiled('assign surrogate keys')
+def create_fact_bank_transactions(
+    main_df: pd.DataFrame,
+    dim_companies: SurrogateKeyIndex,
+    dim_transaction_info: SurrogateKeyIndex,
+    transaction_flags: Optional[JunkDimension] = None
+) -> pd.DataFrame:
+    """
+    Build fact rows, keyed by the compact key of their row fingerprint, by resolving each dimension key with a single lookup on the hashed natural
+    key, adding dimension members for natural keys that are new. Natural key hashes already
+    present on the rows (see prepare_chunk) are used instead of hashing again. With the
+    compact schema the flags are packed into the key of the transaction_flags junk dimension.
+    """
+    fact = pd.DataFrame({
+        'transaction_sk': fingerprint_keys(main_df['hash_value']),
+        'company_sk': dim_companies.assign(main_df, main_df.get(COMPANY_KEY_HASH)),
+        'transaction_info_sk': dim_transaction_info.assign(main_df, main_df.get(TRANSACTION_INFO_KEY_HASH))
+    }, index=main_df.index)
+
+    if transaction_flags is not None:
+        fact[transaction_flags.key_name] = transaction_flags.pack(main_df)
+
+    return pd.concat([fact, main_df[['received_date_sk', 'counterparty', 'amount_in_euro'] + SOURCE_COLUMNS]], axis=1)
+
+def export_options(export_format: str) -> dict:
+    return {'compression': PARQUET_COMPRESSION} if export_format == 'parquet' else {}
+
+def model_file_path(model_data_dir: str, table_name: str, export_format: str) -> str:
+    # Power BI Desktop runs on Windows, so the model gets a Windows style path
+    return ntpath.normpath(ntpath.join(model_data_dir, EXPORT_FILES[table_name] + WRITERS[export_format].extension))
+
+def _write_if_changed(path: str, content: str) -> bool:
+    with open(path, encoding='utf-8') as file:
+        if file.read() == content:
+            return False
+
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(content)
+    return True
+
+def update_model_schema(model_data_dir: str, export_format: str, exported: dict[str, pd.Series]) -> None:
+    """
+    Make the Finances semantic model match the exported tables: the data columns of every
+    exported table follow the export, and the OPTIONAL_TABLES (DIM Transaction flags of the
+    compact schema and the aggregate tables), their relationships and their model references
+    only exist when they are exported.
+
+    Parameters:
+        model_data_dir (str): Directory the semantic model reads the star schema from, see MODEL_DATA_DIR
+        export_format (str): Format the star schema was written in
+        exported (dict[str, pd.Series]): Semantic model table name to the dtypes of its export
+    """
+    model_definition = os.path.dirname(FINANCES_MODEL_TABLES)
+    relationships_path = os.path.join(model_definition, 'relationships.tmdl')
+    model_path = os.path.join(model_definition, 'model.tmdl')
+    descriptions = {**default_category_rules().descriptions, **TRANSACTION_FLAG_DESCRIPTIONS, **AGGREGATE_DESCRIPTIONS}
+
+    for table_name, dtypes in exported.items():
+        columns = {column: 'decimal' if column in CURRENCY_COLUMNS else tmdl_data_type(dtype) for column, dtype in dtypes.items()}
+        table_descriptions = {**descriptions, **TABLE_COLUMN_DESCRIPTIONS.get(table_name, {})}
+        tmdl_path = os.path.join(FINANCES_MODEL_TABLES, f'{table_name}.tmdl')
+
+        if table_name in OPTIONAL_TABLES and not os.path.exists(tmdl_path):
+            partition = render_partition(table_name, m_source_expression(model_file_path(model_data_dir, table_name, export_format), export_format, columns))
+            description, table_relationships = OPTIONAL_TABLES[table_name]
+            # The key is the column other tables relate to, aggregate tables have none
+            key = next((to_column for _, _, to_table, to_column in table_relationships if to_table == table_name), None)
+            with open(tmdl_path, 'w', encoding='utf-8') as file:
+                file.write(render_table(table_name, columns, partition, description, table_descriptions, key))
+            print(f"Added the '{table_name}' table to the semantic model")
+            continue
+
+        with open(tmdl_path, encoding='utf-8') as file:
+            tmdl = file.read()
+        if _write_if_changed(tmdl_path, sync_columns(tmdl, columns, table_descriptions)):
+            print(f"Updated the columns of '{table_name}'")
+
+    with open(relationships_path, encoding='utf-8') as file:
+        relationships = file.read()
+    with open(model_path, encoding='utf-8') as file:
+        model = file.read()
+
+    for table_name, (_, table_relationships) in OPTIONAL_TABLES.items():
+        if table_name in exported:
+            for from_table, from_column, to_table, to_column in table_relationships:
+                relationships = ensure_relationship(relationships, from_table, from_column, to_table, to_column)
+            model = ensure_table_ref(model, table_name)
+            continue
+
+        relationships = remove_relationships(relationships, table_name)
+        model = remove_table_ref(model, table_name)
+        tmdl_path = os.path.join(FINANCES_MODEL_TABLES, f'{table_name}.tmdl')
+        if os.path.exists(tmdl_path):
+            os.remove(tmdl_path)
+            print(f"Removed the '{table_name}' table from the semantic model")
+
+    _write_if_changed(relationships_path, relationships)
+    _write_if_changed(model_path, model)
+
+def update_model_partitions(model_data_dir: str, export_format: str, tables: list[str]) -> None:
+    """
+    Point the partitions of the Finances semantic model at the exported files, so a refresh in
+    Power BI reads the format that was just written.
+    """
+    for table_name in tables:
+        tmdl_path = os.path.join(FINANCES_MODEL_TABLES, f'{table_name}.tmdl')
+        file_path = model_file_path(model_data_dir, table_name, export_format)
+
+        if update_partition_file(tmdl_path, table_name, file_path, export_format):
+            print(f"Updated the '{table_name}' partition to read {file_path}")
+
+def notification_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """Rows of the notification side table: the fingerprint and fields of rows with at least one field."""
+    columns = notification_extractor().columns
+    return df.loc[df[columns].notna().any(axis=1), ['hash_value'] + columns]
+
+def notification_export_rows(rows: pd.DataFrame) -> pd.DataFrame:
+    """Stored notification rows as exported: keyed by transaction_sk like the fact rows, not by the fingerprint."""
+    return pd.concat([fingerprint_keys(rows['hash_value']).rename('transaction_sk'), rows.drop(columns='hash_value')], axis=1)
+
+@profiled('classify')
+def classify_transactions(df: pd.DataFrame, salt: str = HASH_SALT) -> pd.DataFrame:
+    """
+    Run the classification stages that only need the rows themselves, from the counterparty
+    hash up to the category flags and the notification fields.
+
+    Parameters:
+        df (pd.DataFrame): Renamed export rows including their 'hash_value' fingerprint
+        salt (str): Secret salt of the counterparty hashes
+
+    Returns:
+        pd.DataFrame: The same rows with all derived columns added
+    """
+    df['hash_banking_identification'] = hash_column(df['counterparty'], salt=salt)
+    df['is_person_to_person_transaction'] = is_person_to_person(df)
+    df['type_of_transaction'] = credit_debit_rename(df['debit_or_credit'])
+    df['company_name'] = company_name(df)
+    df = add_transaction_flags(df)
 
-    df = df[['counterparty', 'name_or_description', 'type_of_transaction','is_person_to_person_transaction', 'is_salary', 'is_fastfood', 'is_groceries', 'is_tikkie', 'is_savings', 'is_investment', 'is_income', 'is_expense']].drop_duplicates()
-    df = add_surrogate_key(df, key_name="transaction_info_sk")
+    # The notifications are converted once and every field is read from them, mandate_id included
+    with stage('notification fields', len(df)):
+        fields = notification_extractor().extract(df['notifications'])
+        df[fields.columns] = fields
 
     return df
 
-def create_fact_bank_transactions(main_df: pd.DataFrame, dim_companies, dim_transaction_info) -> pd.DataFrame:
-    #TODO: dynamic export path
-    main_df = main_df.copy()
+def prepare_chunk(
+    chunk: pd.DataFrame,
+    processed: set[str],
+    salt: str = HASH_SALT,
+    transaction_info_key: list[str] = TRANSACTION_INFO_NATURAL_KEY
+) -> pd.DataFrame:
+    """
+    Fingerprint an export chunk, drop the rows loaded by earlier runs, classify the rest and
+    hash their dimension natural keys. `transaction_info_key` is the natural key of DIM
+    Transaction info, see transaction_info_natural_key.
+    """
+    # The source columns are left out, so a row in two overlapping exports is the same row
+    with stage('fingerprint rows', len(chunk)):
+        export_columns = [column for column in chunk.columns if column not in SOURCE_COLUMNS]
+        chunk = chunk.assign(hash_value=row_fingerprints(chunk, export_columns))
+
+    with stage('filter processed rows', len(chunk)):
+        chunk = filter_new_rows(chunk, processed)
+
+    if chunk.empty:
+        return chunk
+
+    chunk = classify_transactions(chunk, salt)
+
+    # Hashing the natural keys is the costly part of key assignment and needs no shared
+    # state, so it runs here; only the dictionary lookups are left for the parent
+    with stage('natural key hashes', len(chunk)):
+        chunk[COMPANY_KEY_HASH] = natural_key_hashes(chunk, COMPANY_NATURAL_KEY)
+        chunk[TRANSACTION_INFO_KEY_HASH] = natural_key_hashes(chunk, transaction_info_key)
+
+    return chunk
+
+# State of a classification worker process, set once by _init_classification_worker
+_worker_salt = HASH_SALT
+_worker_processed: set[str] = set()
+_worker_transaction_info_key = TRANSACTION_INFO_NATURAL_KEY
+
+def _init_classification_worker(salt: str, processed: set[str], cache_path: Optional[str], transaction_info_key: list[str]) -> None:
+    global _worker_salt, _worker_processed, _worker_transaction_info_key
+    _worker_salt = salt
+    _worker_processed = processed
+    _worker_transaction_info_key = transaction_info_key
+
+    # Compile the rule tables up front, not while the first chunk waits
+    default_matcher()
+    default_registry()
+    default_category_rules()
+
+    # Every worker has its own connection, SQLite connections cannot be shared between processes
+    if cache_path is not None:
+        open_classification_cache(cache_path)
+
+def open_classification_cache(cache_path: str) -> ClassificationCache:
+    """Open the classification cache for this process, versioned by the current rule tables."""
+    return open_default_cache(cache_path, rules_version(default_matcher(), default_registry()))
+
+def _prepare_chunk_in_worker(chunk: pd.DataFrame) -> pd.DataFrame:
+    return prepare_chunk(chunk, _worker_processed, _worker_salt, _worker_transaction_info_key)
+
+def stream_new_transactions(
+    paths: list[str],
+    processed: set[str],
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    workers: int = 1,
+    read_threads: int = DEFAULT_READ_THREADS,
+    cache_path: Optional[str] = None,
+    compact_flags: bool = False
+) -> Iterator[pd.DataFrame]:
+    """
+    Generator pipeline over one or more exports: read a chunk, fingerprint it, drop rows
+    loaded by earlier runs and classify the rest. The exports are read concurrently by
+    read_bank_exports and processed one after the other, in the order of `paths`.
+
+    With more than one worker the chunks are classified in a process pool. The salt and the
+    processed fingerprints are sent to every worker once at startup, each worker compiles the
+    rule tables once, and only chunks travel between the processes. Chunks come back in file
+    order and at most two per worker are in flight, so memory stays bounded.
 
-    merged_companies = main_df.merge(dim_companies, on='company_name', how='left')
-    merged_transaction_info = merged_companies.merge(dim_transaction_info, on = ['counterparty', 'name_or_description', 'type_of_transaction','is_person_to_person_transaction', 'is_salary', 'is_fastfood', 'is_groceries', 'is_tikkie', 'is_savings', 'is_investment', 'is_income', 'is_expense'], how='left')
-    final_df = merged_transaction_info[['company_sk', 'transaction_info_sk', 'received_date_sk', 'counterparty', 'amount_in_euro']]
+    Parameters:
+        paths (list[str]): ING CSV exports
+        processed (set[str]): Fingerprints of rows loaded by earlier runs
+        chunksize (int): Maximum number of rows per chunk
+        workers (int): Number of classification processes, 1 classifies in this process
+        read_threads (int): Number of exports read at the same time
+        cache_path (Optional[str]): Classification cache database, None classifies without cache
+        compact_flags (bool): Hash the natural key of DIM Transaction info for the compact schema
+
+    Yields:
+        pd.DataFrame: Classified chunks of new transactions, in file order
+    """
+    reader = read_bank_exports(paths, chunksize, read_threads)
+    chunks = profiled_iter('read export', reader)
+    transaction_info_key = transaction_info_natural_key(compact_flags)
+
+    try:
+        if workers <= 1:
+            if cache_path is not None:
+                open_classification_cache(cache_path)
+
+            try:
+                classified = (prepare_chunk(chunk, processed, HASH_SALT, transaction_info_key) for chunk in chunks)
+                yield from (chunk for chunk in classified if not chunk.empty)
+            finally:
+                close_default_cache()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_classification_worker, initargs=(HASH_SALT, processed, cache_path, transaction_info_key)) as executor:
+                classified = profiled_iter('classify in workers', ordered_map(executor, _prepare_chunk_in_worker, chunks, max_pending=2 * workers))
+                yield from (chunk for chunk in classified if not chunk.empty)
+    finally:
+        # Stops the reader threads when classification fails, they would block the exit otherwise
+        reader.close()
+
+    # Evict once all writers are done
+    if cache_path is not None:
+        with stage('evict classification cache'):
+            cache = ClassificationCache(cache_path, rules_version(default_matcher(), default_registry()))
+            cache.evict()
+            cache.close()
+
+def snapshot_store(state_dir: str) -> SnapshotStore:
+    return SnapshotStore(os.path.join(state_dir, SNAPSHOT_DIR))
+
+def checkpointed_transactions(state_dir: str, compact_flags: bool = False) -> Iterator[pd.DataFrame]:
+    """
+    Classified chunks of every transaction loaded so far, read from the transaction checkpoint
+    instead of the exports. The natural keys are hashed again, so the chunks can be rebuilt
+    into either schema.
+    """
+    transaction_info_key = transaction_info_natural_key(compact_flags)
 
-    return final_df
+    for chunk in profiled_iter('read checkpoint', snapshot_store(state_dir).read(TRANSACTIONS_SNAPSHOT)):
+        with stage('natural key hashes', len(chunk)):
+            chunk[COMPANY_KEY_HASH] = natural_key_hashes(chunk, COMPANY_NATURAL_KEY)
+            chunk[TRANSACTION_INFO_KEY_HASH] = natural_key_hashes(chunk, transaction_info_key)
+        yield chunk
 
-def main():
+def check_checkpoint(state_dir: str) -> None:
+    """
+    Make sure the transaction checkpoint holds every loaded row before a load resumes from it,
+    a rebuild from an incomplete checkpoint would silently drop the rows it misses.
+
+    Raises:
+        ValueError: When there is no complete checkpoint, or its rows do not match the loaded rows
+    """
+    snapshots = snapshot_store(state_dir)
+    if not snapshots.exists(TRANSACTIONS_SNAPSHOT):
+        raise ValueError(f"There is no checkpoint in {state_dir} to resume from, run a load with checkpoints first")
+    if not snapshots.is_complete(TRANSACTIONS_SNAPSHOT):
+        raise ValueError(f"The checkpoint in {state_dir} does not hold every loaded row, run a full load with checkpoints first")
+
+    checkpointed = snapshots.rows(TRANSACTIONS_SNAPSHOT)
+    loaded = len(load_processed_fingerprints(state_dir))
+    if checkpointed != loaded:
+        raise ValueError(f"The checkpoint in {state_dir} holds {checkpointed} rows but {loaded} rows were loaded, run a full load with checkpoints first")
+
+def main(
+    sources: Optional[list[str]] = None,
+    export_path: str = DATA_DIR,
+    incremental: bool = False,
+    state_dir: Optional[str] = None,
+    chunksize: int = DEFAULT_CHUNKSIZE,
+    export_format: str = EXPORT_FORMAT,
+    workers: int = 1,
+    read_threads: int = DEFAULT_READ_THREADS,
+    use_cache: bool = CLASSIFICATION_CACHE,
+    compact_flags: bool = COMPACT_FLAGS,
+    checkpoints: bool = CHECKPOINTS,
+    resume: bool = False,
+    aggregates: bool = AGGREGATES,
+    update_model: bool = UPDATE_MODEL,
+    model_data_dir: str = MODEL_DATA_DIR
+):
+    """
+    Build the star schema from every bank export found in `sources`, all accounts in one
+    fact table. Transactions that occur in several exports, e.g. overlapping date ranges of the
+    same account, are loaded once.
+
+    Parameters:
+        sources (Optional[list[str]]): Export files, directories or glob patterns, defaults to export_path
+        export_path (str): Directory the star schema is written to
+        incremental (bool): Only process transactions that earlier runs have not loaded yet
+        state_dir (Optional[str]): Incremental load state, defaults to <export_path>/state
+        chunksize (int): Number of export rows read and classified at a time
+        export_format (str): One of the WRITERS formats
+        workers (int): Number of classification processes
+        read_threads (int): Number of exports read at the same time
+        use_cache (bool): Reuse company names classified by earlier runs, see classification_cache
+        compact_flags (bool): Export the transaction flags as the DIM Transaction flags junk
+            dimension, keyed by a bitmask, instead of as 'Yes'/'No' attributes of DIM Transaction info
+        checkpoints (bool): Checkpoint the classified transactions in <state_dir>/snapshots
+        resume (bool): Rebuild and export the star schema from the checkpoint of earlier runs,
+            without reading or classifying the exports, e.g. after a failed export
+        aggregates (bool): Also export the AGG Monthly transactions and AGG Daily balance tables,
+            summed while the fact table is exported
+        update_model (bool): Rewrite the tables, relationships and partitions of the Finances
+            semantic model to match the export
+        model_data_dir (str): Directory the semantic model reads the star schema from, see MODEL_DATA_DIR
+    """
     # TODO: convert to function so that it's anonamized when imported this is for the CSV files. Include metadata columns
-    # TODO: make file path dynamic from git repository location
-
-    export_path = "C:/git/PowerBI-Dashboard-Portfolio/data/"
-    
-    raw_data = pd.read_csv("C:/git/PowerBI-Dashboard-Portfolio/data/NL52INGB0003610006_02-10-2015_01-10-2025.csv", sep=";", decimal=",")
-
-    raw_data.rename(columns={
-        'Date': 'received_date_sk',
-        'Counterparty': 'counterparty',
-        'Name / Description': 'name_or_description',
-        'Account': 'account_number',
-        'Code': 'code',
-        'Debit/credit': 'debit_or_credit',
-        'Amount (EUR)': 'amount_in_euro',
-        'Resulting balance': 'balance_after_transaction_euro',
-        'Notifications': 'notifications',
-        'Transaction type': 'transaction_type',
-        'Tag': 'tag'
-    }, inplace=True)
-    
-    raw_data['hash_value'] = raw_data.apply(row_hashing, axis=1)
-    raw_data['hash_banking_identification'] = raw_data['counterparty'].apply(hash_individual_column, salt=HASH_SALT)
-    raw_data['is_person_to_person_transaction'] = raw_data.apply(is_person_to_person)
-    raw_data['type_of_transaction'] = raw_data['debit_or_credit'].apply(credit_debit_rename)
-    raw_data['company_name'] = raw_data.apply(lambda row: company_name (
-        row,
-        (company_name_by_hash, 'hash_banking_identification'),
-        (company_name_from_text, 'name_or_description')
-    ), axis=1)
-    raw_data['is_salary'] = raw_data.apply(is_salary, axis=1)
-    raw_data['is_fastfood'] = raw_data.apply(is_fastfood, axis=1)
-    raw_data['is_groceries'] = raw_data.apply(is_groceries, axis=1)
-    raw_data['is_tikkie'] = raw_data.apply(is_tikkie, axis=1)
-    raw_data['is_restaurant'] = raw_data.apply(is_restaurant, axis=1)
-    raw_data['is_savings'] = raw_data.apply(is_savings, axis=1)
-    raw_data['is_investment'] = raw_data.apply(is_investment, axis=1)
-    raw_data['is_income'] = raw_data.apply(is_income, axis=1)
-    raw_data['is_expense'] = raw_data.apply(is_expense, axis=1)
-    raw_data['mandate_id'] = raw_data['notifications'].str.extract(r"Mandate ID:\s*([A-Z0-9]+)(?:\s|$)")
-
-    print(tabulate(raw_data.head(20), headers='keys', tablefmt='psql'))
-    print(raw_data.dtypes)
-    
-    # raw_data.to_excel("C:/git/PowerBI-Dashboard-Portfolio/data/Finances_Anonymized.xlsx", index=False)
-    dim_companies = create_dim_companies(raw_data)
-    dim_transaction_info = create_dim_transaction_info(raw_data)
-    fact_bank_transactions = create_fact_bank_transactions(raw_data, dim_companies, dim_transaction_info)
-
-    dim_companies.to_excel("C:/git/PowerBI-Dashboard-Portfolio/data/DIM_Company.xlsx", index=False)
-    dim_transaction_info.to_excel("C:/git/PowerBI-Dashboard-Portfolio/data/DIM_Transaction_info.xlsx", index=False)
-    fact_bank_transactions.to_excel("C:/git/PowerBI-Dashboard-Portfolio/data/Fact_bank_transactions.xlsx", index=False)
+    state_dir = state_dir or os.path.join(export_path, 'state')
+
+    snapshots = snapshot_store(state_dir)
+
+    # Fingerprints of other versions never match the rows they stand for, so neither the known
+    # rows nor the dimension keys of such a state can be extended
+    state_version = load_fingerprint_version(state_dir)
+    if (incremental or resume) and state_version not in (None, FINGERPRINT_VERSION):
+        raise ValueError(f"The load state in {state_dir} holds version {state_version} row fingerprints, run a full load to rebuild it with version {FINGERPRINT_VERSION}")
+
+    # A full load starts from an empty state, an incremental load only classifies unseen rows
+    # and a resumed load rebuilds every table from the checkpoint
+    if resume:
+        check_checkpoint(state_dir)
+        reset_state(state_dir, keep_fingerprints=True)
+    elif not incremental:
+        reset_state(state_dir)
+        snapshots.remove(TRANSACTIONS_SNAPSHOT)
+        # Only a full load starts a checkpoint, so it holds every row that is loaded
+        if checkpoints:
+            snapshots.mark_complete(TRANSACTIONS_SNAPSHOT)
+    save_fingerprint_version(state_dir, FINGERPRINT_VERSION)
+
+    # A load without checkpoints leaves the checkpoint incomplete, so it is dropped
+    if not resume and not checkpoints:
+        snapshots.remove(TRANSACTIONS_SNAPSHOT)
+
+    # An incremental load only extends a complete checkpoint, a new one would miss the rows of earlier loads
+    checkpoint = checkpoints and not resume and snapshots.is_complete(TRANSACTIONS_SNAPSHOT)
+    if checkpoints and not resume and not checkpoint:
+        print(f"The load state in {state_dir} has no complete checkpoint, run a full load with checkpoints to be able to --resume")
+
+    # The two schemas key DIM Transaction info differently, their state cannot be mixed
+    stored_columns = stored_fact_columns(state_dir)
+    if stored_columns is not None and (TRANSACTION_FLAGS.key_name in stored_columns) != compact_flags:
+        stored_schema = 'default' if compact_flags else 'compact'
+        raise ValueError(f"The load state in {state_dir} was built with the {stored_schema} flags schema, run a full load to switch schemas")
+    if stored_columns is not None and 'transaction_sk' not in stored_columns:
+        raise ValueError(f"The fact rows in {state_dir} have no transaction_sk yet, run a full load to add it")
+
+    with stage('load state'):
+        # A resumed load starts without known rows, it only drops rows checkpointed twice
+        processed = set() if resume else load_processed_fingerprints(state_dir)
+        dim_companies = create_dim_companies(state_dir)
+        dim_transaction_info = create_dim_transaction_info(state_dir, compact_flags)
+    transaction_flags = TRANSACTION_FLAGS if compact_flags else None
+    new_transactions = 0
+
+    if resume:
+        print(f"Resuming from the checkpoint in {state_dir}")
+        transactions = checkpointed_transactions(state_dir, compact_flags)
+    else:
+        paths = find_bank_exports(sources or [export_path])
+        print(f"Loading {len(paths)} bank export(s): {', '.join(os.path.basename(path) for path in paths)}")
+        # The cache is kept on full loads, it only depends on the rule tables
+        cache_path = os.path.join(state_dir, CLASSIFICATION_CACHE_FILE) if use_cache else None
+        transactions = stream_new_transactions(paths, processed, chunksize, workers, read_threads, cache_path, compact_flags)
+
+    for chunk in transactions:
+        # Worker processes only know the fingerprints of earlier runs, rows already loaded
+        # from an overlapping export in this run are dropped here
+        with stage('drop overlapping rows', len(chunk)):
+            chunk = filter_new_rows(chunk, processed)
+            processed.update(chunk['hash_value'])
+
+        if chunk.empty:
+            continue
+
+        if new_transactions == 0:
+            print(tabulate(chunk.head(20), headers='keys', tablefmt='psql'))
+            print(chunk.dtypes)
+
+        fact_rows = create_fact_bank_transactions(chunk, dim_companies, dim_transaction_info, transaction_flags)
+
+        # Checkpointed before the fingerprints are saved, so every loaded row is in the checkpoint
+        if checkpoint:
+            with stage('checkpoint', len(chunk)):
+                snapshots.append(TRANSACTIONS_SNAPSHOT, chunk.drop(columns=[COMPANY_KEY_HASH, TRANSACTION_INFO_KEY_HASH]))
+
+        # Every chunk is written out before the next one is read, dimensions first so the
+        # stored fact rows never reference keys the stored dimensions do not have
+        with stage('save state', len(chunk)):
+            dim_companies.save()
+            dim_transaction_info.save()
+            append_fact_rows(state_dir, fact_rows)
+            append_notification_rows(state_dir, notification_rows(chunk))
+            append_payment_series_rows(state_dir, payment_series_rows(chunk, fact_rows))
+            append_balance_rows(state_dir, balance_rows(chunk))
+            if not resume:
+                save_processed_fingerprints(state_dir, chunk['hash_value'])
+
+        new_transactions += len(chunk)
+
+    if new_transactions == 0:
+        print("No new transactions since the last load")
+        return
+
+    options = export_options(export_format)
+
+    recurrence = payment_recurrence(read_payment_series(state_dir))
+
+    dimensions = {
+        'DIM Company': dim_companies.dimension(),
+        'DIM Transaction info': add_payment_recurrence(dim_transaction_info.dimension(), recurrence)
+    }
+    if transaction_flags is not None:
+        dimensions[TRANSACTION_FLAGS_TABLE] = transaction_flags.dimension()
+
+    with stage('export dimensions'):
+        for table_name, dimension in dimensions.items():
+            write_table(dimension, os.path.join(export_path, EXPORT_FILES[table_name]), export_format, **options)
+
+    # The monthly summary is summed from the fact chunks while they are exported, not in a pass of its own
+    monthly = GroupedSums(MONTHLY_KEY_COLUMNS, ['amount_in_euro'], 'transaction_count') if aggregates else None
+    lookups = monthly_attribute_lookups(dimensions) if aggregates else []
+
+    # The schema of the stored fact table, which is also the schema every exported chunk has
+    fact_dtypes = stored_fact_dtypes(state_dir)
+
+    with stage('export fact') as export_fact:
+        with open_table_writer(os.path.join(export_path, EXPORT_FILES['FACT Bank transaction']), export_format, **options) as writer:
+            for fact_chunk in read_fact_chunks(state_dir, chunksize):
+                writer.write(fact_chunk)
+                if monthly is not None:
+                    monthly.add(monthly_transaction_rows(fact_chunk, lookups))
+        export_fact.rows = writer.rows_written
+
+    aggregate_tables = {}
+    if aggregates:
+        with stage('export aggregates'):
+            aggregate_tables[MONTHLY_TRANSACTIONS_TABLE] = monthly.result()
+            aggregate_tables[DAILY_BALANCE_TABLE] = daily_balance(read_balance_history(state_dir))
+            for table_name, table in aggregate_tables.items():
+                write_table(table, os.path.join(export_path, EXPORT_FILES[table_name]), export_format, **options)
+
+    # Nothing is exported when no transaction has notification fields, the table then leaves the model
+    notification_dtypes = None
+    with stage('export notifications') as export_notifications:
+        with open_table_writer(os.path.join(export_path, EXPORT_FILES[NOTIFICATIONS_TABLE]), export_format, **options) as writer:
+            for notification_chunk in read_notification_chunks(state_dir, chunksize, list(NOTIFICATION_CONVERTERS)):
+                notification_chunk = notification_export_rows(notification_chunk)
+                if notification_dtypes is None:
+                    notification_dtypes = notification_chunk.dtypes
+                writer.write(notification_chunk)
+        export_notifications.rows = writer.rows_written
+
+    # The model is committed, so it only changes on request and never points at a local export path
+    if not update_model:
+        print("The semantic model is left unchanged, run with --update-model to match it to this export")
+        return
+    if export_format == 'arrow':
+        print("Power Query cannot read Arrow IPC files, the semantic model is left unchanged")
+        return
+
+    exported = {table_name: dimension.dtypes for table_name, dimension in dimensions.items()}
+    exported['FACT Bank transaction'] = fact_dtypes
+    if notification_dtypes is not None:
+        exported[NOTIFICATIONS_TABLE] = notification_dtypes
+    exported.update({table_name: table.dtypes for table_name, table in aggregate_tables.items()})
+
+    with stage('update semantic model'):
+        update_model_schema(model_data_dir, export_format, exported)
+        update_model_partitions(model_data_dir, export_format, list(exported))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Build the Finances star schema from ING bank exports.")
+    parser.add_argument("sources", nargs="*", help="Export files, directories or glob patterns (defaults to the ING exports in the export path)")
+    parser.add_argument("--export-path", default=DATA_DIR, help="Directory the star schema is written to (defaults to DATA_DIR in config.py or <repository>/data)")
+    parser.add_argument("--incremental", action="store_true", help="Only process transactions that earlier runs have not loaded yet")
+    parser.add_argument("--state-dir", help="Directory of the incremental load state (defaults to <export path>/state)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Number of export rows read and classified at a time")
+    parser.add_argument("--format", choices=list(WRITERS), default=EXPORT_FORMAT, help="Export format of the star schema (defaults to EXPORT_FORMAT in config.py)")
+    parser.add_argument("--read-threads", type=int, default=DEFAULT_READ_THREADS, help="Number of exports read at the same time")
+    parser.add_argument("--compact-flags", action=argparse.BooleanOptionalAction, default=COMPACT_FLAGS, help="Export the transaction flags as a junk dimension keyed by a bitmask (defaults to COMPACT_FLAGS in config.py)")
+    parser.add_argument("--resume", action="store_true", help="Rebuild and export the star schema from the checkpoint of earlier runs, without reading the exports")
+    parser.add_argument("--checkpoints", action=argparse.BooleanOptionalAction, default=CHECKPOINTS, help="Checkpoint the classified transactions, so a later run can --resume (defaults to CHECKPOINTS in config.py)")
+    parser.add_argument("--aggregates", action=argparse.BooleanOptionalAction, default=AGGREGATES, help="Also export the monthly transaction summary and the daily balance tables (defaults to AGGREGATES in config.py)")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=CLASSIFICATION_CACHE, help="Reuse company names classified by earlier runs from the classification cache (defaults to CLASSIFICATION_CACHE in config.py, off)")
+    parser.add_argument("--update-model", action=argparse.BooleanOptionalAction, default=UPDATE_MODEL, help="Rewrite the Finances semantic model to match the export (defaults to UPDATE_MODEL in config.py, off)")
+    parser.add_argument("--model-data-dir", default=MODEL_DATA_DIR, help="Directory the semantic model reads the star schema from, as Power BI Desktop sees it (defaults to MODEL_DATA_DIR in config.py)")
+    parser.add_argument("--workers", type=int, default=1, help="Classify chunks in this many processes, 0 uses every core (defaults to 1)")
+    parser.add_argument("--profile", metavar="REPORT", help="Time every pipeline stage, write a JSON report to REPORT and print a summary")
+    parser.add_argument("--trace-memory", action="store_true", help="Also measure the peak heap of every stage with tracemalloc (slower)")
+    args = parser.parse_args()
+
+    with profiling(args.trace_memory) if args.profile else nullcontext() as profiler:
+        main(sources=args.sources, export_path=args.export_path, read_threads=args.read_threads, use_cache=args.cache, compact_flags=args.compact_flags, checkpoints=args.checkpoints, resume=args.resume, aggregates=args.aggregates, update_model=args.update_model, model_data_dir=args.model_data_dir, incremental=args.incremental, state_dir=args.state_dir, chunksize=args.chunksize, export_format=args.format, workers=args.workers or os.cpu_count())
+
+    if profiler is not None:
+        profiler.save_report(args.profile)
+        print(profiler.summary())
@@ -0,0 +1,79 @@
+import os
+import json
+import pandas as pd
+from functools import lru_cache
+from types import MappingProxyType
+
+# Known counterparty hashes. The hashes are salted with HASH_SALT, so the file only matches
+# exports hashed with the same salt. Bump "version" whenever entries change meaning.
+HASH_REGISTRY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hash_registry.json')
+HASH_REGISTRY_VERSION = 1
+
+class HashRegistry:
+    """
+    Read-only lookups from a hashed counterparty ('hash_banking_identification') to what is
+    known about it. The lookup tables are built once, so resolving a column is a single
+    hash table probe per row regardless of the registry size.
+
+    Parameters:
+        version (int): Version of the registry data
+        companies (list[tuple[str, list[str]]]): Ordered (company name, hashes) entries. A hash
+            listed under several companies belongs to the first one.
+        person_to_person (list[str]): Hashes of private persons
+    """
+
+    def __init__(self, version: int, companies: list[tuple[str, list[str]]], person_to_person: list[str]):
+        self.version = version
+
+        company_by_hash: dict[str, str] = {}
+        for name, hashes in companies:
+            for hash_value in hashes:
+                company_by_hash.setdefault(hash_value, name)
+
+        self.company_by_hash = MappingProxyType(company_by_hash)
+        self.person_to_person = frozenset(person_to_person)
+
+        # Series.map against a Series reuses the index hash table on every call
+        self._company_lookup = pd.Series(company_by_hash, dtype=object)
+        self._person_to_person_lookup = pd.Series(True, index=sorted(self.person_to_person), dtype=bool)
+
+    def company_names(self, hashes: pd.Series) -> pd.Series:
+        """
+        Company of every counterparty hash.
+
+        Parameters:
+            hashes (pd.Series): Counterparty hashes
+
+        Returns:
+            pd.Series: Company names aligned with the input, None for unknown hashes
+        """
+        names = hashes.map(self._company_lookup).astype(object)
+        return names.where(names.notna(), None)
+
+    def is_person_to_person(self, hashes: pd.Series) -> pd.Series:
+        """Boolean mask of the counterparty hashes that belong to private persons."""
+        return hashes.map(self._person_to_person_lookup).notna()
+
+def load_hash_registry(path: str = HASH_REGISTRY_FILE) -> HashRegistry:
+    """
+    Load a hash registry data file.
+
+    Parameters:
+        path (str): JSON file with 'version', 'companies' and 'person_to_person'
+
+    Returns:
+        HashRegistry: The registry
+    """
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+
+    if data.get('version') != HASH_REGISTRY_VERSION:
+        raise ValueError(f"{path} has registry version {data.get('version')}, expected {HASH_REGISTRY_VERSION}")
+
+    companies = [(entry['company_name'], entry['hashes']) for entry in data['companies']]
+    return HashRegistry(data['version'], companies, data['person_to_person'])
+
+@lru_cache(maxsize=None)
+def default_registry() -> HashRegistry:
+    """The registry in HASH_REGISTRY_FILE, loaded once per process."""
+    return load_hash_registry()
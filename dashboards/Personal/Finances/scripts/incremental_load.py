@@ -0,0 +1,257 @@
+import os
+import pandas as pd
+from typing import Iterator, Optional
+
+from src.snapshot_store import SnapshotStore
+
+try:
+    import pyarrow
+except ImportError:
+    # Without pyarrow the state tables are appended to CSV files, which costs several times more per chunk
+    pyarrow = None
+
+FINGERPRINTS_FILE = 'processed_fingerprints.txt'
+FINGERPRINT_VERSION_FILE = 'fingerprint_version.txt'
+DIM_COMPANY_FILE = 'DIM_Company.jsonl'
+DIM_TRANSACTION_INFO_FILE = 'DIM_Transaction_info.jsonl'
+FACT_BANK_TRANSACTIONS_FILE = 'Fact_bank_transactions.csv'
+NOTIFICATIONS_FILE = 'Transaction_notifications.csv'
+PAYMENT_SERIES_FILE = 'Payment_series.csv'
+BALANCE_HISTORY_FILE = 'Balance_history.csv'
+
+# The tables every loaded chunk is appended to are stored as Arrow IPC parts in <state_dir>/tables,
+# see src.snapshot_store. States built before, or without pyarrow, keep the CSV files above
+STATE_TABLES_DIR = 'tables'
+STATE_TABLE_FILES = {
+    'Fact_bank_transactions': FACT_BANK_TRANSACTIONS_FILE,
+    'Transaction_notifications': NOTIFICATIONS_FILE,
+    'Payment_series': PAYMENT_SERIES_FILE,
+    'Balance_history': BALANCE_HISTORY_FILE
+}
+
+def load_processed_fingerprints(state_dir: str) -> set[str]:
+    """
+    Read the row fingerprints ('hash_value') of every transaction loaded by earlier runs.
+
+    Parameters:
+        state_dir (str): Directory holding the incremental load state
+
+    Returns:
+        set[str]: Fingerprints already processed, empty on the first run
+    """
+    path = os.path.join(state_dir, FINGERPRINTS_FILE)
+    if not os.path.exists(path):
+        return set()
+
+    with open(path, encoding='utf-8') as file:
+        return {line.strip() for line in file if line.strip()}
+
+def save_processed_fingerprints(state_dir: str, fingerprints: pd.Series) -> None:
+    """Append newly processed fingerprints to the state store, one per line."""
+    os.makedirs(state_dir, exist_ok=True)
+    path = os.path.join(state_dir, FINGERPRINTS_FILE)
+
+    # Joined in one call instead of formatting a line per fingerprint in Python
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write((fingerprints.astype('str') + '\n').str.cat())
+
+def load_fingerprint_version(state_dir: str) -> Optional[int]:
+    """
+    The row fingerprint version the load state was built with, see src.row_hashing.
+
+    Parameters:
+        state_dir (str): Directory holding the incremental load state
+
+    Returns:
+        Optional[int]: The version, None for an empty state. States from before the version
+            was recorded are version 1
+    """
+    path = os.path.join(state_dir, FINGERPRINT_VERSION_FILE)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            return int(file.read().strip())
+
+    loaded = [FINGERPRINTS_FILE, FACT_BANK_TRANSACTIONS_FILE, DIM_COMPANY_FILE, DIM_TRANSACTION_INFO_FILE]
+    return 1 if any(os.path.exists(os.path.join(state_dir, file_name)) for file_name in loaded) else None
+
+def save_fingerprint_version(state_dir: str, version: int) -> None:
+    """Record the row fingerprint version the load state is built with."""
+    os.makedirs(state_dir, exist_ok=True)
+    with open(os.path.join(state_dir, FINGERPRINT_VERSION_FILE), 'w', encoding='utf-8') as file:
+        file.write(f'{version}\n')
+
+def filter_new_rows(df: pd.DataFrame, processed: set[str], hash_column: str = 'hash_value') -> pd.DataFrame:
+    """
+    Keep only the rows whose fingerprint has not been processed yet, and the first of rows
+    sharing a fingerprint, e.g. a transaction found in two overlapping exports.
+    """
+    # Set lookups cost O(len(df)), isin would build a hash table of every processed fingerprint on each call
+    seen = df[hash_column].map(processed.__contains__).astype(bool)
+    return df[~seen & ~df[hash_column].duplicated()]
+
+def reset_state(state_dir: str, keep_fingerprints: bool = False) -> None:
+    """
+    Forget everything loaded before, so the next load rebuilds all tables and surrogate keys.
+    With keep_fingerprints the loaded rows stay known and only the tables built from them are
+    removed, for rebuilding them from a checkpoint.
+    """
+    file_names = [DIM_COMPANY_FILE, DIM_TRANSACTION_INFO_FILE] + list(STATE_TABLE_FILES.values())
+    if not keep_fingerprints:
+        file_names += [FINGERPRINTS_FILE, FINGERPRINT_VERSION_FILE]
+
+    for file_name in file_names:
+        path = os.path.join(state_dir, file_name)
+        if os.path.exists(path):
+            os.remove(path)
+
+    for table in STATE_TABLE_FILES:
+        state_tables(state_dir).remove(table)
+
+def state_tables(state_dir: str) -> SnapshotStore:
+    return SnapshotStore(os.path.join(state_dir, STATE_TABLES_DIR))
+
+def _csv_path(state_dir: str, table: str) -> Optional[str]:
+    """
+    The CSV file a state table is stored in, None when it is stored as Arrow parts. Chunks are
+    written as Arrow files without converting any value to text, a table is only kept as CSV
+    when pyarrow is missing or the state already holds it as CSV.
+    """
+    path = os.path.join(state_dir, STATE_TABLE_FILES[table])
+    return path if pyarrow is None or os.path.exists(path) else None
+
+def _append_rows(state_dir: str, table: str, rows: pd.DataFrame) -> None:
+    """Append rows to a state table, writing the header only when a CSV file is new."""
+    path = _csv_path(state_dir, table)
+    if path is None:
+        state_tables(state_dir).append(table, rows)
+        return
+
+    os.makedirs(state_dir, exist_ok=True)
+    rows.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+def _read_chunks(state_dir: str, table: str, chunksize: Optional[int], dtypes: dict, date_columns: Optional[list[str]] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a state table, nothing when no rows were appended to it.
+
+    Parameters:
+        state_dir (str): Incremental load state directory
+        table (str): Name of the state table, see STATE_TABLE_FILES
+        chunksize (Optional[int]): Number of rows per chunk of a CSV table, Arrow tables yield
+            the chunks as they were appended
+        dtypes (dict): Dtypes of the columns, as they are after a round trip through CSV
+        date_columns (Optional[list[str]]): Columns parsed as datetimes
+    """
+    path = _csv_path(state_dir, table)
+    if path is not None:
+        if os.path.exists(path):
+            with pd.read_csv(path, dtype=dtypes, parse_dates=date_columns, chunksize=chunksize) as reader:
+                yield from reader
+        return
+
+    for chunk in state_tables(state_dir).read(table):
+        # A column that only holds missing values in one chunk is stored without its type
+        chunk = chunk.astype({column: dtype for column, dtype in dtypes.items() if column in chunk.columns})
+        for column in date_columns or []:
+            chunk[column] = pd.to_datetime(chunk[column])
+        yield chunk
+
+def _stored_columns(state_dir: str, table: str) -> Optional[list[str]]:
+    """Columns of a state table, None when no rows were appended to it."""
+    path = _csv_path(state_dir, table)
+    if path is not None:
+        return list(pd.read_csv(path, nrows=0).columns) if os.path.exists(path) else None
+
+    tables = state_tables(state_dir)
+    return list(tables.empty(table).columns) if tables.exists(table) else None
+
+def _read_table(state_dir: str, table: str, dtypes: dict) -> pd.DataFrame:
+    """A whole state table, empty with the given dtypes when no rows were appended to it."""
+    path = _csv_path(state_dir, table)
+    if path is not None and os.path.exists(path):
+        return pd.read_csv(path, dtype=dtypes)
+
+    chunks = list(_read_chunks(state_dir, table, None, dtypes))
+    if not chunks:
+        return pd.DataFrame(columns=list(dtypes)).astype(dtypes)
+
+    return pd.concat(chunks, ignore_index=True)
+
+def append_fact_rows(state_dir: str, fact_rows: pd.DataFrame) -> None:
+    """Append fact rows to the stored fact table."""
+    _append_rows(state_dir, 'Fact_bank_transactions', fact_rows)
+
+# Fixed dtypes, so every chunk of the stored fact table has the same schema
+FACT_DTYPES = {
+    'transaction_sk': 'int64',
+    'company_sk': 'int64',
+    'transaction_info_sk': 'int64',
+    'transaction_flags_sk': 'int32',
+    'received_date_sk': 'int32',
+    'counterparty': str,
+    'amount_in_euro': 'float64',
+    'source_account': str,
+    'source_file': str
+}
+
+PAYMENT_SERIES_DTYPES = {
+    'series_key': str,
+    'transaction_info_sk': 'int64',
+    'received_date_sk': 'int32',
+    'amount_in_euro': 'float64'
+}
+
+BALANCE_HISTORY_DTYPES = {
+    'source_account': str,
+    'received_date_sk': 'int32',
+    'balance_after_transaction_euro': 'float64',
+    'balance_change_euro': 'float64'
+}
+
+def stored_fact_columns(state_dir: str) -> Optional[list[str]]:
+    """Columns of the stored fact table, None when no fact rows were stored yet."""
+    return _stored_columns(state_dir, 'Fact_bank_transactions')
+
+def stored_fact_dtypes(state_dir: str) -> pd.Series:
+    """The dtypes of the chunks read_fact_chunks yields, read from the schema of the stored fact table."""
+    columns = stored_fact_columns(state_dir)
+    return pd.DataFrame(columns=columns).astype({column: FACT_DTYPES.get(column, object) for column in columns}).dtypes
+
+def read_fact_chunks(state_dir: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    """Stream the stored fact table, so exporting it never needs the whole table in memory."""
+    yield from _read_chunks(state_dir, 'Fact_bank_transactions', chunksize, FACT_DTYPES)
+
+def append_notification_rows(state_dir: str, rows: pd.DataFrame) -> None:
+    """Append rows of the notification side table."""
+    _append_rows(state_dir, 'Transaction_notifications', rows)
+
+def read_notification_chunks(state_dir: str, chunksize: int, date_columns: list[str]) -> Iterator[pd.DataFrame]:
+    """
+    Stream the stored notification side table, nothing when no row had notification fields.
+
+    Parameters:
+        state_dir (str): Incremental load state directory
+        chunksize (int): Number of rows per chunk
+        date_columns (list[str]): Columns parsed as datetimes, every other column is text
+    """
+    columns = _stored_columns(state_dir, 'Transaction_notifications')
+    if columns is None:
+        return
+
+    dtypes = {column: str for column in columns if column not in date_columns}
+    yield from _read_chunks(state_dir, 'Transaction_notifications', chunksize, dtypes, date_columns)
+
+def append_payment_series_rows(state_dir: str, rows: pd.DataFrame) -> None:
+    """Append rows to the payment history used for recurring payment detection."""
+    _append_rows(state_dir, 'Payment_series', rows)
+
+def read_payment_series(state_dir: str) -> pd.DataFrame:
+    """The whole stored payment history, empty when nothing was loaded yet."""
+    return _read_table(state_dir, 'Payment_series', PAYMENT_SERIES_DTYPES)
+
+def append_balance_rows(state_dir: str, rows: pd.DataFrame) -> None:
+    """Append rows to the balance history the daily balance snapshots are built from."""
+    _append_rows(state_dir, 'Balance_history', rows)
+
+def read_balance_history(state_dir: str) -> pd.DataFrame:
+    """The whole stored balance history, empty when nothing was loaded yet."""
+    return _read_table(state_dir, 'Balance_history', BALANCE_HISTORY_DTYPES)
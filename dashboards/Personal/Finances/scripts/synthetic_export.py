@@ -0,0 +1,145 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from typing import Iterator
+
+from company_matcher import COMPANY_TEXT_RULES
+
+# Descriptions that are not companies but do occur in real exports
+OTHER_DESCRIPTIONS = ['NOTPROVIDED', 'Oranje Spaarrekening', 'Bonusrenterekening', 'To Bonusrenterekening', 'From Bonusrenterekening', 'Bella Donna']
+
+CITIES = ['AMSTERDAM', 'AMSTELVEEN', 'UTRECHT', 'ROTTERDAM', 'DEN HAAG', 'HAARLEM', 'LEIDEN', 'EINDHOVEN']
+CODES = ['BA', 'GT', 'IC', 'OV', 'ID', 'DV']
+TRANSACTION_TYPES = ['Payment terminal', 'Online Banking', 'SEPA direct debit', 'Transfer', 'iDEAL']
+
+DEFAULT_MERCHANTS = 2_000
+DEFAULT_COUNTERPARTIES = 5_000
+
+def _zipf_choice(rng: np.random.Generator, size: int, n: int, exponent: float = 1.1) -> np.ndarray:
+    # A few merchants and counterparties make up most transactions, like in a real account
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return rng.choice(n, size=size, p=weights / weights.sum())
+
+def _merchant_names(rng: np.random.Generator, merchants: int) -> np.ndarray:
+    known = [pattern.upper() for pattern, _ in COMPANY_TEXT_RULES] + OTHER_DESCRIPTIONS
+    generated = [f'MERCHANT {number:05d} B.V.' for number in range(max(merchants - len(known), 0))]
+    names = np.array(known + generated, dtype=object)[:merchants]
+
+    # Shuffle, so the most frequent merchants are a mix of known and unknown ones
+    return names[rng.permutation(len(names))]
+
+def _counterparties(rng: np.random.Generator, counterparties: int) -> np.ndarray:
+    numbers = rng.choice(10**10, size=counterparties, replace=False)
+    return np.array([f'NL{number % 90 + 10:02d}INGB{number:010d}' for number in numbers], dtype=object)
+
+def generate_transactions(
+    rows: int,
+    seed: int = 0,
+    merchants: int = DEFAULT_MERCHANTS,
+    counterparties: int = DEFAULT_COUNTERPARTIES,
+    chunksize: int = 500_000
+) -> Iterator[pd.DataFrame]:
+    """
+    Generate ING export rows with realistic value distributions, in chunks.
+
+    Merchants and counterparties are drawn from Zipf-like distributions over fixed pools, and
+    a share of descriptions gets a city or terminal suffix, so the distinct description count
+    grows with the row count like it does in real exports. About a third of the rows are card
+    payments without a counterparty account. The output is the same for the same arguments.
+
+    Parameters:
+        rows (int): Total number of rows
+        seed (int): Random seed
+        merchants (int): Size of the merchant pool, the known rule companies included
+        counterparties (int): Number of distinct counterparty accounts
+        chunksize (int): Maximum number of rows per chunk
+
+    Yields:
+        pd.DataFrame: Chunks with the original ING column names and raw values
+    """
+    rng = np.random.default_rng(seed)
+    merchant_names = _merchant_names(rng, merchants)
+    accounts = _counterparties(rng, counterparties)
+
+    first_day = pd.Timestamp('2015-10-02')
+    days = (pd.Timestamp('2025-10-01') - first_day).days
+    balance = 1_000.0
+
+    for start in range(0, rows, chunksize):
+        size = min(chunksize, rows - start)
+
+        # Dates run forward through ten years of history, however many rows are generated
+        offsets = np.sort(rng.integers(start * days // rows, (start + size) * days // rows + 1, size=size))
+        dates = (first_day + pd.to_timedelta(offsets, unit='D')).strftime('%Y%m%d').astype('int32')
+
+        descriptions = pd.Series(merchant_names[_zipf_choice(rng, size, len(merchant_names))])
+        suffixed = rng.random(size) < 0.3
+        suffixes = pd.Series(np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), size)]) + ' ' + pd.Series(rng.integers(1, 10_000, size)).astype(str)
+        descriptions = descriptions.where(~suffixed, descriptions + ' ' + suffixes)
+
+        counterparty = pd.Series(accounts[_zipf_choice(rng, size, len(accounts))])
+        counterparty = counterparty.where(rng.random(size) >= 0.35, None)
+
+        credit = rng.random(size) < 0.2
+        amounts = np.round(rng.lognormal(3.0, 1.2, size), 2)
+        signed = np.where(credit, amounts, -amounts)
+        balances = np.round(balance + np.cumsum(signed), 2)
+        balance = float(balances[-1])
+
+        mandates = pd.Series(rng.integers(1, 500, size)).astype(str)
+        notification_kind = rng.integers(0, 3, size)
+        notifications = np.where(
+            notification_kind == 0,
+            'Name: ' + descriptions + ' Mandate ID: MND' + mandates + ' Creditor ID: NL12ZZZ' + mandates,
+            np.where(notification_kind == 1, 'Card sequence no.: 001 Transaction: ' + mandates, '')
+        )
+
+        yield pd.DataFrame({
+            'Date': dates,
+            'Name / Description': descriptions.to_numpy(),
+            'Account': 'NL52INGB0003610006',
+            'Counterparty': counterparty.to_numpy(),
+            'Code': np.array(CODES)[rng.integers(0, len(CODES), size)],
+            'Debit/credit': np.where(credit, 'Credit', 'Debit'),
+            'Amount (EUR)': amounts,
+            'Transaction type': np.array(TRANSACTION_TYPES)[rng.integers(0, len(TRANSACTION_TYPES), size)],
+            'Notifications': notifications,
+            'Resulting balance': balances,
+            'Tag': None
+        })
+
+def write_synthetic_export(path: str, rows: int, seed: int = 0, **options) -> str:
+    """
+    Write a synthetic ING export: semicolon separated with a decimal comma, like the real one.
+
+    Parameters:
+        path (str): Output CSV path
+        rows (int): Number of transactions
+        seed (int): Random seed
+        **options: Passed on to generate_transactions, e.g. merchants or counterparties
+
+    Returns:
+        str: The path written
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    header = True
+    for chunk in generate_transactions(rows, seed, **options):
+        chunk.to_csv(path, sep=';', decimal=',', index=False, mode='w' if header else 'a', header=header)
+        header = False
+
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic ING export for benchmarks and load tests.")
+    parser.add_argument("path", help="Output CSV path")
+    parser.add_argument("--rows", type=int, default=100_000, help="Number of transactions")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument("--merchants", type=int, default=DEFAULT_MERCHANTS, help="Number of distinct merchants")
+    parser.add_argument("--counterparties", type=int, default=DEFAULT_COUNTERPARTIES, help="Number of distinct counterparty accounts")
+    args = parser.parse_args()
+
+    write_synthetic_export(args.path, args.rows, args.seed, merchants=args.merchants, counterparties=args.counterparties)
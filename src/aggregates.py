@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+def month_sk(date_sk: pd.Series) -> pd.Series:
+    """The YYYYMM01 key of the first day of the month of YYYYMMDD date keys, so it relates to a date dimension."""
+    return (date_sk // 100 * 100 + 1).astype('int32')
+
+class GroupedSums:
+    """
+    Sums and row counts of a streamed table grouped by key columns, e.g. a fact table that is
+    exported in chunks. Every chunk is grouped once when it is added and only its groups are
+    kept, so memory scales with the number of groups instead of the number of rows and no
+    second pass over the rows is needed.
+
+    Parameters:
+        keys (list[str]): Columns to group by, missing values form their own group
+        sums (list[str]): Numeric columns to sum per group
+        count_name (str): Name of the column holding the number of rows per group
+    """
+
+    def __init__(self, keys: list[str], sums: list[str], count_name: str = 'row_count'):
+        self.keys = list(keys)
+        self.sums = list(sums)
+        self.count_name = count_name
+        self._partials = []
+
+    def add(self, df: pd.DataFrame) -> None:
+        """Group the rows of a chunk and keep their sums and counts."""
+        if df.empty:
+            return
+
+        grouped = df.groupby(self.keys, observed=True, sort=False, dropna=False)
+        partial = grouped[self.sums].sum()
+        partial[self.count_name] = grouped.size()
+        self._partials.append(partial)
+
+        # Folding the partial groups now and then keeps their number bounded by the number of groups
+        if len(self._partials) >= 32:
+            self._partials = [self._combine()]
+
+    def _combine(self) -> pd.DataFrame:
+        combined = pd.concat(self._partials)
+        return combined.groupby(level=list(range(len(self.keys))), sort=False, dropna=False).sum()
+
+    def result(self) -> pd.DataFrame:
+        """
+        The sums of every group added so far.
+
+        Returns:
+            pd.DataFrame: One row per group, sorted by the keys, with the key columns, the sums
+                and the count column
+        """
+        if not self._partials:
+            return pd.DataFrame(columns=self.keys + self.sums + [self.count_name])
+
+        result = self._combine().sort_index().reset_index()
+        result[self.count_name] = result[self.count_name].astype('int64')
+        return result
+
+def closing_balances(
+    accounts: pd.Series,
+    dates: pd.Series,
+    balances: pd.Series,
+    changes: pd.Series
+) -> pd.DataFrame:
+    """
+    The balance of every account at the end of every day it has transactions, whatever the
+    order of the transactions within the day. Exports list the transactions of a day newest
+    or oldest first, so the row order cannot tell which balance is the last one.
+
+    Every transaction moves the balance from `balance - change` to `balance`. Within a day the
+    closing balance is the one balance that no later transaction of the day starts from, found
+    by counting the balances every transaction ends and starts at in one grouped count. Days
+    where that is ambiguous, e.g. only zero amounts, take the balance of their last row.
+
+    Parameters:
+        accounts (pd.Series): Account of every transaction
+        dates (pd.Series): YYYYMMDD date key of every transaction, aligned with accounts
+        balances (pd.Series): Balance after every transaction
+        changes (pd.Series): Signed amount of every transaction, negative for debits
+
+    Returns:
+        pd.DataFrame: 'account', 'date_sk' and 'balance', one row per account and day
+    """
+    after = np.round(balances.to_numpy(dtype='float64') * 100).astype('int64')
+    before = after - np.round(changes.to_numpy(dtype='float64') * 100).astype('int64')
+    day = pd.DataFrame({'account': accounts.to_numpy(), 'date_sk': dates.to_numpy()})
+
+    # +1 for every balance a transaction ends at, -1 for every balance one starts from
+    ends = pd.concat([day.assign(cents=after, count=1), day.assign(cents=before, count=-1)], ignore_index=True)
+    surplus = ends.groupby(['account', 'date_sk', 'cents'], sort=False)['count'].sum()
+    closing = surplus[surplus > 0].reset_index().drop_duplicates(['account', 'date_sk'], keep='first')
+
+    last = day.assign(cents=after).drop_duplicates(['account', 'date_sk'], keep='last')
+    closing = pd.concat([closing[['account', 'date_sk', 'cents']], last]).drop_duplicates(['account', 'date_sk'], keep='first')
+
+    closing = closing.sort_values(['account', 'date_sk'], kind='stable', ignore_index=True)
+    return pd.DataFrame({
+        'account': closing['account'],
+        'date_sk': closing['date_sk'].astype('int32'),
+        'balance': closing['cents'] / 100
+    })
+
+def daily_snapshots(closing: pd.DataFrame, last_date_sk: Optional[int] = None) -> pd.DataFrame:
+    """
+    Carry the closing balances forward to every day, so every account has a balance on every
+    day from its first transaction up to `last_date_sk` and balances add up across accounts.
+
+    Parameters:
+        closing (pd.DataFrame): Rows from closing_balances
+        last_date_sk (Optional[int]): Last day of the snapshots, defaults to the latest day in `closing`
+
+    Returns:
+        pd.DataFrame: 'account', 'date_sk', 'balance' and 'is_transaction_day', one row per account and day
+    """
+    if closing.empty:
+        return closing.assign(is_transaction_day=pd.Series(dtype='bool'))
+
+    dates = pd.to_datetime(closing['date_sk'].astype('str'), format='%Y%m%d')
+    last_date = pd.to_datetime(str(last_date_sk or closing['date_sk'].max()), format='%Y%m%d')
+
+    snapshots = []
+    for account, rows in closing.assign(date=dates).groupby('account', sort=True):
+        days = pd.date_range(rows['date'].iloc[0], max(last_date, rows['date'].iloc[-1]), freq='D')
+        balances = rows.set_index('date')['balance']
+        snapshots.append(pd.DataFrame({
+            'account': account,
+            'date_sk': days.strftime('%Y%m%d').astype('int32'),
+            'balance': balances.reindex(days).ffill().to_numpy(),
+            'is_transaction_day': days.isin(balances.index)
+        }))
+
+    return pd.concat(snapshots, ignore_index=True)
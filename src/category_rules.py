@@ -0,0 +1,216 @@
+import tomllib
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+CATEGORY_RULES_VERSION = 1
+
+class _Condition:
+    """One compiled test of a column: equality, membership or a case-insensitive regex search."""
+
+    def __init__(self, column: str, value):
+        self.column = column
+
+        if isinstance(value, dict):
+            if set(value) != {'matches'}:
+                raise ValueError(f"Unknown condition on '{column}': {sorted(value)}, only 'matches' is supported")
+            self.kind, self.value = 'matches', value['matches']
+        elif isinstance(value, list):
+            self.kind, self.value = 'isin', tuple(value)
+        else:
+            self.kind, self.value = 'equals', value
+
+    @property
+    def key(self) -> tuple:
+        return (self.column, self.kind, self.value)
+
+    def evaluate(self, values: pd.Series) -> np.ndarray:
+        if self.kind == 'matches':
+            mask = values.astype('str').str.contains(self.value, case=False, regex=True, na=False)
+        elif self.kind == 'isin':
+            mask = values.isin(self.value)
+        else:
+            mask = values == self.value
+
+        return mask.fillna(False).to_numpy(dtype=bool)
+
+def _compile_alternatives(name: str, when) -> list[list[_Condition]]:
+    # A table is one set of conditions that must all hold, an array of tables are alternatives
+    alternatives = [when] if isinstance(when, dict) else list(when or [])
+    if not alternatives or not all(alternatives):
+        raise ValueError(f"'{name}' has no 'when' conditions, or an empty 'when' table")
+
+    return [[_Condition(column, value) for column, value in conditions.items()] for conditions in alternatives]
+
+class CategoryRules:
+    """
+    Compiled category rules: yes/no flags and a multi-level category, derived from the columns
+    of a transaction by declarative conditions.
+
+    A flag is set when all conditions of at least one of its 'when' tables hold. A condition
+    compares a column with a value, a list of values or a {matches = 'regex'} pattern, and may
+    test a flag declared before it. Category rules are tried in order and the first match
+    gives the category path, rows outside the category scope get `outside_scope`.
+
+    evaluate() factorizes every column the rules test once and runs each condition on the
+    distinct values of its column only, a condition used by several rules is evaluated once.
+    Flags and categories are then combined from boolean arrays, so adding flags or categories
+    adds no pass over the text columns.
+
+    Parameters:
+        flags (dict[str, list[list[_Condition]]]): Flag name to its alternatives, in dependency order
+        levels (list[str]): Names of the category level columns, top level first
+        category_rules (list[tuple[tuple[str, ...], list[list[_Condition]]]]): Ordered (path, alternatives)
+        default (tuple[str, ...]): Path of rows in scope that no category rule matches
+        scope (Optional[list[list[_Condition]]]): Alternatives a row must match to be categorised
+        outside_scope (tuple[str, ...]): Path of rows outside the scope
+        descriptions (Optional[dict[str, str]]): Descriptions of the flag and level columns
+    """
+
+    def __init__(
+        self,
+        flags: dict[str, list[list[_Condition]]],
+        levels: list[str],
+        category_rules: list[tuple[tuple[str, ...], list[list[_Condition]]]],
+        default: tuple[str, ...],
+        scope: Optional[list[list[_Condition]]] = None,
+        outside_scope: tuple[str, ...] = (),
+        descriptions: Optional[dict[str, str]] = None
+    ):
+        self.flags = list(flags)
+        self.levels = list(levels)
+        self.descriptions = dict(descriptions or {})
+        self._flag_rules = flags
+        self._category_rules = category_rules
+        self._scope = scope
+
+        paths = [default] + [path for path, _ in category_rules] + ([outside_scope] if scope else [])
+        for path in paths:
+            if len(path) != len(self.levels):
+                raise ValueError(f"Category path {list(path)} does not have one value per level of {self.levels}")
+
+        # Every path and its position, the first level values of the Categorical outputs
+        self.paths = list(dict.fromkeys(paths))
+        self._default = self.paths.index(default)
+        self._outside_scope = self.paths.index(outside_scope) if scope else None
+        self._path_codes = [self.paths.index(path) for path, _ in category_rules]
+
+        # Columns read from the rows, flags may only test flags declared before them
+        self.columns: list[str] = []
+        declared = set()
+        groups = list(flags.items()) + [(str(list(path)), alternatives) for path, alternatives in category_rules]
+        if scope:
+            groups.append(('scope', scope))
+
+        for name, alternatives in groups:
+            for condition in (condition for conditions in alternatives for condition in conditions):
+                if condition.column in flags and condition.column not in declared:
+                    raise ValueError(f"'{name}' tests the flag '{condition.column}' before it is declared")
+                if condition.column not in flags and condition.column not in self.columns:
+                    self.columns.append(condition.column)
+            if name in flags:
+                declared.add(name)
+
+    def _factorized_columns(self, df: pd.DataFrame) -> dict[str, tuple[np.ndarray, pd.Series]]:
+        missing = [column for column in self.columns if column not in df.columns]
+        if missing:
+            raise KeyError(f"The category rules need the columns {missing}")
+
+        factorized = {}
+        for column in self.columns:
+            codes, uniques = pd.factorize(df[column], use_na_sentinel=False)
+            factorized[column] = (codes, pd.Series(uniques))
+        return factorized
+
+    def evaluate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Evaluate every flag and the category path of every row.
+
+        Parameters:
+            df (pd.DataFrame): Rows holding every column in `columns`
+
+        Returns:
+            pd.DataFrame: Boolean flag columns and categorical level columns, aligned with df
+        """
+        # Every column is factorized once and conditions run on its distinct values only
+        factorized = self._factorized_columns(df)
+        evaluated: dict[tuple, np.ndarray] = {}
+
+        def holds(alternatives: list[list[_Condition]]) -> np.ndarray:
+            # The evaluated masks are shared between rules, so they are combined into new arrays
+            mask = None
+            for conditions in alternatives:
+                matched = None
+                for condition in conditions:
+                    if condition.key not in evaluated:
+                        codes, uniques = factorized[condition.column]
+                        evaluated[condition.key] = condition.evaluate(uniques)[codes]
+                    matched = evaluated[condition.key] if matched is None else matched & evaluated[condition.key]
+                mask = matched if mask is None else mask | matched
+            return mask
+
+        flags = {}
+        for flag, alternatives in self._flag_rules.items():
+            flags[flag] = holds(alternatives)
+            # Later conditions test a flag like any other column, with False and True as its values
+            factorized[flag] = (flags[flag].astype('int8'), pd.Series([False, True]))
+
+        # First matching rule wins, so later rules only fill rows that are still open
+        path_codes = np.full(len(df), self._default, dtype='int64')
+        open_rows = np.ones(len(df), dtype=bool)
+        for code, (_, alternatives) in zip(self._path_codes, self._category_rules):
+            matched = open_rows & holds(alternatives)
+            path_codes[matched] = code
+            open_rows &= ~matched
+        if self._scope:
+            path_codes[~holds(self._scope)] = self._outside_scope
+
+        result = dict(flags)
+        for level, level_name in enumerate(self.levels):
+            categories = list(dict.fromkeys(path[level] for path in self.paths))
+            level_codes = np.array([categories.index(path[level]) for path in self.paths], dtype='int64')
+            result[level_name] = pd.Categorical.from_codes(level_codes[path_codes], categories=categories)
+
+        return pd.DataFrame(result, index=df.index)
+
+def load_category_rules(path: str) -> CategoryRules:
+    """
+    Load and compile a category rule file.
+
+    Parameters:
+        path (str): TOML file with 'version', [flags.<name>] tables and a [categories] table
+
+    Returns:
+        CategoryRules: The compiled rules
+    """
+    with open(path, 'rb') as file:
+        data = tomllib.load(file)
+
+    if data.get('version') != CATEGORY_RULES_VERSION:
+        raise ValueError(f"{path} has rules version {data.get('version')}, expected {CATEGORY_RULES_VERSION}")
+
+    descriptions = {}
+    flags = {}
+    for name, flag in data.get('flags', {}).items():
+        flags[name] = _compile_alternatives(name, flag.get('when'))
+        if 'description' in flag:
+            descriptions[name] = flag['description']
+
+    categories = data.get('categories', {})
+    levels = categories.get('levels', [])
+    descriptions.update(zip(levels, categories.get('level_descriptions', [])))
+    category_rules = [
+        (tuple(rule['path']), _compile_alternatives(str(rule['path']), rule.get('when')))
+        for rule in categories.get('rules', [])
+    ]
+    scope = _compile_alternatives('scope', categories['scope']) if 'scope' in categories else None
+
+    return CategoryRules(
+        flags,
+        levels,
+        category_rules,
+        tuple(categories.get('default', [])),
+        scope,
+        tuple(categories.get('outside_scope', [])),
+        descriptions
+    )
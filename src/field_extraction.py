@@ -0,0 +1,95 @@
+import re
+import pandas as pd
+from typing import Callable, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    # Without pyarrow the patterns run through pandas' str.extract, which is several times slower
+    pa = None
+    pc = None
+
+_LOOKAROUND = re.compile(r'\(\?(?:=|!|<=|<!)')
+
+class FieldExtractor:
+    """
+    Extracts structured fields from a free text column, e.g. bank notifications, with a set
+    of named-group patterns compiled once. Every named group becomes a column of the result.
+
+    With pyarrow installed the column is converted to Arrow once and every pattern runs with
+    RE2 on that buffer. RE2 scans in linear time, but a single pattern holding every field is
+    much slower than one short pattern per field, so each field is a pattern of its own.
+    Patterns must therefore not use lookaround, which RE2 does not support.
+
+    Parameters:
+        patterns (dict[str, str]): Field name to a regular expression with named groups
+        converters (Optional[dict[str, Callable[[pd.Series], pd.Series]]]): Column to a function
+            converting the extracted text to its final type, e.g. a date parser
+    """
+
+    def __init__(self, patterns: dict[str, str], converters: Optional[dict[str, Callable[[pd.Series], pd.Series]]] = None):
+        self.patterns = dict(patterns)
+        self.converters = dict(converters or {})
+        self.columns: list[str] = []
+
+        for field, pattern in self.patterns.items():
+            if _LOOKAROUND.search(pattern):
+                raise ValueError(f"The '{field}' pattern uses lookaround, which RE2 does not support")
+
+            groups = list(re.compile(pattern).groupindex)
+            if not groups:
+                raise ValueError(f"The '{field}' pattern has no named group")
+            self.columns += groups
+
+        duplicated = {column for column in self.columns if self.columns.count(column) > 1}
+        if duplicated:
+            raise ValueError(f"Named groups used in more than one pattern: {sorted(duplicated)}")
+
+    def _extract_arrow(self, texts: pd.Series) -> dict[str, pd.Series]:
+        # pandas strings are Arrow backed already, so this does not copy the text
+        array = pa.array(texts.astype('str'), from_pandas=True)
+        columns = {}
+
+        for pattern in self.patterns.values():
+            matches = pc.extract_regex(array, pattern)
+            for index, group in enumerate(matches.type):
+                # struct_field, unlike .field(), keeps rows without a match missing
+                values = pc.struct_field(matches, [index]).to_numpy(zero_copy_only=False)
+                columns[group.name] = pd.Series(values, index=texts.index, dtype='str')
+
+        return columns
+
+    def _extract_pandas(self, texts: pd.Series) -> dict[str, pd.Series]:
+        columns = {}
+
+        for pattern in self.patterns.values():
+            matches = texts.astype('str').str.extract(pattern, expand=True)
+            for column in matches.columns:
+                columns[column] = matches[column].astype('str')
+
+        return columns
+
+    def extract(self, texts: pd.Series, chunksize: Optional[int] = None) -> pd.DataFrame:
+        """
+        Extract every field from a text column.
+
+        Parameters:
+            texts (pd.Series): The text column, missing values give missing fields
+            chunksize (Optional[int]): Extract this many rows at a time, bounding the memory of
+                the intermediate Arrow buffers for very long columns
+
+        Returns:
+            pd.DataFrame: One column per named group, aligned with texts, missing where the
+                pattern did not match, converted by the converters
+        """
+        if chunksize and len(texts) > chunksize:
+            parts = [self.extract(texts.iloc[start:start + chunksize]) for start in range(0, len(texts), chunksize)]
+            return pd.concat(parts)
+
+        columns = self._extract_arrow(texts) if pa is not None else self._extract_pandas(texts)
+
+        for column, converter in self.converters.items():
+            columns[column] = converter(columns[column])
+
+        return pd.DataFrame({column: columns[column] for column in self.columns}, index=texts.index)
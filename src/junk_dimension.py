@@ -0,0 +1,99 @@
+import itertools
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from src.surrogate_keys import RESERVED_MEMBERS
+
+class JunkDimension:
+    """
+    Packs low-cardinality attributes of a fact row (yes/no flags and small categoricals) into
+    one integer key, and describes every combination as a row of a junk dimension.
+
+    Flag i is bit i of the key, each categorical attribute takes the bits above the flags
+    that its category codes need. The key is computed from the values alone, so it needs no
+    stored state and is the same in every load.
+
+    Parameters:
+        key_name (str): Name of the key column, e.g. 'transaction_flags_sk'
+        flags (list[str]): Boolean columns, in bit order
+        categories (Optional[dict[str, list]]): Categorical columns and all of their values
+        true_value: Value that marks a flag as set when the flag column is not boolean, e.g. 'Yes'
+    """
+
+    def __init__(self, key_name: str, flags: list[str], categories: Optional[dict[str, list]] = None, true_value='Yes'):
+        self.key_name = key_name
+        self.flags = list(flags)
+        self.categories = {column: list(values) for column, values in (categories or {}).items()}
+        self.true_value = true_value
+
+        # Bit offset of every categorical attribute, after the flags
+        self._offsets = {}
+        offset = len(self.flags)
+        for column, values in self.categories.items():
+            self._offsets[column] = offset
+            offset += max(len(values) - 1, 0).bit_length()
+
+        if offset > 31:
+            raise ValueError(f"The attributes of '{key_name}' need {offset} bits, at most 31 fit in the key")
+
+        self.bits = offset
+
+    @property
+    def columns(self) -> list[str]:
+        """The attribute columns of the dimension, flags first."""
+        return self.flags + list(self.categories)
+
+    def pack(self, df: pd.DataFrame) -> pd.Series:
+        """
+        Key of every row.
+
+        Parameters:
+            df (pd.DataFrame): Rows containing every flag and categorical column
+
+        Returns:
+            pd.Series: int32 keys aligned with the input
+
+        Raises:
+            ValueError: When a categorical column holds a value that is not one of its categories
+        """
+        keys = np.zeros(len(df), dtype='int32')
+
+        for bit, flag in enumerate(self.flags):
+            column = df[flag]
+            mask = column.to_numpy(dtype=bool) if pd.api.types.is_bool_dtype(column) else (column == self.true_value).to_numpy(dtype=bool)
+            keys |= mask.astype('int32') << bit
+
+        for column, values in self.categories.items():
+            codes = pd.Categorical(df[column], categories=values).codes.astype('int32')
+            unexpected = (codes < 0) & df[column].notna().to_numpy()
+            if unexpected.any():
+                raise ValueError(f"Unexpected '{column}' values: {sorted(set(df.loc[unexpected, column].astype(str)))[:5]}")
+
+            # Missing values take the first category
+            keys |= np.maximum(codes, 0) << self._offsets[column]
+
+        return pd.Series(keys, index=df.index, dtype='int32')
+
+    def dimension(self) -> pd.DataFrame:
+        """
+        Every combination of the attributes, keyed like pack(), preceded by the reserved
+        members. Reserved members have no flag values and their meaning in the categorical
+        attributes.
+        """
+        reserved = pd.DataFrame(
+            [[key] + [None] * len(self.flags) + [meaning] * len(self.categories) for key, meaning in RESERVED_MEMBERS.items()],
+            columns=[self.key_name] + self.columns
+        )
+
+        combinations = pd.DataFrame(
+            itertools.product(*[[False, True]] * len(self.flags), *self.categories.values()),
+            columns=self.columns
+        )
+        combinations.insert(0, self.key_name, self.pack(combinations))
+
+        dim = pd.concat([reserved, combinations.sort_values(self.key_name)], ignore_index=True)
+        dim[self.key_name] = dim[self.key_name].astype('int32')
+        dim[self.flags] = dim[self.flags].astype('boolean')
+
+        return dim
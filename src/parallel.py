@@ -0,0 +1,87 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+def ordered_map(executor: Executor, function: Callable, iterable: Iterable, max_pending: int) -> Iterator:
+    """
+    Like executor.map, but the input is consumed lazily: at most `max_pending` items are
+    submitted ahead of the result being yielded, so a large input never has to be read (and
+    pickled) all at once. Results are yielded in input order.
+
+    Parameters:
+        executor (Executor): Thread or process pool to run on
+        function (Callable): Function applied to every item
+        iterable (Iterable): Items, e.g. chunks from a reader
+        max_pending (int): Maximum number of submitted items without a yielded result
+
+    Yields:
+        The results of function, in the order of the items
+    """
+    pending = deque()
+
+    for item in iterable:
+        pending.append(executor.submit(function, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+
+    while pending:
+        yield pending.popleft().result()
+
+_DONE = object()
+
+def ordered_chunks(sources: Iterable, read_chunks: Callable[..., Iterable], threads: int, max_buffered: int = 2) -> Iterator:
+    """
+    Read several sources concurrently in a thread pool and yield their chunks source by
+    source, in the order of `sources`, as if they were read one after the other.
+
+    Every source gets a bounded buffer of `max_buffered` chunks, so sources ahead of the one
+    being consumed read at most that far ahead. Sources start in order, which guarantees that
+    the source being consumed is always being read.
+
+    Parameters:
+        sources (Iterable): E.g. file paths
+        read_chunks (Callable[..., Iterable]): Called with a source, returns its chunks
+        threads (int): Number of sources read at the same time
+        max_buffered (int): Chunks buffered per source
+
+    Yields:
+        The chunks of every source, in order
+    """
+    sources = list(sources)
+    stop = threading.Event()
+    buffers = [queue.Queue(maxsize=max_buffered) for _ in sources]
+
+    def put(buffer: queue.Queue, item) -> bool:
+        # Give up when the consumer is gone, instead of blocking the pool forever
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(source, buffer: queue.Queue) -> None:
+        try:
+            for chunk in read_chunks(source):
+                if not put(buffer, chunk):
+                    return
+        except BaseException as error:
+            put(buffer, error)
+            return
+        put(buffer, _DONE)
+
+    with ThreadPoolExecutor(max_workers=max(threads, 1)) as executor:
+        for source, buffer in zip(sources, buffers):
+            executor.submit(read, source, buffer)
+
+        try:
+            for buffer in buffers:
+                while (item := buffer.get()) is not _DONE:
+                    if isinstance(item, BaseException):
+                        raise item
+                    yield item
+        finally:
+            stop.set()
@@ -0,0 +1,253 @@
+import sys
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Iterable, Iterator, Optional
+
+from tabulate import tabulate
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, peak RSS is then left out of the report
+    resource = None
+
+_active: Optional['StageProfiler'] = None
+
+def _peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+class StageRecord:
+    """
+    Measurements of one run of a stage. `rows` can be set inside the stage when the row count
+    is only known once the stage has done its work.
+    """
+
+    def __init__(self, path: str, rows: Optional[int] = None):
+        self.path = path
+        self.rows = rows
+        self.seconds = 0.0
+        self.traced_peak_bytes: Optional[int] = None
+        self.rss_peak_bytes: Optional[int] = None
+        self.rss_growth_bytes: Optional[int] = None
+
+class _DisabledRecord:
+    """Stand-in yielded by stage() when no profiler is active, so callers never need to check."""
+
+    rows = None
+
+    def __setattr__(self, name, value):
+        pass
+
+_DISABLED = _DisabledRecord()
+
+class StageProfiler:
+    """
+    Collects wall time, throughput and memory per pipeline stage. Stages can be nested and run
+    many times (once per chunk, for example), the report aggregates every run of a stage.
+
+    Parameters:
+        trace_memory (bool): Measure the peak Python heap allocated by each stage with
+            tracemalloc. This slows the pipeline down noticeably, so it is off by default.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.started = datetime.now(timezone.utc)
+        self.records: list[StageRecord] = []
+        self._stack: list[list] = []
+        self._order: dict[str, int] = {}
+        self._clock_start = time.perf_counter()
+        self.total_seconds: Optional[float] = None
+
+    @contextmanager
+    def stage(self, name: str, rows: Optional[int] = None) -> Iterator[StageRecord]:
+        parent = self._stack[-1][0].path + '/' if self._stack else ''
+        record = StageRecord(parent + name, rows)
+        self._order.setdefault(record.path, len(self._order))
+
+        traced_start = 0
+        if self.trace_memory:
+            traced_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+
+        # Each stack entry holds the record and the highest heap peak seen by nested stages
+        self._stack.append([record, 0])
+        rss_start = _peak_rss_bytes()
+        start = time.perf_counter()
+
+        try:
+            yield record
+        finally:
+            record.seconds = time.perf_counter() - start
+            _, child_peak = self._stack.pop()
+
+            rss_end = _peak_rss_bytes()
+            if rss_end is not None:
+                record.rss_peak_bytes = rss_end
+                record.rss_growth_bytes = rss_end - rss_start
+
+            if self.trace_memory:
+                # A nested stage resets the tracemalloc peak, so its peak is carried upwards
+                peak = max(tracemalloc.get_traced_memory()[1], child_peak)
+                record.traced_peak_bytes = max(peak - traced_start, 0)
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+
+            self.records.append(record)
+
+    def stop(self) -> None:
+        self.total_seconds = time.perf_counter() - self._clock_start
+
+    def stages(self) -> list[dict]:
+        """Every stage aggregated over its runs, in the order the stages first started."""
+        stages: dict[str, dict] = {}
+
+        for record in self.records:
+            stage = stages.setdefault(record.path, {
+                'stage': record.path,
+                'calls': 0,
+                'seconds': 0.0,
+                'rows': None,
+                'rows_per_second': None,
+                'traced_peak_bytes': None,
+                'rss_peak_bytes': None,
+                'rss_growth_bytes': None
+            })
+            stage['calls'] += 1
+            stage['seconds'] += record.seconds
+
+            if record.rows is not None:
+                stage['rows'] = (stage['rows'] or 0) + record.rows
+            if record.traced_peak_bytes is not None:
+                stage['traced_peak_bytes'] = max(stage['traced_peak_bytes'] or 0, record.traced_peak_bytes)
+            if record.rss_peak_bytes is not None:
+                stage['rss_peak_bytes'] = max(stage['rss_peak_bytes'] or 0, record.rss_peak_bytes)
+                stage['rss_growth_bytes'] = (stage['rss_growth_bytes'] or 0) + record.rss_growth_bytes
+
+        for stage in stages.values():
+            if stage['rows'] is not None and stage['seconds'] > 0:
+                stage['rows_per_second'] = stage['rows'] / stage['seconds']
+
+        return sorted(stages.values(), key=lambda stage: self._order[stage['stage']])
+
+    def report(self) -> dict:
+        """The machine readable report: run metadata and the aggregated stages."""
+        return {
+            'started': self.started.isoformat(),
+            'total_seconds': self.total_seconds,
+            'trace_memory': self.trace_memory,
+            'stages': self.stages()
+        }
+
+    def save_report(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=4)
+
+    def summary(self) -> str:
+        """A table of the stages, nested stages indented below their parent."""
+        def mebibytes(value):
+            return None if value is None else round(value / 2**20, 1)
+
+        rows = []
+        for stage in self.stages():
+            depth = stage['stage'].count('/')
+            rows.append([
+                '· ' * depth + stage['stage'].rsplit('/', 1)[-1],
+                stage['calls'],
+                round(stage['seconds'], 3),
+                stage['rows'],
+                None if stage['rows_per_second'] is None else round(stage['rows_per_second']),
+                mebibytes(stage['traced_peak_bytes']),
+                mebibytes(stage['rss_peak_bytes'])
+            ])
+
+        headers = ['stage', 'calls', 'seconds', 'rows', 'rows/s', 'heap peak MiB', 'RSS peak MiB']
+        return tabulate(rows, headers=headers, tablefmt='psql', missingval='')
+
+@contextmanager
+def profiling(trace_memory: bool = False) -> Iterator[StageProfiler]:
+    """
+    Activate a profiler for the duration of the block. stage(), profiled() and profiled_iter()
+    record into it; outside such a block they cost next to nothing.
+    """
+    global _active
+    previous = _active
+    profiler = StageProfiler(trace_memory)
+    _active = profiler
+
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        if started_tracing:
+            tracemalloc.stop()
+        _active = previous
+
+@contextmanager
+def stage(name: str, rows: Optional[int] = None):
+    """
+    Time a block as a stage of the active profiler.
+
+    Parameters:
+        name (str): Stage name, nested stages are reported as parent/child
+        rows (Optional[int]): Rows processed by the stage, used for rows/s
+
+    Yields:
+        StageRecord: The record of this run, set its `rows` if they are only known afterwards
+    """
+    if _active is None:
+        yield _DISABLED
+        return
+
+    with _active.stage(name, rows) as record:
+        yield record
+
+def profiled(name: Optional[str] = None):
+    """
+    Decorator that runs a function as a stage. The row count is taken from the length of the
+    first argument, typically the DataFrame the function transforms.
+    """
+    def decorator(function):
+        stage_name = name or function.__name__
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            if _active is None:
+                return function(*args, **kwargs)
+
+            rows = len(args[0]) if args and hasattr(args[0], '__len__') else None
+            with _active.stage(stage_name, rows):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+def profiled_iter(name: str, iterable: Iterable) -> Iterator:
+    """Time fetching every item of an iterable, e.g. reading chunks, as runs of one stage."""
+    iterator = iter(iterable)
+    exhausted = object()
+
+    while True:
+        with stage(name) as record:
+            item = next(iterator, exhausted)
+            if item is not exhausted and hasattr(item, '__len__'):
+                record.rows = len(item)
+
+        if item is exhausted:
+            return
+
+        yield item
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+# Recurrence label to its period in days
+RECURRENCE_PERIODS = {
+    'Weekly': 7.0,
+    'Monthly': 30.44,
+    'Quarterly': 91.31,
+    'Yearly': 365.25
+}
+NOT_RECURRING = 'Not recurring'
+
+def detect_recurrence(
+    series_keys: pd.Series,
+    dates: pd.Series,
+    amounts: pd.Series,
+    periods: dict[str, float] = RECURRENCE_PERIODS,
+    min_occurrences: int = 3,
+    period_tolerance: float = 0.15,
+    max_gap_deviation: float = 0.25,
+    max_amount_variation: float = 0.25
+) -> pd.DataFrame:
+    """
+    Detect series of payments that recur at a fixed period, e.g. monthly subscriptions.
+
+    The payments are sorted once on (series, date), so the gaps between consecutive payments
+    of a series are a single diff, and the interval and amount statistics are grouped
+    aggregations. The cost is O(n log n) in the number of payments, whatever the number of
+    series. Payments of a series on the same day count as one occurrence.
+
+    A series recurs at a period when it has at least `min_occurrences` occurrences, its median
+    gap is within `period_tolerance` of the period, the standard deviation of its gaps is at
+    most `max_gap_deviation` of the period and the coefficient of variation of its amounts is
+    at most `max_amount_variation`.
+
+    Parameters:
+        series_keys (pd.Series): Series every payment belongs to, missing keys are ignored
+        dates (pd.Series): Payment dates, aligned with series_keys
+        amounts (pd.Series): Payment amounts, aligned with series_keys
+        periods (dict[str, float]): Recurrence label to its period in days
+        min_occurrences (int): Minimum number of payment days of a recurring series
+        period_tolerance (float): Allowed relative difference between median gap and period
+        max_gap_deviation (float): Maximum standard deviation of the gaps, relative to the period
+        max_amount_variation (float): Maximum standard deviation of the amounts, relative to their mean
+
+    Returns:
+        pd.DataFrame: One row per series, indexed by series key, with 'occurrences',
+            'median_gap_days', 'gap_std_days', 'amount_variation', 'last_date' and 'recurrence'
+    """
+    known = series_keys.notna().to_numpy()
+    codes, uniques = pd.factorize(series_keys[known])
+    days = pd.to_datetime(dates[known]).to_numpy().astype('datetime64[D]').astype('int64')
+    values = amounts[known].to_numpy(dtype='float64')
+
+    order = np.lexsort((days, codes))
+    codes, days, values = codes[order], days[order], values[order]
+
+    # Gaps between consecutive payments of the same series, same day payments are one occurrence
+    gaps = np.diff(days)
+    same_series = codes[1:] == codes[:-1]
+    gap_rows = same_series & (gaps > 0)
+    gap_stats = pd.Series(gaps[gap_rows], dtype='float64').groupby(codes[1:][gap_rows]).agg(['median', 'std', 'count'])
+
+    amount_stats = pd.Series(values).groupby(codes).agg(['mean', 'std'])
+    last_days = pd.Series(days).groupby(codes).max()
+
+    stats = pd.DataFrame(index=pd.RangeIndex(len(uniques)))
+    stats['occurrences'] = gap_stats['count'].reindex(stats.index, fill_value=0).astype('int64') + 1
+    stats['median_gap_days'] = gap_stats['median']
+    stats['gap_std_days'] = gap_stats['std'].fillna(0.0)
+    stats['amount_variation'] = (amount_stats['std'].fillna(0.0) / amount_stats['mean'].abs()).fillna(0.0)
+    stats['last_date'] = pd.to_datetime(last_days.to_numpy().astype('datetime64[D]'))
+
+    recurrence = np.full(len(stats), NOT_RECURRING, dtype=object)
+    candidates = (stats['occurrences'] >= min_occurrences) & (stats['amount_variation'] <= max_amount_variation)
+    for label, period in periods.items():
+        matches = (
+            candidates
+            & ((stats['median_gap_days'] - period).abs() <= period_tolerance * period)
+            & (stats['gap_std_days'] <= max_gap_deviation * period)
+        )
+        recurrence[matches.to_numpy() & (recurrence == NOT_RECURRING)] = label
+    stats['recurrence'] = recurrence
+
+    stats.index = pd.Index(uniques, name=series_keys.name)
+    return stats
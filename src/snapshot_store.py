@@ -0,0 +1,120 @@
+import os
+import shutil
+import pandas as pd
+from typing import Iterator, Optional
+
+class SnapshotStore:
+    """
+    Checkpoints of pipeline DataFrames as uncompressed Arrow IPC (Feather v2) files, one file
+    per appended chunk. Reading memory-maps the files, so numeric and string columns are views
+    of the file's pages instead of parsed copies, and a chunk costs no I/O until it is used.
+
+    Every chunk is its own file, so chunks do not need the same schema, e.g. an object column
+    that only holds missing values in one chunk.
+
+    A snapshot can be marked complete, e.g. once it is known to hold every row loaded so far.
+    The marker is a file next to the chunks and is removed with the snapshot.
+
+    Parameters:
+        directory (str): Directory holding one subdirectory of chunk files per snapshot
+    """
+
+    extension = '.arrow'
+    complete_marker = '_COMPLETE'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def parts(self, name: str) -> list[str]:
+        """Chunk files of a snapshot in the order they were appended, empty when there are none."""
+        path = self._path(name)
+        if not os.path.isdir(path):
+            return []
+
+        return [os.path.join(path, file_name) for file_name in sorted(os.listdir(path)) if file_name.endswith(self.extension)]
+
+    def exists(self, name: str) -> bool:
+        return bool(self.parts(name))
+
+    def rows(self, name: str) -> int:
+        """Number of rows of a snapshot, read from the file footers without loading the chunks."""
+        pa, _ = _import_pyarrow()
+
+        rows = 0
+        for part in self.parts(name):
+            with pa.memory_map(part) as source:
+                reader = pa.ipc.open_file(source)
+                rows += sum(reader.get_batch(index).num_rows for index in range(reader.num_record_batches))
+        return rows
+
+    def empty(self, name: str) -> pd.DataFrame:
+        """An empty DataFrame with the columns and dtypes of the first chunk of a snapshot, read from its schema."""
+        pa, _ = _import_pyarrow()
+
+        with pa.memory_map(self.parts(name)[0]) as source:
+            schema = pa.ipc.open_file(source).schema
+        return schema.empty_table().to_pandas()
+
+    def mark_complete(self, name: str) -> None:
+        """Mark a snapshot as complete, it may still be empty."""
+        path = self._path(name)
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, self.complete_marker), 'w', encoding='utf-8'):
+            pass
+
+    def is_complete(self, name: str) -> bool:
+        return os.path.exists(os.path.join(self._path(name), self.complete_marker))
+
+    def append(self, name: str, df: pd.DataFrame) -> str:
+        """Write a chunk as the next file of a snapshot and return its path."""
+        pa, feather = _import_pyarrow()
+
+        path = self._path(name)
+        os.makedirs(path, exist_ok=True)
+        part = os.path.join(path, f'part-{len(self.parts(name)):06d}{self.extension}')
+
+        # Written to a temporary name first, so a failed write never leaves a partial chunk
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        feather.write_feather(table, part + '.tmp', compression='uncompressed')
+        os.replace(part + '.tmp', part)
+        return part
+
+    def read(self, name: str, columns: Optional[list[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Stream the chunks of a snapshot in the order they were appended.
+
+        Parameters:
+            name (str): Snapshot name
+            columns (Optional[list[str]]): Only read these columns
+
+        Yields:
+            pd.DataFrame: One chunk at a time, its columns backed by the memory-mapped file
+        """
+        pa, _ = _import_pyarrow()
+
+        for part in self.parts(name):
+            with pa.memory_map(part) as source:
+                table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(columns)
+
+            # split_blocks keeps numeric columns as views instead of consolidating them into a copy
+            yield table.to_pandas(split_blocks=True)
+
+    def remove(self, name: str) -> None:
+        """Delete a snapshot and all of its chunks."""
+        path = self._path(name)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError as error:
+        raise ImportError("Snapshots need pyarrow, install it or run without checkpoints") from error
+
+    return pa, feather
@@ -0,0 +1,176 @@
+import os
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from src.row_hashing import row_fingerprints
+
+# Reserved surrogate keys, see "Surrogate Key Standards" in the README
+UNKNOWN_KEY = -1
+NOT_APPLICABLE_KEY = -2
+PENDING_KEY = -3
+ERROR_KEY = -4
+DEFAULT_KEY = -5
+
+RESERVED_MEMBERS = {
+    UNKNOWN_KEY: 'Unknown',
+    NOT_APPLICABLE_KEY: 'Not Applicable',
+    PENDING_KEY: 'Pending',
+    ERROR_KEY: 'Error',
+    DEFAULT_KEY: 'Default'
+}
+
+NATURAL_KEY_HASH = 'natural_key_hash'
+
+def natural_key_hashes(df: pd.DataFrame, natural_key: list[str]) -> pd.Series:
+    """
+    Fingerprint of the natural key of every row. Rows are grouped on the natural key first, so
+    only the distinct combinations are fingerprinted.
+    """
+    groups = df.groupby(natural_key, dropna=False, sort=False, observed=True).ngroup().to_numpy()
+    _, first_rows = np.unique(groups, return_index=True)
+
+    distinct = df[natural_key].iloc[first_rows]
+    hashes = row_fingerprints(distinct).to_numpy()
+
+    return pd.Series(hashes[groups], index=df.index, dtype=object)
+
+class SurrogateKeyIndex:
+    """
+    Hands out stable surrogate keys for the members of one dimension.
+
+    The index maps the fingerprint of a member's natural key to its surrogate key. Keys are
+    numbered from 1 in order of first appearance and never change once given out. Rows that
+    miss a required natural key column get UNKNOWN_KEY. The index is stored as append-only
+    JSON lines (natural key hash, surrogate key and attributes), so saving costs only the
+    members added since the last save.
+
+    Parameters:
+        key_name (str): Name of the surrogate key column, e.g. 'company_sk'
+        natural_key (list[str]): Columns that identify a member, also the dimension attributes
+        required (Optional[list[str]]): Natural key columns that must be filled for a row to be a member
+        path (Optional[str]): JSON lines file the index is loaded from and saved to
+    """
+
+    def __init__(
+        self,
+        key_name: str,
+        natural_key: list[str],
+        required: Optional[list[str]] = None,
+        path: Optional[str] = None
+    ):
+        self.key_name = key_name
+        self.natural_key = list(natural_key)
+        self.required = list(required or [])
+        self.path = path
+
+        self._keys: dict[str, int] = {}
+        self._members: list[pd.DataFrame] = []
+        self._unsaved: list[pd.DataFrame] = []
+        self.next_key = 1
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        key_name: str,
+        natural_key: list[str],
+        required: Optional[list[str]] = None
+    ) -> 'SurrogateKeyIndex':
+        """Open the index stored at path, or an empty index if nothing was saved there yet."""
+        index = cls(key_name, natural_key, required, path)
+
+        if os.path.exists(path):
+            stored = pd.read_json(path, orient='records', lines=True, dtype=False)
+            if not stored.empty:
+                stored[key_name] = stored[key_name].astype('int64')
+                index._keys = dict(zip(stored[NATURAL_KEY_HASH], stored[key_name].tolist()))
+                index._members.append(stored)
+                index.next_key = int(stored[key_name].max()) + 1
+
+        return index
+
+    def _missing_required(self, df: pd.DataFrame) -> np.ndarray:
+        if not self.required:
+            return np.zeros(len(df), dtype=bool)
+        return df[self.required].isna().any(axis=1).to_numpy()
+
+    def _keys_of(self, hashes: pd.Series) -> np.ndarray:
+        # Plain dict lookups: Series.map would turn the whole index into a Series on every call
+        get = self._keys.get
+        return np.fromiter((get(hash_value, UNKNOWN_KEY) for hash_value in hashes.to_numpy()), dtype='int64', count=len(hashes))
+
+    def assign(self, df: pd.DataFrame, hashes: Optional[pd.Series] = None) -> pd.Series:
+        """
+        Surrogate key of every row, adding members for natural keys not seen before.
+
+        Parameters:
+            df (pd.DataFrame): Rows containing the natural key columns
+            hashes (Optional[pd.Series]): The rows' natural_key_hashes, when already computed
+                elsewhere (e.g. in a worker process)
+
+        Returns:
+            pd.Series: int64 surrogate keys aligned with the input
+        """
+        if hashes is None:
+            hashes = natural_key_hashes(df, self.natural_key)
+        missing_required = self._missing_required(df)
+        keys = self._keys_of(hashes)
+
+        unseen = (keys == UNKNOWN_KEY) & ~missing_required
+        if unseen.any():
+            first = ~hashes[unseen].duplicated().to_numpy()
+            members = df.loc[unseen, self.natural_key][first].astype(object)
+            members = members.where(members.notna(), None)
+            members.insert(0, NATURAL_KEY_HASH, hashes[unseen].to_numpy()[first])
+            members.insert(1, self.key_name, np.arange(self.next_key, self.next_key + len(members), dtype='int64'))
+
+            self._keys.update(zip(members[NATURAL_KEY_HASH], members[self.key_name].tolist()))
+            self._members.append(members)
+            self._unsaved.append(members)
+            self.next_key += len(members)
+
+            keys[unseen] = self._keys_of(hashes[unseen])
+
+        return self._resolve(keys, missing_required, df.index)
+
+    def lookup(self, df: pd.DataFrame, hashes: Optional[pd.Series] = None) -> pd.Series:
+        """Surrogate key of every row without adding members, UNKNOWN_KEY where the member does not exist."""
+        if hashes is None:
+            hashes = natural_key_hashes(df, self.natural_key)
+        return self._resolve(self._keys_of(hashes), self._missing_required(df), df.index)
+
+    def _resolve(self, keys: np.ndarray, missing_required: np.ndarray, index: pd.Index) -> pd.Series:
+        return pd.Series(np.where(missing_required, UNKNOWN_KEY, keys), index=index, dtype='int64')
+
+    def dimension(self) -> pd.DataFrame:
+        """
+        The dimension table: the reserved members followed by every member in key order.
+        Reserved members carry their meaning ('Unknown', 'Not Applicable', ...) in every attribute.
+        """
+        reserved = pd.DataFrame(
+            [[key] + [meaning] * len(self.natural_key) for key, meaning in RESERVED_MEMBERS.items()],
+            columns=[self.key_name] + self.natural_key
+        )
+
+        members = [member[[self.key_name] + self.natural_key] for member in self._members]
+        dim = pd.concat([reserved] + members, ignore_index=True)
+        dim[self.key_name] = dim[self.key_name].astype('int64')
+
+        return dim
+
+    def save(self) -> None:
+        """Append the members added since the last save to the index file."""
+        if self.path is None:
+            raise ValueError("This index has no path to save to")
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(self.path, 'a', encoding='utf-8') as file:
+            for members in self._unsaved:
+                lines = members.to_json(orient='records', lines=True, force_ascii=False)
+                file.write(lines if lines.endswith('\n') else lines + '\n')
+
+        self._unsaved = []
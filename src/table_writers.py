@@ -0,0 +1,182 @@
+import os
+import pandas as pd
+
+# Excel sheets hold 1,048,576 rows, one of which is the header
+EXCEL_MAX_ROWS = 1_048_575
+
+# Default Parquet codec of every writer, Power BI reads snappy and it is the cheapest to write
+PARQUET_COMPRESSION = 'snappy'
+
+class TableWriter:
+    """
+    Writes a table to disk in one or more chunks. Use as a context manager, or call close()
+    once every chunk has been written.
+
+    Parameters:
+        path (str): Output file path without extension, the backend adds its own
+    """
+
+    extension = ''
+
+    def __init__(self, path: str):
+        self.path = path + self.extension
+        self.rows_written = 0
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, df: pd.DataFrame) -> None:
+        self._write(df)
+        self.rows_written += len(df)
+
+    def _write(self, df: pd.DataFrame) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.close()
+
+class CsvTableWriter(TableWriter):
+    """Comma separated UTF-8 with a header row, appended chunk by chunk."""
+
+    extension = '.csv'
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._header_written = False
+
+    def _write(self, df: pd.DataFrame) -> None:
+        df.to_csv(self.path, mode='a' if self._header_written else 'w', header=not self._header_written, index=False)
+        self._header_written = True
+
+class ParquetTableWriter(TableWriter):
+    """
+    Parquet with dictionary encoding. Every chunk becomes a row group, and the schema of the
+    first chunk is enforced on later chunks.
+
+    Parameters:
+        compression (str): Parquet codec, e.g. 'snappy' or 'zstd', defaults to PARQUET_COMPRESSION
+    """
+
+    extension = '.parquet'
+
+    def __init__(self, path: str, compression: str = PARQUET_COMPRESSION):
+        super().__init__(path)
+        self.compression = compression
+        self._writer = None
+        self._file = None
+
+    def _write(self, df: pd.DataFrame) -> None:
+        pa, pq = _import_pyarrow()
+
+        if self._writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # Hand pyarrow an open file, it would otherwise read a drive letter as a URI scheme
+            self._file = open(self.path, 'wb')
+            self._writer = pq.ParquetWriter(self._file, table.schema, compression=self.compression, use_dictionary=True)
+        else:
+            table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._file.close()
+            self._writer = None
+            self._file = None
+
+class ArrowTableWriter(TableWriter):
+    """Arrow IPC file format (Feather v2), every chunk becomes a record batch."""
+
+    extension = '.arrow'
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._writer = None
+        self._schema = None
+
+    def _write(self, df: pd.DataFrame) -> None:
+        pa, _ = _import_pyarrow()
+
+        if self._writer is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self._schema = table.schema
+            self._writer = pa.ipc.new_file(self.path, self._schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+class ExcelTableWriter(TableWriter):
+    """
+    Legacy xlsx output through openpyxl. Excel cannot be appended to, so chunks are collected
+    and written on close. Tables over the Excel row limit are rejected instead of truncated.
+    """
+
+    extension = '.xlsx'
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._chunks: list[pd.DataFrame] = []
+
+    def _write(self, df: pd.DataFrame) -> None:
+        if self.rows_written + len(df) > EXCEL_MAX_ROWS:
+            raise ValueError(f"{self.path} would exceed the Excel limit of {EXCEL_MAX_ROWS} rows, use another export format")
+        self._chunks.append(df)
+
+    def close(self) -> None:
+        if self._chunks:
+            pd.concat(self._chunks, ignore_index=True).to_excel(self.path, index=False)
+            self._chunks = []
+
+WRITERS = {
+    'parquet': ParquetTableWriter,
+    'arrow': ArrowTableWriter,
+    'csv': CsvTableWriter,
+    'excel': ExcelTableWriter
+}
+
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as error:
+        raise ImportError("The parquet and arrow export formats need pyarrow, install it or use the csv or excel format") from error
+
+    return pa, pq
+
+def open_table_writer(path: str, export_format: str, **options) -> TableWriter:
+    """
+    Create a writer for one of the WRITERS formats.
+
+    Parameters:
+        path (str): Output file path without extension
+        export_format (str): 'parquet', 'arrow', 'csv' or 'excel'
+        **options: Backend specific options, e.g. compression for parquet
+
+    Returns:
+        TableWriter: The writer, to be closed after the last chunk
+    """
+    if export_format not in WRITERS:
+        raise ValueError(f"Unknown export format '{export_format}', choose from {', '.join(WRITERS)}")
+
+    return WRITERS[export_format](path, **options)
+
+def write_table(df: pd.DataFrame, path: str, export_format: str, **options) -> str:
+    """Write a whole DataFrame in one go and return the path of the written file."""
+    with open_table_writer(path, export_format, **options) as writer:
+        writer.write(df)
+
+    return writer.path
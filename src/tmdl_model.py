@@ -0,0 +1,347 @@
+import os
+import re
+import json
+from collections import defaultdict
+from typing import Optional
+
+_DECLARATION_PATTERN = re.compile(r"^(\w+)(?:\s+('(?:[^']|'')*'|[^\s=]+))?\s*(?:=\s*(.*))?$")
+_REF_PATTERN = re.compile(r"^ref\s+(\w+)\s+('(?:[^']|'')*'|\S+)\s*$")
+_PROPERTY_PATTERN = re.compile(r"^(\w+)\s*:\s*(.*)$")
+_REFERENCE_PATTERN = re.compile(r"^('(?:[^']|'')*'|[^.']+)\.('(?:[^']|'')*'|.+)$")
+_FENCE = '```'
+
+def unquote(name: str) -> str:
+    """A TMDL object name without its quotes."""
+    name = name.strip()
+    if len(name) >= 2 and name.startswith("'") and name.endswith("'"):
+        return name[1:-1].replace("''", "'")
+    return name
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip('\t'))
+
+class TmdlNode:
+    """
+    One declaration of a TMDL file: `<keyword> <name> [= <expression>]` with its properties,
+    child objects, /// description and location.
+
+    Parameters:
+        keyword (str): E.g. 'table', 'column' or 'measure'
+        name (Optional[str]): Unquoted object name, None for unnamed objects like 'calculationGroup'
+        expression (Optional[str]): Text after '=' on the declaration, including continuation lines
+        path (Optional[str]): File the node was read from
+        line (int): Line number of the declaration, starting at 1
+    """
+
+    def __init__(self, keyword: str, name: Optional[str] = None, expression: Optional[str] = None, path: Optional[str] = None, line: int = 0):
+        self.keyword = keyword
+        self.name = name
+        self.expression = expression
+        self.path = path
+        self.line = line
+        self.description = ''
+        self.properties: dict[str, object] = {}
+        self.children: list['TmdlNode'] = []
+
+    def nodes(self, keyword: str) -> list['TmdlNode']:
+        return [child for child in self.children if child.keyword == keyword]
+
+    def __repr__(self) -> str:
+        return f'TmdlNode({self.keyword!r}, {self.name!r})'
+
+def _read_expression(lines: list[str], start: int, first: str, indent: int) -> tuple[str, int]:
+    # The expression continues on the lines indented deeper than the declaration's properties,
+    # or up to the closing fence of a ``` block, which keeps its text as written
+    if first.strip() == _FENCE:
+        end = start
+        while end < len(lines) and lines[end].strip() != _FENCE:
+            end += 1
+        body = lines[start:end]
+        end += 1
+    else:
+        end = start
+        while end < len(lines) and (not lines[end].strip() or _indent(lines[end]) >= indent + 2):
+            end += 1
+        # Trailing blank lines separate the next declaration, they are not part of the expression
+        while end > start and not lines[end - 1].strip():
+            end -= 1
+        body = ([first] if first.strip() else []) + lines[start:end]
+
+    depth = min((_indent(line) for line in body if line.strip()), default=0)
+    text = '\n'.join(line[depth:] if line.strip() else '' for line in body)
+    return text.strip('\n').rstrip(), end
+
+def parse_tmdl(text: str, path: Optional[str] = None) -> list[TmdlNode]:
+    """
+    Parse a TMDL file into its top level declarations.
+
+    Lines are `keyword name = expression` declarations, `name: value` properties, `name = expression`
+    properties or bare flags, nested by tab indentation. Flags are stored as True and properties that
+    are never a flag but have children, like `dataAccessOptions`, as nodes.
+
+    Parameters:
+        text (str): Content of a .tmdl file
+        path (Optional[str]): File name stored on the nodes, for messages
+
+    Returns:
+        list[TmdlNode]: The top level declarations in file order
+    """
+    lines = text.lstrip('﻿').splitlines()
+    roots: list[TmdlNode] = []
+    stack: list[tuple[int, TmdlNode]] = []
+    description: list[str] = []
+    index = 0
+
+    while index < len(lines):
+        line = lines[index]
+        index += 1
+        number = index
+        stripped = line.strip()
+        if not stripped:
+            continue
+
+        indent = _indent(line)
+        if stripped.startswith('///'):
+            description.append(stripped[3:].strip())
+            continue
+
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        parent = stack[-1][1] if stack else None
+
+        prop = _PROPERTY_PATTERN.match(stripped)
+        if prop and parent is not None:
+            parent.properties[prop.group(1)] = prop.group(2).strip()
+            description = []
+            continue
+
+        ref = _REF_PATTERN.match(stripped)
+        if ref:
+            # `ref table Name` lines only fix the order of objects defined in other files
+            node = TmdlNode('ref', unquote(ref.group(2)), None, path, number)
+            node.properties['type'] = ref.group(1)
+            (parent.children if parent is not None else roots).append(node)
+            description = []
+            continue
+
+        declaration = _DECLARATION_PATTERN.match(stripped)
+        if not declaration:
+            raise ValueError(f"{path or 'TMDL'}:{index}: cannot parse '{stripped}'")
+
+        keyword, name, expression = declaration.groups()
+        if expression is not None:
+            expression, index = _read_expression(lines, index, expression, indent)
+
+        if parent is not None and name is None:
+            if expression is not None:
+                # `source = ...` and `expression = ...` are expression properties of their parent
+                parent.properties[keyword] = expression
+                description = []
+                continue
+            if index >= len(lines) or not lines[index].strip() or _indent(lines[index]) <= indent:
+                parent.properties[keyword] = True
+                description = []
+                continue
+
+        node = TmdlNode(keyword, unquote(name) if name is not None else None, expression, path, number)
+        node.description = '\n'.join(description)
+        description = []
+
+        (parent.children if parent is not None else roots).append(node)
+        stack.append((indent, node))
+
+    return roots
+
+def split_reference(reference: str) -> tuple[str, str]:
+    """Table and column of a `'Table'.'Column'` reference, e.g. a relationship's fromColumn."""
+    match = _REFERENCE_PATTERN.match(reference.strip())
+    if not match:
+        raise ValueError(f"'{reference}' is not a Table.Column reference")
+    return unquote(match.group(1)), unquote(match.group(2))
+
+def enum_value(value) -> str:
+    """A TMDL enum value as the Tabular Object Model names it, e.g. 'bothDirections' -> 'BothDirections'."""
+    value = str(value)
+    return value[:1].upper() + value[1:]
+
+class ModelObject:
+    """
+    One object of a semantic model, with its TMDL properties and the objects it contains.
+
+    Parameters:
+        object_type (str): Tabular Object Model type, e.g. 'Table', 'CalculatedTable', 'DataColumn',
+            'CalculatedColumn', 'Measure', 'Relationship' or 'ModelRole'
+        name (str): Object name
+        parent (Optional[ModelObject]): Containing object, None for the model
+        node (Optional[TmdlNode]): Declaration the object was read from
+    """
+
+    def __init__(self, object_type: str, name: str, parent: Optional['ModelObject'] = None, node: Optional[TmdlNode] = None):
+        self.object_type = object_type
+        self.name = name
+        self.parent = parent
+        self.node = node
+        self.description = node.description if node else ''
+        self.expression = (node.expression or '') if node else ''
+        self.properties = dict(node.properties) if node else {}
+        self.annotations = {child.name: child.expression or '' for child in node.nodes('annotation')} if node else {}
+        self.children: dict[str, list['ModelObject']] = defaultdict(list)
+
+    @property
+    def model(self) -> 'ModelObject':
+        obj = self
+        while obj.parent is not None:
+            obj = obj.parent
+        return obj
+
+    @property
+    def table(self) -> Optional['ModelObject']:
+        obj = self.parent
+        while obj is not None and obj.object_type not in TABLE_TYPES:
+            obj = obj.parent
+        return obj
+
+    @property
+    def location(self) -> tuple[Optional[str], int]:
+        return (self.node.path, self.node.line) if self.node else (None, 0)
+
+    def add(self, kind: str, obj: 'ModelObject') -> 'ModelObject':
+        self.children[kind].append(obj)
+        return obj
+
+    def flag(self, name: str, default: bool = False) -> bool:
+        """A boolean property, bare flags like `isHidden` are True."""
+        value = self.properties.get(name, default)
+        return value if isinstance(value, bool) else str(value).strip().lower() == 'true'
+
+    def ignored_rules(self) -> set[str]:
+        """Best practice rule ids this object is excluded from by its BestPracticeAnalyzer_IgnoreRules annotation."""
+        value = self.annotations.get('BestPracticeAnalyzer_IgnoreRules')
+        if not value:
+            return set()
+        try:
+            return set(json.loads(value).get('RuleIDs', []))
+        except (ValueError, AttributeError):
+            return set()
+
+    def __repr__(self) -> str:
+        return f'ModelObject({self.object_type!r}, {self.name!r})'
+
+TABLE_TYPES = ('Table', 'CalculatedTable', 'CalculationGroup')
+COLUMN_TYPES = ('DataColumn', 'CalculatedColumn', 'CalculatedTableColumn')
+
+def _read_file(path: str) -> list[TmdlNode]:
+    with open(path, encoding='utf-8-sig') as file:
+        return parse_tmdl(file.read(), path)
+
+def _load_table(model: ModelObject, node: TmdlNode) -> ModelObject:
+    partitions = node.nodes('partition')
+    if node.nodes('calculationGroup'):
+        table_type = 'CalculationGroup'
+    elif any((partition.expression or '').strip().lower() == 'calculated' for partition in partitions):
+        table_type = 'CalculatedTable'
+    else:
+        table_type = 'Table'
+
+    table = model.add('tables', ModelObject(table_type, node.name, model, node))
+    for partition_node in partitions:
+        partition = table.add('partitions', ModelObject('Partition', partition_node.name, table, partition_node))
+        partition.properties.setdefault('type', (partition_node.expression or '').strip())
+        if table_type == 'CalculatedTable':
+            table.expression = str(partition.properties.get('source', ''))
+
+    for column_node in node.nodes('column'):
+        if column_node.expression is not None:
+            column_type = 'CalculatedColumn'
+        else:
+            column_type = 'CalculatedTableColumn' if table_type == 'CalculatedTable' else 'DataColumn'
+        column = table.add('columns', ModelObject(column_type, column_node.name, table, column_node))
+        for variation_node in column_node.nodes('variation'):
+            column.add('variations', ModelObject('Variation', variation_node.name, column, variation_node))
+
+    for measure_node in node.nodes('measure'):
+        measure = table.add('measures', ModelObject('Measure', measure_node.name, table, measure_node))
+        for kpi_node in measure_node.nodes('kpi'):
+            kpi = measure.add('kpis', ModelObject('KPI', measure_node.name, measure, kpi_node))
+            kpi.expression = '\n'.join(str(kpi.properties[name]) for name in ('targetExpression', 'statusExpression', 'trendExpression') if name in kpi.properties)
+
+    for hierarchy_node in node.nodes('hierarchy'):
+        hierarchy = table.add('hierarchies', ModelObject('Hierarchy', hierarchy_node.name, table, hierarchy_node))
+        for level_node in hierarchy_node.nodes('level'):
+            hierarchy.add('levels', ModelObject('Level', level_node.name, hierarchy, level_node))
+
+    for group_node in node.nodes('calculationGroup'):
+        for item_node in group_node.nodes('calculationItem'):
+            table.add('calculation_items', ModelObject('CalculationItem', item_node.name, table, item_node))
+
+    return table
+
+def load_model(definition_dir: str) -> ModelObject:
+    """
+    Read the TMDL definition folder of a semantic model into an object graph: the model with its
+    tables (columns, measures, partitions, hierarchies, calculation items), relationships, roles,
+    perspectives, data sources and shared expressions.
+
+    Parameters:
+        definition_dir (str): The `definition` folder of a *.SemanticModel folder
+
+    Returns:
+        ModelObject: The model, its objects are in `children` by kind, e.g. children['tables']
+    """
+    model_nodes = _read_file(os.path.join(definition_dir, 'model.tmdl'))
+    model_node = next((node for node in model_nodes if node.keyword == 'model'), None)
+    model = ModelObject('Model', model_node.name if model_node else 'Model', None, model_node)
+    for node in model_nodes:
+        if node.keyword == 'annotation':
+            model.annotations[node.name] = node.expression or ''
+
+    # Tables in the order model.tmdl refers to them, files without a reference after those
+    table_order = [node.name for node in model_nodes if node.keyword == 'ref' and node.properties['type'] == 'table']
+    table_nodes = {}
+    tables_dir = os.path.join(definition_dir, 'tables')
+    if os.path.isdir(tables_dir):
+        for file_name in sorted(os.listdir(tables_dir)):
+            if file_name.endswith('.tmdl'):
+                for node in _read_file(os.path.join(tables_dir, file_name)):
+                    if node.keyword == 'table':
+                        table_nodes[node.name] = node
+    for name in sorted(table_nodes, key=lambda name: table_order.index(name) if name in table_order else len(table_order)):
+        _load_table(model, table_nodes[name])
+
+    database_path = os.path.join(definition_dir, 'database.tmdl')
+    for node in _read_file(database_path) if os.path.exists(database_path) else []:
+        if node.keyword == 'database' and 'compatibilityLevel' in node.properties:
+            model.properties.setdefault('compatibilityLevel', node.properties['compatibilityLevel'])
+
+    for file_name, keyword, kind, object_type in (
+        ('relationships.tmdl', 'relationship', 'relationships', 'Relationship'),
+        ('expressions.tmdl', 'expression', 'expressions', 'NamedExpression'),
+        ('dataSources.tmdl', 'dataSource', 'data_sources', None)
+    ):
+        path = os.path.join(definition_dir, file_name)
+        for node in _read_file(path) if os.path.exists(path) else []:
+            if node.keyword == keyword:
+                if object_type is None:
+                    object_type = 'StructuredDataSource' if str(node.properties.get('type', '')).lower() == 'structured' else 'ProviderDataSource'
+                model.add(kind, ModelObject(object_type, node.name, model, node))
+
+    for folder, keyword in (('roles', 'role'), ('perspectives', 'perspective')):
+        directory = os.path.join(definition_dir, folder)
+        for file_name in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+            for node in _read_file(os.path.join(directory, file_name)) if file_name.endswith('.tmdl') else []:
+                if node.keyword != keyword:
+                    continue
+                if keyword == 'role':
+                    role = model.add('roles', ModelObject('ModelRole', node.name, model, node))
+                    for member_node in node.nodes('member'):
+                        role.add('members', ModelObject('ModelRoleMember', member_node.name, role, member_node))
+                    for permission_node in node.nodes('tablePermission'):
+                        permission = role.add('table_permissions', ModelObject('TablePermission', permission_node.name, role, permission_node))
+                        for column_node in permission_node.nodes('columnPermission'):
+                            permission.add('column_permissions', ModelObject('ColumnPermission', column_node.name, permission, column_node))
+                else:
+                    perspective = model.add('perspectives', ModelObject('Perspective', node.name, model, node))
+                    for table_node in node.nodes('perspectiveTable'):
+                        perspective.add('tables', ModelObject('PerspectiveTable', table_node.name, perspective, table_node))
+
+    return model
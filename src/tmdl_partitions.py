@@ -0,0 +1,145 @@
+import re
+
+# TMDL column data types and the Power Query type that loads them
+M_TYPES = {
+    'int64': 'Int64.Type',
+    'string': 'type text',
+    'decimal': 'Currency.Type',
+    'double': 'type number',
+    'dateTime': 'type datetime',
+    'boolean': 'type logical'
+}
+
+_COLUMN_PATTERN = re.compile(r"^\tcolumn ('(?:[^']|'')+'|\S+)\s*$")
+_DATA_TYPE_PATTERN = re.compile(r"^\t\tdataType: (\w+)\s*$")
+
+def _unquote(name: str) -> str:
+    if name.startswith("'") and name.endswith("'"):
+        return name[1:-1].replace("''", "'")
+    return name
+
+def read_column_types(tmdl: str) -> dict[str, str]:
+    """
+    Collect the data columns of a TMDL table definition with their TMDL data type.
+    Calculated columns (column name = expression) are skipped, they are not loaded from source.
+
+    Parameters:
+        tmdl (str): Content of a tables/<name>.tmdl file
+
+    Returns:
+        dict[str, str]: Column name to TMDL data type, in definition order
+    """
+    columns = {}
+    current = None
+
+    for line in tmdl.splitlines():
+        column = _COLUMN_PATTERN.match(line)
+        if column:
+            current = _unquote(column.group(1))
+            continue
+
+        data_type = _DATA_TYPE_PATTERN.match(line)
+        if data_type and current is not None:
+            columns[current] = data_type.group(1)
+            current = None
+        elif line.startswith('\t') and not line.startswith('\t\t'):
+            current = None
+
+    return columns
+
+def _m_string(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+def m_source_expression(file_path: str, export_format: str, column_types: dict[str, str]) -> list[str]:
+    """
+    Power Query steps that load an exported table and apply the column types of the model.
+
+    Parameters:
+        file_path (str): Path of the exported file as Power BI Desktop sees it
+        export_format (str): 'parquet', 'csv' or 'excel'
+        column_types (dict[str, str]): Column name to TMDL data type
+
+    Returns:
+        list[str]: The lines of the let expression, without indentation
+    """
+    contents = f'File.Contents({_m_string(file_path)})'
+    types = ', '.join(f'{{{_m_string(column)}, {M_TYPES[data_type]}}}' for column, data_type in column_types.items())
+
+    if export_format == 'parquet':
+        steps = [
+            f'Source = Parquet.Document({contents}),',
+            f'#"Changed Type" = Table.TransformColumnTypes(Source,{{{types}}})'
+        ]
+    elif export_format == 'csv':
+        steps = [
+            f'Source = Csv.Document({contents},[Delimiter=",", Encoding=65001, QuoteStyle=QuoteStyle.Csv]),',
+            '#"Promoted Headers" = Table.PromoteHeaders(Source, [PromoteAllScalars=true]),',
+            f'#"Changed Type" = Table.TransformColumnTypes(#"Promoted Headers",{{{types}}})'
+        ]
+    elif export_format == 'excel':
+        steps = [
+            f'Source = Excel.Workbook({contents}, null, true),',
+            'Sheet1_Sheet = Source{[Item="Sheet1",Kind="Sheet"]}[Data],',
+            '#"Promoted Headers" = Table.PromoteHeaders(Sheet1_Sheet, [PromoteAllScalars=true]),',
+            f'#"Changed Type" = Table.TransformColumnTypes(#"Promoted Headers",{{{types}}})'
+        ]
+    else:
+        raise ValueError(f"Power Query has no connector for the '{export_format}' export format")
+
+    return ['let'] + ['    ' + step for step in steps] + ['in', '    #"Changed Type"']
+
+def render_partition(table_name: str, source_lines: list[str]) -> list[str]:
+    """TMDL lines of an import mode M partition, indented for use inside a table definition."""
+    header = f"\tpartition '{table_name}' = m" if not re.fullmatch(r'\w+', table_name) else f'\tpartition {table_name} = m'
+    return [header, '\t\tmode: import', '\t\tsource ='] + ['\t\t\t\t' + line for line in source_lines]
+
+def replace_partition(tmdl: str, table_name: str, source_lines: list[str]) -> str:
+    """
+    Replace the M partition of a table definition, keeping every other property untouched.
+
+    Parameters:
+        tmdl (str): Content of the table's .tmdl file
+        table_name (str): Name of the table, which is also the partition name
+        source_lines (list[str]): New let expression from m_source_expression
+
+    Returns:
+        str: The updated TMDL
+    """
+    lines = tmdl.splitlines()
+    partition = render_partition(table_name, source_lines)
+
+    start = next((i for i, line in enumerate(lines) if line == partition[0]), None)
+    if start is None:
+        raise ValueError(f"No partition '{table_name}' found in the table definition")
+
+    # The partition runs until the next line that is not indented deeper than the partition itself
+    end = start + 1
+    while end < len(lines) and (lines[end].startswith('\t\t') or lines[end].strip() == ''):
+        end += 1
+    while lines[end - 1].strip() == '':
+        end -= 1
+
+    updated = lines[:start] + partition + lines[end:]
+    return '\n'.join(updated) + ('\n' if tmdl.endswith('\n') else '')
+
+def update_partition_file(tmdl_path: str, table_name: str, file_path: str, export_format: str) -> bool:
+    """
+    Point the partition in a table's .tmdl file at an exported file. The file is only rewritten
+    when its content changes.
+
+    Returns:
+        bool: True if the file was changed
+    """
+    with open(tmdl_path, encoding='utf-8') as file:
+        tmdl = file.read()
+
+    source_lines = m_source_expression(file_path, export_format, read_column_types(tmdl))
+    updated = replace_partition(tmdl, table_name, source_lines)
+
+    if updated == tmdl:
+        return False
+
+    with open(tmdl_path, 'w', encoding='utf-8') as file:
+        file.write(updated)
+
+    return True
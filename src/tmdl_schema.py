@@ -0,0 +1,205 @@
+import re
+import uuid
+import pandas as pd
+from typing import Optional
+
+from src.tmdl_partitions import _COLUMN_PATTERN, _unquote
+
+_MEMBER_PATTERN = re.compile(r"^\t(?!\t)\S")
+_REF_TABLE_PATTERN = re.compile(r"^ref table ")
+
+def quote_name(name: str) -> str:
+    """A TMDL object name, quoted when it is not a plain identifier."""
+    return name if re.fullmatch(r'\w+', name) else "'" + name.replace("'", "''") + "'"
+
+def tmdl_data_type(dtype) -> str:
+    """The TMDL data type of a pandas column dtype, text for anything that is not numeric or boolean."""
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'int64'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'double'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'dateTime'
+    return 'string'
+
+def render_column(name: str, data_type: str, description: Optional[str] = None, is_key: bool = False) -> list[str]:
+    """TMDL lines of a data column loaded from the source column of the same name, is_key marks the table's primary key."""
+    lines = [f'\t/// {description}'] if description else []
+    lines.append(f'\tcolumn {quote_name(name)}')
+    lines.append(f'\t\tdataType: {data_type}')
+    if is_key:
+        lines.append('\t\tisKey')
+    if data_type == 'int64':
+        lines.append('\t\tformatString: 0')
+    lines += ['\t\tsummarizeBy: none', f'\t\tsourceColumn: {name}', '', '\t\tannotation SummarizationSetBy = Automatic', '']
+    return lines
+
+def _column_blocks(lines: list[str]) -> dict[str, tuple[int, int]]:
+    # Data column name -> (first line, end line) including its /// description and trailing blank lines
+    columns = {}
+
+    for index, line in enumerate(lines):
+        column = _COLUMN_PATTERN.match(line)
+        if not column:
+            continue
+
+        start = index
+        while start > 0 and lines[start - 1].startswith('\t///'):
+            start -= 1
+
+        end = index + 1
+        while end < len(lines) and not _MEMBER_PATTERN.match(lines[end]):
+            end += 1
+
+        columns[_unquote(column.group(1))] = (start, end)
+
+    return columns
+
+def sync_columns(tmdl: str, columns: dict[str, str], descriptions: Optional[dict[str, str]] = None) -> str:
+    """
+    Make the data columns of a table definition match an exported table: columns that are no
+    longer exported are removed and new ones are added after the last column. Existing columns,
+    calculated columns and measures are left untouched.
+
+    Parameters:
+        tmdl (str): Content of the table's .tmdl file
+        columns (dict[str, str]): Exported column name to TMDL data type
+        descriptions (Optional[dict[str, str]]): Descriptions of columns that are added
+
+    Returns:
+        str: The updated TMDL
+    """
+    descriptions = descriptions or {}
+    lines = tmdl.splitlines()
+    blocks = _column_blocks(lines)
+
+    removed = set()
+    for name, (start, end) in blocks.items():
+        if name not in columns:
+            removed.update(range(start, end))
+
+    added = []
+    for name, data_type in columns.items():
+        if name not in blocks:
+            added += render_column(name, data_type, descriptions.get(name))
+
+    if not removed and not added:
+        return tmdl
+
+    kept_blocks = [end for name, (_, end) in blocks.items() if name in columns]
+    if kept_blocks:
+        insert_at = max(kept_blocks)
+    else:
+        insert_at = next((i for i, line in enumerate(lines) if line.startswith('\tpartition ')), len(lines))
+
+    updated = []
+    for index, line in enumerate(lines):
+        if index == insert_at:
+            updated += added
+        if index not in removed:
+            updated.append(line)
+    if insert_at >= len(lines):
+        updated += added
+
+    return '\n'.join(updated) + ('\n' if tmdl.endswith('\n') else '')
+
+def render_table(table_name: str, columns: dict[str, str], partition: list[str], description: Optional[str] = None, column_descriptions: Optional[dict[str, str]] = None, key: Optional[str] = None) -> str:
+    """
+    A complete table definition with data columns and an import partition.
+
+    Parameters:
+        table_name (str): Name of the table
+        columns (dict[str, str]): Column name to TMDL data type
+        partition (list[str]): Partition lines from tmdl_partitions.render_partition
+        description (Optional[str]): Description of the table
+        column_descriptions (Optional[dict[str, str]]): Descriptions of the columns
+        key (Optional[str]): Primary key column, the one side of the table's relationships
+
+    Returns:
+        str: Content for tables/<table_name>.tmdl
+    """
+    column_descriptions = column_descriptions or {}
+    lines = [f'/// {description}'] if description else []
+    lines += [f'table {quote_name(table_name)}', '']
+
+    for name, data_type in columns.items():
+        lines += render_column(name, data_type, column_descriptions.get(name), name == key)
+
+    lines += partition
+    lines += ['', '\tannotation PBI_ResultType = Table', '']
+    return '\n'.join(lines)
+
+def relationship_name(from_table: str, from_column: str, to_table: str, to_column: str) -> str:
+    """A stable relationship name, so regenerating a relationship never produces a diff."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f'{from_table}.{from_column}->{to_table}.{to_column}'))
+
+def _column_reference(table: str, column: str) -> str:
+    return f'{quote_name(table)}.{quote_name(column)}'
+
+def _relationship_blocks(lines: list[str]) -> list[tuple[int, int]]:
+    starts = [i for i, line in enumerate(lines) if line.startswith('relationship ')]
+    ends = starts[1:] + [len(lines)]
+    return list(zip(starts, ends))
+
+def ensure_relationship(tmdl: str, from_table: str, from_column: str, to_table: str, to_column: str) -> str:
+    """
+    Add a many-to-one relationship to relationships.tmdl unless one between the same columns exists.
+
+    Returns:
+        str: The updated relationships.tmdl content
+    """
+    from_line = f'\tfromColumn: {_column_reference(from_table, from_column)}'
+    to_line = f'\ttoColumn: {_column_reference(to_table, to_column)}'
+    lines = tmdl.splitlines()
+
+    for start, end in _relationship_blocks(lines):
+        if from_line in lines[start:end] and to_line in lines[start:end]:
+            return tmdl
+
+    while lines and lines[-1].strip() == '':
+        lines.pop()
+
+    lines += ['', f'relationship {relationship_name(from_table, from_column, to_table, to_column)}', from_line, to_line, '']
+    return '\n'.join(lines) + '\n'
+
+def remove_relationships(tmdl: str, table: str) -> str:
+    """Remove every relationship from or to a table from relationships.tmdl."""
+    reference = quote_name(table) + '.'
+    lines = tmdl.splitlines()
+
+    removed = set()
+    for start, end in _relationship_blocks(lines):
+        if any(line.split(': ', 1)[-1].startswith(reference) for line in lines[start:end] if line.startswith(('\tfromColumn:', '\ttoColumn:'))):
+            removed.update(range(start, end))
+
+    if not removed:
+        return tmdl
+
+    # Every relationship is followed by a blank line, the last one included
+    kept = [line for index, line in enumerate(lines) if index not in removed]
+    while kept and kept[-1].strip() == '':
+        kept.pop()
+    return '\n'.join(kept + ['']) + '\n'
+
+def ensure_table_ref(model_tmdl: str, table: str) -> str:
+    """Add 'ref table' for a table to model.tmdl, after the existing table references."""
+    ref = f'ref table {quote_name(table)}'
+    lines = model_tmdl.splitlines()
+    if ref in lines:
+        return model_tmdl
+
+    refs = [i for i, line in enumerate(lines) if _REF_TABLE_PATTERN.match(line)]
+    insert_at = refs[-1] + 1 if refs else len(lines)
+    lines.insert(insert_at, ref)
+    return '\n'.join(lines) + ('\n' if model_tmdl.endswith('\n') else '')
+
+def remove_table_ref(model_tmdl: str, table: str) -> str:
+    ref = f'ref table {quote_name(table)}'
+    lines = model_tmdl.splitlines()
+    if ref not in lines:
+        return model_tmdl
+
+    lines.remove(ref)
+    return '\n'.join(lines) + ('\n' if model_tmdl.endswith('\n') else '')
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.row_hashing import FINGERPRINT_KEYS, NULL_HASHES, fingerprint_keys, row_fingerprints
+
+def sample_rows() -> pd.DataFrame:
+    return pd.DataFrame({
+        'received_date_sk': pd.Series([20240105, 20240105, 20231231], dtype='int32'),
+        'name_or_description': ['Albert Heijn 1403', 'Albert Heijn 1403', 'Ünïcode café'],
+        'amount_in_euro': [12.5, -0.1, 1e-05],
+        'debit_or_credit': pd.Categorical(['Debit', 'Debit', 'Credit']),
+        'notifications': ['Pasvolgnr: 003', None, ''],
+        'is_weekend': [False, True, False],
+        'booked_at': [pd.Timestamp('2024-01-05 10:00'), pd.Timestamp('2024-01-05 23:59:59.5'), pd.NaT]
+    })
+
+# Fingerprints of sample_rows, any change means every stored load state has to be rebuilt
+GOLDEN_FINGERPRINTS = [
+    '9b04ed22f0c3e01afce336a3688acf7e',
+    '22335c5638849e1227dc3c63ce50e5ea',
+    '4949c6d2ca9a09a82cb1311775cee264'
+]
+GOLDEN_KEYS = [698144606881857025, 154025934155434465, 330060665419571354]
+
+def reference_fingerprint(texts: list) -> str:
+    """The fingerprint of one row of canonical texts (None for missing), as the module docstring describes it."""
+    halves = []
+    for key, null_hash in zip(FINGERPRINT_KEYS, NULL_HASHES):
+        h = len(texts)
+        for text in texts:
+            column_hash = int(null_hash) if text is None else int(pd.util.hash_array(np.array([text], dtype=object), hash_key=key, categorize=False)[0])
+            h = ((h ^ column_hash) * 0x100000001b3) % 2 ** 64
+        h = ((h ^ (h >> 30)) * 0xbf58476d1ce4e5b9) % 2 ** 64
+        h = ((h ^ (h >> 27)) * 0x94d049bb133111eb) % 2 ** 64
+        halves.append(h ^ (h >> 31))
+    return ''.join(f'{half:016x}' for half in halves)
+
+def test_golden_fingerprints():
+    fingerprints = row_fingerprints(sample_rows())
+    assert fingerprints.tolist() == GOLDEN_FINGERPRINTS
+    assert fingerprint_keys(fingerprints).tolist() == GOLDEN_KEYS
+
+def test_matches_the_documented_encoding():
+    texts = [
+        ['20240105', 'Albert Heijn 1403', '12.5', 'Debit', 'Pasvolgnr: 003', 'false', '2024-01-05T10:00:00.000000'],
+        ['20240105', 'Albert Heijn 1403', '-0.1', 'Debit', None, 'true', '2024-01-05T23:59:59.500000'],
+        ['20231231', 'Ünïcode café', '1e-05', 'Credit', '', 'false', None]
+    ]
+    assert [reference_fingerprint(row) for row in texts] == GOLDEN_FINGERPRINTS
+
+def test_independent_of_inferred_dtypes():
+    rows = sample_rows()
+    as_objects = rows.astype(object).assign(booked_at=rows['booked_at'].astype(object).where(rows['booked_at'].notna(), None))
+    assert row_fingerprints(as_objects).tolist() == GOLDEN_FINGERPRINTS
+
+    ints = pd.DataFrame({'amount': pd.Series([3, 4], dtype='int64')})
+    floats = pd.DataFrame({'amount': [3.0, 4.0]})
+    assert row_fingerprints(ints).tolist() == row_fingerprints(floats).tolist()
+
+def test_distinguishes_values_that_compare_equal():
+    fingerprints = row_fingerprints(pd.DataFrame({'value': [True, 1, 1.0, None, '']}, dtype=object))
+    assert fingerprints[0] != fingerprints[1]
+    assert fingerprints[1] == fingerprints[2]
+    assert fingerprints[3] != fingerprints[4]
+
+def test_column_order_and_selection():
+    rows = sample_rows()
+    assert row_fingerprints(rows, ['amount_in_euro', 'is_weekend']).tolist() != row_fingerprints(rows, ['is_weekend', 'amount_in_euro']).tolist()
+    assert row_fingerprints(rows, list(rows.columns)).tolist() == GOLDEN_FINGERPRINTS
+
+    with pytest.raises(ValueError):
+        row_fingerprints(rows, [])